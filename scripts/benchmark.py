@@ -0,0 +1,627 @@
+"""
+Benchmarks de desempenho do sistema RAG.
+
+Usa vetores sintéticos sempre que possível para não gerar custo de API.
+
+Uso:
+    python scripts/benchmark.py writers --chunks 50000
+    python scripts/benchmark.py concurrency --requests 500 --concurrency 100
+    python scripts/benchmark.py batch --queries 50
+    python scripts/benchmark.py quantization --collection rag_documents
+    python scripts/benchmark.py dimensions --collection rag_documents
+    python scripts/benchmark.py hybrid --collection rag_documents
+    python scripts/benchmark.py context --collection rag_documents --max-tokens 1500
+    python scripts/benchmark.py rerank --collection rag_documents --reranker bm25
+    python scripts/benchmark.py microbatch --requests 1000 --concurrency 100
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Adicionar diretório raiz ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import typer
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import text
+
+from src.context import count_tokens, pack_context
+from src.db import QUANTIZATIONS, get_engine
+from src.embedding_batcher import BatchingEmbeddings
+from src.embedding_cache import get_embeddings
+from src.index import create_index, drop_index, index_name, list_indexes
+from src.ingest import CopyWriter, build_vectorstore, write_with_orm
+from src.memory_index import MemoryIndex
+from src.rerank import Reranker
+from src.search import SemanticSearch, format_context, result_cache
+
+load_dotenv()
+
+app = typer.Typer()
+
+
+@app.callback()
+def callback() -> None:
+    """Benchmarks de ingestão e busca."""
+
+
+def synthetic_chunks(
+    count: int, dimensions: int, seed: int = 42
+) -> Tuple[List[Document], List[List[float]]]:
+    """
+    Gera chunks e vetores sintéticos.
+    
+    Args:
+        count: Quantidade de chunks
+        dimensions: Dimensão dos vetores
+        seed: Semente do gerador aleatório
+        
+    Returns:
+        Tupla (chunks, vetores)
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dimensions), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = [
+        Document(
+            id=str(uuid.uuid4()),
+            page_content=f"Chunk sintético {i} " + "lorem ipsum " * 80,
+            metadata={"source": "benchmark.pdf", "page": i // 2},
+        )
+        for i in range(count)
+    ]
+    return chunks, vectors.tolist()
+
+
+@app.command()
+def writers(
+    chunks: int = typer.Option(50_000, help="Quantidade de chunks sintéticos"),
+    dimensions: int = typer.Option(1536, help="Dimensão dos vetores"),
+    batch_size: int = typer.Option(500, help="Chunks por lote de gravação"),
+) -> None:
+    """
+    Compara gravação via add_embeddings (ORM) e via COPY binário.
+    """
+    docs, vectors = synthetic_chunks(chunks, dimensions)
+    embeddings = get_embeddings()
+    timings = {}
+    
+    for name in ("orm", "copy"):
+        collection = f"bench_{name}_{uuid.uuid4().hex[:8]}"
+        vectorstore = build_vectorstore(collection, embeddings)
+        writer = CopyWriter(vectorstore) if name == "copy" else None
+        
+        try:
+            started = time.perf_counter()
+            for start in range(0, chunks, batch_size):
+                batch = docs[start:start + batch_size]
+                batch_vectors = vectors[start:start + batch_size]
+                if writer is None:
+                    write_with_orm(vectorstore, batch, batch_vectors)
+                else:
+                    writer(batch, batch_vectors)
+            timings[name] = time.perf_counter() - started
+            if writer is not None and writer.failed:
+                typer.echo("⚠️  COPY caiu no fallback; resultado não é representativo")
+        finally:
+            if writer is not None:
+                writer.close()
+            vectorstore.delete_collection()
+        
+        typer.echo(f"{name:>5}: {timings[name]:.2f}s ({chunks / timings[name]:.0f} chunks/s)")
+    
+    typer.echo(f"\n⚡ COPY {timings['orm'] / timings['copy']:.1f}x mais rápido que add_embeddings")
+
+
+def latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Resume latências de uma rodada de requisições.
+    
+    Args:
+        latencies: Latência de cada requisição (segundos)
+        elapsed: Duração total da rodada (segundos)
+        
+    Returns:
+        Dicionário com req/s, p50 e p95 (ms)
+    """
+    ordered = sorted(latencies)
+    return {
+        "rps": len(ordered) / elapsed,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+    }
+
+
+@app.command()
+def concurrency(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    requests: int = typer.Option(500, help="Total de buscas"),
+    concurrency: int = typer.Option(100, help="Buscas simultâneas"),
+    distinct: int = typer.Option(20, help="Perguntas distintas (repetidas saem do cache de embeddings)"),
+) -> None:
+    """
+    Compara buscas concorrentes: search em threads x asearch em um event loop.
+    
+    O cache de resultados fica desativado: com as perguntas repetidas, os
+    dois caminhos mediriam acertos em memória em vez de idas ao banco.
+    """
+    searcher = SemanticSearch(collection_name=collection)
+    queries = [f"Qual o faturamento da empresa {i % distinct}?" for i in range(requests)]
+    result_cache.max_entries = 0
+    
+    # Aquecer cache de embeddings e conexões dos dois caminhos
+    for query in queries[:distinct]:
+        searcher.search(query)
+    
+    def timed_search(query: str) -> float:
+        started = time.perf_counter()
+        searcher.search(query)
+        return time.perf_counter() - started
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        sync_latencies = list(executor.map(timed_search, queries))
+    sync = latency_summary(sync_latencies, time.perf_counter() - started)
+    
+    async def run_async() -> Dict[str, float]:
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def timed_asearch(query: str) -> float:
+            async with semaphore:
+                started = time.perf_counter()
+                await searcher.asearch(query)
+                return time.perf_counter() - started
+        
+        await searcher.asearch(queries[0])
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(timed_asearch(q) for q in queries))
+        return latency_summary(list(latencies), time.perf_counter() - started)
+    
+    async_ = asyncio.run(run_async())
+    
+    typer.echo(f"{'caminho':<24} {'req/s':>8} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for name, row in ((f"search ({concurrency} threads)", sync), ("asearch (1 event loop)", async_)):
+        typer.echo(f"{name:<24} {row['rps']:>8.1f} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f}")
+
+
+@app.command()
+def batch(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    queries: int = typer.Option(50, help="Perguntas distintas"),
+) -> None:
+    """
+    Compara buscas uma a uma (search_by_vector) x search_many_by_vectors.
+    """
+    searcher = SemanticSearch(collection_name=collection)
+    texts = [f"Qual o faturamento da empresa {i}?" for i in range(queries)]
+    
+    # Embeddings fora da medição: compara apenas as idas ao banco
+    embeddings = searcher.vectorstore.embeddings.embed_documents(texts)
+    searcher.search_many_by_vectors(embeddings[:1])
+    
+    started = time.perf_counter()
+    for embedding in embeddings:
+        searcher.search_by_vector(embedding)
+    loop = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    searcher.search_many_by_vectors(embeddings)
+    batched = time.perf_counter() - started
+    
+    typer.echo(f"{'caminho':<24} {'total (ms)':>10} {'por query (ms)':>15}")
+    for name, elapsed in (("search (loop)", loop), ("search_many (1 SQL)", batched)):
+        typer.echo(f"{name:<24} {elapsed * 1000:>10.1f} {elapsed * 1000 / queries:>15.2f}")
+
+
+@app.command()
+def quantization(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    queries: int = typer.Option(50, help="Consultas amostradas da coleção"),
+    modes: List[str] = typer.Option(list(QUANTIZATIONS), "--mode", help="Quantizações a comparar"),
+) -> None:
+    """
+    Compara float32, halfvec e binário: tamanho, latência e recall@k (índices HNSW).
+    
+    As consultas são vetores da própria coleção (sem custo de API) e a
+    verdade é a busca exata em memória. Índices criados pelo benchmark são
+    removidos ao final.
+    """
+    embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    exact = MemoryIndex.from_database(collection, embedding_model)
+    if not len(exact):
+        typer.echo(f"❌ Coleção vazia: {collection}", err=True)
+        raise typer.Exit(code=1)
+    rng = np.random.default_rng(42)
+    rows = rng.choice(len(exact), min(queries, len(exact)), replace=False)
+    samples = [exact.vectors[row].tolist() for row in rows]
+    
+    existing = {index["name"] for index in list_indexes()}
+    dimensions = exact.dimensions
+    representations = {
+        "none": "embedding",
+        "halfvec": f"embedding::halfvec({dimensions})",
+        "binary": f"binary_quantize(embedding)::bit({dimensions})",
+    }
+    
+    typer.echo(
+        f"{'quantização':<12} {'bytes/vetor':>12} {'índice (MB)':>12} "
+        f"{'p50 (ms)':>10} {'p95 (ms)':>10} {'recall@k':>10}"
+    )
+    for mode in modes:
+        name = index_name("hnsw", mode)
+        try:
+            create_index("hnsw", quantization=mode)
+            with get_engine().connect() as conn:
+                vector_bytes = conn.execute(
+                    text(f"SELECT AVG(pg_column_size({representations[mode]})) FROM langchain_pg_embedding")
+                ).scalar()
+                index_bytes = conn.execute(
+                    text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}
+                ).scalar()
+            
+            searcher = SemanticSearch(collection_name=collection, quantization=mode)
+            latencies = []
+            hits = 0
+            for sample in samples:
+                started = time.perf_counter()
+                found = searcher.search_by_vector(sample)
+                latencies.append(time.perf_counter() - started)
+                truth = {doc.id for doc, _ in exact.search(sample, searcher.k)}
+                hits += len(truth.intersection(doc.id for doc, _ in found))
+            summary = latency_summary(latencies, sum(latencies))
+            recall = hits / (len(samples) * min(searcher.k, len(exact)))
+            
+            typer.echo(
+                f"{mode:<12} {float(vector_bytes):>12.0f} {index_bytes / 1024 / 1024:>12.1f} "
+                f"{summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} {recall:>10.3f}"
+            )
+        except Exception as e:
+            typer.echo(f"{mode:<12} ❌ {str(e).splitlines()[0]}")
+        finally:
+            if name not in existing:
+                drop_index("hnsw", quantization=mode)
+
+
+@app.command()
+def dimensions(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    queries: int = typer.Option(50, help="Consultas amostradas da coleção"),
+    sizes: List[int] = typer.Option([256, 512, 1024], "--dimension", help="Dimensões do prefixo"),
+) -> None:
+    """
+    Compara a busca em dois estágios por dimensão do prefixo: índice, latência e recall@k.
+    
+    Para cada dimensão mede só o estágio grosso (fator 1) e com re-ranqueamento
+    pelo vetor completo (SEARCH_RERANK_FACTOR). A verdade é a busca exata em
+    memória; índices criados pelo benchmark são removidos ao final.
+    """
+    embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    exact = MemoryIndex.from_database(collection, embedding_model)
+    if not len(exact):
+        typer.echo(f"❌ Coleção vazia: {collection}", err=True)
+        raise typer.Exit(code=1)
+    rng = np.random.default_rng(42)
+    rows = rng.choice(len(exact), min(queries, len(exact)), replace=False)
+    samples = [exact.vectors[row].tolist() for row in rows]
+    existing = {index["name"] for index in list_indexes()}
+    
+    typer.echo(
+        f"{'dimensões':<10} {'fator':>6} {'índice (MB)':>12} "
+        f"{'p50 (ms)':>10} {'p95 (ms)':>10} {'recall@k':>10}"
+    )
+    for size in sizes:
+        name = index_name("hnsw", coarse_dimensions=size)
+        try:
+            create_index("hnsw", coarse_dimensions=size)
+            with get_engine().connect() as conn:
+                index_bytes = conn.execute(
+                    text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name}
+                ).scalar()
+            
+            default_factor = int(os.getenv("SEARCH_RERANK_FACTOR", "10"))
+            for factor in sorted({1, default_factor}):
+                searcher = SemanticSearch(collection_name=collection, coarse_dimensions=size)
+                searcher.rerank_factor = factor
+                latencies = []
+                hits = 0
+                for sample in samples:
+                    started = time.perf_counter()
+                    found = searcher.search_by_vector(sample)
+                    latencies.append(time.perf_counter() - started)
+                    truth = {doc.id for doc, _ in exact.search(sample, searcher.k)}
+                    hits += len(truth.intersection(doc.id for doc, _ in found))
+                summary = latency_summary(latencies, sum(latencies))
+                recall = hits / (len(samples) * min(searcher.k, len(exact)))
+                
+                typer.echo(
+                    f"{size:<10} {factor:>6} {index_bytes / 1024 / 1024:>12.1f} "
+                    f"{summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} {recall:>10.3f}"
+                )
+        except Exception as e:
+            typer.echo(f"{size:<10} ❌ {str(e).splitlines()[0]}")
+        finally:
+            if name not in existing:
+                drop_index("hnsw", coarse_dimensions=size)
+
+
+@app.command()
+def hybrid(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    queries: int = typer.Option(50, help="Consultas amostradas da coleção"),
+    words: int = typer.Option(4, help="Palavras consecutivas de cada chunk usadas como consulta"),
+) -> None:
+    """
+    Compara os caminhos vetorial, lexical e híbrido: latência e acerto@k.
+    
+    Cada consulta é um trecho literal de um chunk da coleção (como números,
+    nomes e códigos citados pelo usuário); acerto@k é a fração de consultas
+    cujo chunk de origem aparece no top-k. Os embeddings das consultas são
+    gerados antes da medição.
+    """
+    with get_engine().connect() as conn:
+        documents = conn.execute(
+            text(
+                "SELECT document FROM langchain_pg_embedding WHERE collection_id = "
+                "(SELECT uuid FROM langchain_pg_collection WHERE name = :name) "
+                "ORDER BY id"
+            ),
+            {"name": collection},
+        ).scalars().all()
+    if not documents:
+        typer.echo(f"❌ Coleção vazia: {collection}", err=True)
+        raise typer.Exit(code=1)
+    
+    rng = np.random.default_rng(42)
+    samples: List[Tuple[str, str]] = []
+    for row in rng.permutation(len(documents)):
+        tokens = documents[row].split()
+        if len(tokens) < words:
+            continue
+        start = int(rng.integers(0, len(tokens) - words + 1))
+        samples.append((" ".join(tokens[start:start + words]), documents[row]))
+        if len(samples) == queries:
+            break
+    
+    searcher = SemanticSearch(collection_name=collection, hybrid=True)
+    vectors = searcher.vectorstore.embeddings.embed_documents([query for query, _ in samples])
+    
+    typer.echo(f"{'caminho':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'acerto@k':>10}")
+    for path, weights in (("vetorial", (1.0, 0.0)), ("lexical", (0.0, 1.0)), ("híbrido", (1.0, 1.0))):
+        latencies = []
+        hits = 0
+        for (query, source), vector in zip(samples, vectors):
+            started = time.perf_counter()
+            found = searcher.search_hybrid_by_vector(query, vector, *weights)
+            latencies.append(time.perf_counter() - started)
+            hits += any(doc.page_content == source for doc, _ in found)
+        summary = latency_summary(latencies, sum(latencies))
+        typer.echo(
+            f"{path:<10} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+            f"{hits / len(samples):>10.3f}"
+        )
+
+
+@app.command()
+def context(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    queries: int = typer.Option(20, help="Consultas amostradas da coleção"),
+    max_tokens: int = typer.Option(1500, help="Orçamento de tokens do contexto"),
+) -> None:
+    """
+    Compara os tokens do contexto com todos os k chunks e com orçamento.
+    
+    As consultas são as primeiras frases de chunks da coleção; cada busca é
+    feita uma vez e os dois contextos são montados sobre os mesmos resultados.
+    """
+    with get_engine().connect() as conn:
+        documents = conn.execute(
+            text(
+                "SELECT document FROM langchain_pg_embedding WHERE collection_id = "
+                "(SELECT uuid FROM langchain_pg_collection WHERE name = :name) "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"name": collection, "limit": queries},
+        ).scalars().all()
+    if not documents:
+        typer.echo(f"❌ Coleção vazia: {collection}", err=True)
+        raise typer.Exit(code=1)
+    
+    searcher = SemanticSearch(collection_name=collection)
+    full_tokens: List[int] = []
+    packed_tokens: List[int] = []
+    merged = dropped = 0
+    elapsed = 0.0
+    for document in documents:
+        results = searcher.search(" ".join(document.split()[:12]))
+        full_tokens.append(count_tokens(format_context(results)))
+        started = time.perf_counter()
+        packed = pack_context(results, max_tokens)
+        elapsed += time.perf_counter() - started
+        packed_tokens.append(packed.tokens)
+        merged += packed.merged
+        dropped += packed.dropped
+    
+    typer.echo(f"Consultas: {len(documents)} | k={searcher.k} | orçamento={max_tokens}")
+    typer.echo(f"Tokens por pergunta (todos os chunks): {statistics.mean(full_tokens):.0f} (máx {max(full_tokens)})")
+    typer.echo(f"Tokens por pergunta (com orçamento):   {statistics.mean(packed_tokens):.0f} (máx {max(packed_tokens)})")
+    typer.echo(f"Chunks unidos: {merged} | fora do orçamento: {dropped}")
+    typer.echo(f"Montagem: {elapsed / len(documents) * 1000:.3f} ms por pergunta")
+
+
+@app.command()
+def rerank(
+    collection: str = typer.Option("rag_documents", help="Coleção já ingerida"),
+    reranker: str = typer.Option("bm25", help="Re-ranker: bm25 ou onnx (RERANK_MODEL_PATH)"),
+    candidates: int = typer.Option(50, help="Candidatos do 1º estágio"),
+    queries: int = typer.Option(50, help="Consultas amostradas da coleção"),
+    words: int = typer.Option(6, help="Palavras consecutivas de cada chunk usadas como consulta"),
+) -> None:
+    """
+    Mede latência e qualidade de cada estágio do re-ranking.
+    
+    Cada consulta é um trecho literal de um chunk da coleção; acerto@k é a
+    fração de consultas cujo chunk de origem está no resultado e MRR a média
+    de 1 / posição dele. "candidatos" mede o teto do re-ranker: o chunk de
+    origem entre os N trazidos pelo 1º estágio.
+    """
+    with get_engine().connect() as conn:
+        documents = conn.execute(
+            text(
+                "SELECT document FROM langchain_pg_embedding WHERE collection_id = "
+                "(SELECT uuid FROM langchain_pg_collection WHERE name = :name) "
+                "ORDER BY id"
+            ),
+            {"name": collection},
+        ).scalars().all()
+    if not documents:
+        typer.echo(f"❌ Coleção vazia: {collection}", err=True)
+        raise typer.Exit(code=1)
+    
+    rng = np.random.default_rng(42)
+    samples: List[Tuple[str, str]] = []
+    for row in rng.permutation(len(documents)):
+        tokens = documents[row].split()
+        if len(tokens) < words:
+            continue
+        start = int(rng.integers(0, len(tokens) - words + 1))
+        samples.append((" ".join(tokens[start:start + words]), documents[row]))
+        if len(samples) == queries:
+            break
+    
+    searcher = SemanticSearch(collection_name=collection)
+    scorer = Reranker(reranker)
+    vectors = searcher.vectorstore.embeddings.embed_documents([query for query, _ in samples])
+    
+    def quality(found: List[str], source: str) -> float:
+        return 1 / (found.index(source) + 1) if source in found else 0.0
+    
+    stages: Dict[str, Dict[str, List[float]]] = {
+        name: {"latency": [], "rr": []} for name in ("vetorial", "candidatos", "re-rank")
+    }
+    for (query, source), vector in zip(samples, vectors):
+        started = time.perf_counter()
+        top_k = searcher.search_by_vector(vector)
+        stages["vetorial"]["latency"].append(time.perf_counter() - started)
+        stages["vetorial"]["rr"].append(quality([doc.page_content for doc, _ in top_k], source))
+        
+        started = time.perf_counter()
+        pool, _ = searcher.fetch_candidates(vector, None, candidates)
+        stages["candidatos"]["latency"].append(time.perf_counter() - started)
+        stages["candidatos"]["rr"].append(quality([doc.page_content for doc, _ in pool], source))
+        
+        started = time.perf_counter()
+        ranked = scorer.rerank(query, pool, searcher.k)
+        stages["re-rank"]["latency"].append(time.perf_counter() - started)
+        stages["re-rank"]["rr"].append(quality([doc.page_content for doc, _ in ranked], source))
+    
+    typer.echo(f"Consultas: {len(samples)} | k={searcher.k} | candidatos={candidates} | re-ranker={reranker}")
+    typer.echo(f"{'estágio':<12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'acerto':>8} {'MRR':>8}")
+    for name, stage in stages.items():
+        summary = latency_summary(stage["latency"], sum(stage["latency"]))
+        hits = sum(rr > 0 for rr in stage["rr"]) / len(samples)
+        typer.echo(
+            f"{name:<12} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} "
+            f"{hits:>8.3f} {statistics.mean(stage['rr']):>8.3f}"
+        )
+
+
+class SimulatedEmbeddings(Embeddings):
+    """Provedor sintético: latência por chamada, limite de chamadas simultâneas e vetores aleatórios."""
+    
+    def __init__(self, dimensions: int, latency: float, concurrency: int):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._slots:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        rng = np.random.default_rng(len(texts))
+        return rng.standard_normal((len(texts), self.dimensions)).astype(np.float32).tolist()
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+@app.command()
+def microbatch(
+    requests: int = typer.Option(1000, help="Total de consultas"),
+    concurrency: int = typer.Option(100, help="Consultas simultâneas"),
+    latency_ms: float = typer.Option(80.0, help="Latência simulada de cada chamada ao provedor"),
+    provider_concurrency: int = typer.Option(8, help="Chamadas simultâneas aceitas pelo provedor"),
+    window_ms: float = typer.Option(5.0, help="Janela de agrupamento"),
+    max_batch_size: int = typer.Option(64, help="Máximo de textos por lote"),
+) -> None:
+    """
+    Compara embeddings de consultas concorrentes: uma chamada por consulta x micro-batching.
+    
+    Usa um provedor simulado (sem custo de API) com latência fixa e limite de
+    chamadas simultâneas, como o rate limit de um provedor real. Mede threads
+    (embed_query) e um event loop (aembed_query).
+    """
+    queries = [f"Qual o faturamento da empresa {i}?" for i in range(requests)]
+    
+    def run_threads(embeddings: Embeddings) -> Dict[str, float]:
+        def timed(query: str) -> float:
+            started = time.perf_counter()
+            embeddings.embed_query(query)
+            return time.perf_counter() - started
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, queries))
+        return latency_summary(latencies, time.perf_counter() - started)
+    
+    async def run_async(embeddings: Embeddings) -> Dict[str, float]:
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def timed(query: str) -> float:
+            async with semaphore:
+                started = time.perf_counter()
+                await embeddings.aembed_query(query)
+                return time.perf_counter() - started
+        
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(timed(q) for q in queries))
+        return latency_summary(list(latencies), time.perf_counter() - started)
+    
+    typer.echo(f"{'caminho':<28} {'chamadas':>9} {'req/s':>8} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    batchers: List[Tuple[str, BatchingEmbeddings]] = []
+    for mode in ("threads", "asyncio"):
+        for batched in (False, True):
+            provider = SimulatedEmbeddings(256, latency_ms / 1000, provider_concurrency)
+            embeddings: Embeddings = provider
+            if batched:
+                embeddings = BatchingEmbeddings(provider, window_ms, max_batch_size)
+                batchers.append((mode, embeddings))
+            row = run_threads(embeddings) if mode == "threads" else asyncio.run(run_async(embeddings))
+            name = f"{mode} {'micro-batching' if batched else 'uma por consulta'}"
+            typer.echo(
+                f"{name:<28} {provider.calls:>9} {row['rps']:>8.1f} "
+                f"{row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f}"
+            )
+    
+    for mode, batcher in batchers:
+        stats = batcher.stats()
+        typer.echo(f"\n📊 {mode}: fila máx {stats['max_queue_depth']}")
+        typer.echo(f"   tamanho dos lotes (≤N: lotes): {stats['batch_sizes']}")
+        typer.echo(f"   fila ao enfileirar (≤N: consultas): {stats['queue_depths']}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,277 @@
+"""
+Cache semântico de respostas.
+
+Guarda respostas do LLM (com o contexto usado) chaveadas pelo embedding da
+pergunta. Perguntas repetidas ou quase idênticas (similaridade de cosseno
+acima do limiar) reutilizam a resposta sem busca nem geração. Entradas são
+separadas por coleção e versão da coleção, de modo que uma reingestão as
+invalida; expiram por TTL e são despejadas por LRU.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    """
+    Resposta encontrada no cache.
+    
+    Attributes:
+        question: Pergunta original que gerou a resposta
+        answer: Resposta do LLM
+        context: Contexto usado na geração
+        similarity: Similaridade de cosseno com a pergunta atual
+    """
+    
+    question: str
+    answer: str
+    context: str
+    similarity: float
+
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+class AnswerCache:
+    """
+    Cache de respostas em SQLite com busca por similaridade.
+    
+    Attributes:
+        path: Caminho do arquivo SQLite
+        threshold: Similaridade mínima de cosseno para considerar acerto
+        max_entries: Máximo de respostas mantidas (despejo LRU)
+        ttl_seconds: Validade de uma resposta (0 = sem expiração)
+        hits: Perguntas respondidas pelo cache
+        misses: Perguntas sem resposta no cache
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+    ):
+        """
+        Abre (ou cria) o cache.
+        
+        Args:
+            path: Caminho do arquivo SQLite
+            threshold: Similaridade mínima de cosseno (0 a 1)
+            max_entries: Máximo de respostas mantidas
+            ttl_seconds: Validade de uma resposta (0 = sem expiração)
+            
+        Raises:
+            ValueError: Se parâmetros inválidos
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold deve estar em (0, 1]: {threshold}")
+        if max_entries <= 0:
+            raise ValueError(f"max_entries deve ser positivo: {max_entries}")
+        
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                collection TEXT NOT NULL,
+                version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                context TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_answers_collection ON answers (collection, version)"
+        )
+        self._conn.commit()
+    
+    def _expire(self, collection: str, version: str) -> None:
+        # Versões antigas da coleção nunca mais serão consultadas
+        self._conn.execute(
+            "DELETE FROM answers WHERE collection = ? AND version != ?", (collection, version)
+        )
+        if self.ttl_seconds:
+            self._conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+    
+    def lookup(
+        self, collection: str, version: str, embedding: List[float]
+    ) -> Optional[CachedAnswer]:
+        """
+        Procura a resposta da pergunta mais parecida.
+        
+        Args:
+            collection: Nome da coleção
+            version: Versão atual da coleção
+            embedding: Embedding da pergunta
+            
+        Returns:
+            CachedAnswer se a melhor similaridade atingir o limiar; senão None
+        """
+        query = _normalize(embedding)
+        
+        with self._lock:
+            self._expire(collection, version)
+            rows = self._conn.execute(
+                "SELECT id, question, vector, answer, context FROM answers "
+                "WHERE collection = ? AND version = ?",
+                (collection, version),
+            ).fetchall()
+            
+            best = None
+            if rows:
+                matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                scores = matrix @ query
+                index = int(np.argmax(scores))
+                if scores[index] >= self.threshold:
+                    best = (rows[index], float(scores[index]))
+            
+            if best is None:
+                self.misses += 1
+                self._conn.commit()
+                return None
+            
+            row, similarity = best
+            self._conn.execute(
+                "UPDATE answers SET last_access = ? WHERE id = ?", (time.time(), row[0])
+            )
+            self._conn.commit()
+            self.hits += 1
+        
+        return CachedAnswer(question=row[1], answer=row[3], context=row[4], similarity=similarity)
+    
+    def store(
+        self,
+        collection: str,
+        version: str,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        context: str,
+    ) -> None:
+        """
+        Grava uma resposta e aplica o despejo LRU.
+        
+        Args:
+            collection: Nome da coleção
+            version: Versão da coleção usada na geração
+            question: Pergunta do usuário
+            embedding: Embedding da pergunta
+            answer: Resposta do LLM
+            context: Contexto usado na geração
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers "
+                "(collection, version, question, vector, answer, context, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, version, question, _normalize(embedding).tobytes(), answer, context, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE id IN ("
+                    "SELECT id FROM answers ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+    
+    def clear(self, collection: Optional[str] = None) -> None:
+        """
+        Remove respostas de uma coleção (ou todas).
+        
+        Args:
+            collection: Nome da coleção (None = todas)
+        """
+        with self._lock:
+            if collection is None:
+                self._conn.execute("DELETE FROM answers")
+            else:
+                self._conn.execute("DELETE FROM answers WHERE collection = ?", (collection,))
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        return count
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna contadores do cache.
+        
+        Returns:
+            Dicionário com hits, misses e entries
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+    
+    def close(self) -> None:
+        """Fecha a conexão com o arquivo SQLite."""
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[str, AnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(path: Optional[str] = None, enabled: Optional[bool] = None) -> Optional[AnswerCache]:
+    """
+    Retorna o cache de respostas compartilhado do processo.
+    
+    Desativado por padrão: perguntas que diferem só por um número ou ano
+    (ex: "faturamento de 2023" e "de 2024") podem passar do limiar de
+    similaridade e receber a resposta da outra. Configurado por
+    ANSWER_CACHE_ENABLED (padrão: false), ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES e ANSWER_CACHE_TTL.
+    
+    Args:
+        path: Arquivo SQLite (padrão: ANSWER_CACHE_PATH ou .cache/answers.sqlite3)
+        enabled: Ativa/desativa o cache (padrão: ANSWER_CACHE_ENABLED)
+        
+    Returns:
+        Instância única de AnswerCache por caminho, ou None se desativado
+    """
+    if enabled is None:
+        enabled = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+    if not enabled:
+        return None
+    
+    path = path or os.getenv("ANSWER_CACHE_PATH", ".cache/answers.sqlite3")
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = AnswerCache(
+                path,
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            )
+        return _caches[path]
@@ -5,9 +5,15 @@ Permite fazer perguntas em linguagem natural e receber respostas
 baseadas no conteúdo dos documentos ingeridos.
 """
 
+import asyncio
+import json
 import os
 import sys
+import time
+import weakref
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # Adicionar diretório pai ao path para imports funcionarem
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -15,8 +21,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import typer
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
+from src.answer_cache import AnswerCache, CachedAnswer, get_answer_cache
+from src.db import collection_version
+from src.filters import build_filter
 from src.search import SemanticSearch
 
 load_dotenv()
@@ -66,36 +76,445 @@ PERGUNTA DO USUÁRIO:
 RESPONDA A "PERGUNTA DO USUÁRIO":"""
 
 
-def ask_llm(question: str, context: str) -> str:
+def build_messages(question: str, context: str) -> List[BaseMessage]:
     """
-    Envia pergunta ao LLM com contexto.
+    Monta mensagens (sistema + usuário) enviadas ao LLM.
     
     Args:
         question: Pergunta do usuário
         context: Contexto recuperado
         
     Returns:
-        Resposta do LLM
+        Lista de mensagens
+    """
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=build_prompt(context, question))
+    ]
+
+
+def build_llm() -> ChatOpenAI:
+    """
+    Cria o modelo de chat configurado em LLM_MODEL.
+    
+    LLM_TIMEOUT (segundos) e LLM_MAX_RETRIES ajustam o cliente HTTP. Cada
+    instância mantém seu próprio pool de conexões keep-alive; reutilize-a
+    (ver ChatSession) para não refazer conexões e handshakes TLS.
+    
+    Returns:
+        Instância de ChatOpenAI
     """
     llm_model = os.getenv("LLM_MODEL", "gpt-5-nano")
+    timeout = os.getenv("LLM_TIMEOUT")
     
-    llm = ChatOpenAI(
+    return ChatOpenAI(
         model=llm_model,
         temperature=0,  # Determinístico
+        timeout=float(timeout) if timeout else None,
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
     )
+
+
+def ask_llm(question: str, context: str) -> str:
+    """
+    Envia pergunta ao LLM com contexto.
     
-    messages = [
-        SystemMessage(content=SYSTEM_PROMPT),
-        HumanMessage(content=build_prompt(context, question))
-    ]
+    Args:
+        question: Pergunta do usuário
+        context: Contexto recuperado
+        
+    Returns:
+        Resposta do LLM
+    """
+    response = build_llm().invoke(build_messages(question, context))
+    return response.content
+
+
+@dataclass
+class GenerationStats:
+    """
+    Tempos de geração de uma resposta.
+    
+    Attributes:
+        time_to_first_token: Segundos até o primeiro token (None se resposta vazia)
+        total_seconds: Segundos até o fim da geração
+    """
+    
+    time_to_first_token: Optional[float]
+    total_seconds: float
+
+
+def stream_llm(
+    question: str,
+    context: str,
+    on_token: Callable[[str], None],
+    llm: Optional[BaseChatModel] = None,
+) -> Tuple[str, GenerationStats]:
+    """
+    Envia pergunta ao LLM e repassa os tokens à medida que chegam.
+    
+    Args:
+        question: Pergunta do usuário
+        context: Contexto recuperado
+        on_token: Chamado com cada trecho de texto recebido
+        llm: Modelo de chat (padrão: novo cliente via build_llm)
+        
+    Returns:
+        Tupla (resposta completa, tempos de geração)
+    """
+    llm = llm or build_llm()
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    
+    for chunk in llm.stream(build_messages(question, context)):
+        text = chunk.content
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        parts.append(text)
+        on_token(text)
     
-    response = llm.invoke(messages)
+    total = time.perf_counter() - started
+    ttft = first_token_at - started if first_token_at is not None else None
+    return "".join(parts), GenerationStats(time_to_first_token=ttft, total_seconds=total)
+
+
+# Clientes assíncronos por event loop (o pool HTTP pertence ao loop que o criou)
+_async_llms: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BaseChatModel]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_llm() -> BaseChatModel:
+    """
+    Retorna o cliente do LLM compartilhado pelo event loop corrente.
+    
+    Criado na primeira chamada em cada loop (via build_llm) e reutilizado
+    pelas seguintes, mantendo as conexões keep-alive com o provedor.
+    
+    Returns:
+        Modelo de chat do loop corrente
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_llms:
+        _async_llms[loop] = build_llm()
+    return _async_llms[loop]
+
+
+async def aask_llm(question: str, context: str, llm: Optional[BaseChatModel] = None) -> str:
+    """
+    Versão assíncrona de `ask_llm` (não bloqueia o event loop).
+    
+    Args:
+        question: Pergunta do usuário
+        context: Contexto recuperado
+        llm: Modelo de chat (padrão: cliente compartilhado do loop, ver `get_async_llm`)
+        
+    Returns:
+        Resposta do LLM
+    """
+    llm = llm or get_async_llm()
+    response = await llm.ainvoke(build_messages(question, context))
     return response.content
 
 
+@dataclass
+class AnswerTimings:
+    """
+    Decomposição da latência de uma resposta, em segundos.
+    
+    Attributes:
+        setup: Criação de clientes paga nesta pergunta (só na primeira da sessão)
+        embed: Embedding da pergunta
+        retrieve: Busca vetorial no banco
+        generate: Geração da resposta pelo LLM
+        time_to_first_token: Até o primeiro token (apenas em streaming)
+        context_tokens: Tokens do contexto enviado ao LLM (None se não houve busca)
+    """
+    
+    setup: float = 0.0
+    embed: float = 0.0
+    retrieve: float = 0.0
+    generate: float = 0.0
+    time_to_first_token: Optional[float] = None
+    context_tokens: Optional[int] = None
+    
+    @property
+    def total(self) -> float:
+        return self.setup + self.embed + self.retrieve + self.generate
+    
+    def describe(self) -> str:
+        """Resumo de uma linha para exibição."""
+        parts = [
+            f"embed {self.embed:.2f}s",
+            f"busca {self.retrieve:.2f}s",
+            f"geração {self.generate:.2f}s",
+        ]
+        if self.time_to_first_token is not None:
+            parts[-1] += f" (primeiro token {self.time_to_first_token:.2f}s)"
+        if self.setup:
+            parts.insert(0, f"setup {self.setup:.2f}s")
+        if self.context_tokens is not None:
+            parts.append(f"contexto {self.context_tokens} tokens")
+        return " | ".join(parts)
+
+
+class ChatSession:
+    """
+    Sessão de chat: busca semântica + cliente LLM de longa duração.
+    
+    Busca e cliente são criados uma única vez (na primeira pergunta) e
+    reutilizados, mantendo conexões HTTP keep-alive com o provedor.
+    
+    Attributes:
+        collection_name: Coleção consultada
+        filter: Filtro de metadata aplicado a todas as buscas da sessão
+        last_timings: Latências da última pergunta
+    """
+    
+    def __init__(
+        self,
+        collection_name: str = "rag_documents",
+        llm: Optional[BaseChatModel] = None,
+        searcher: Optional[SemanticSearch] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Cria a sessão.
+        
+        Args:
+            collection_name: Nome da coleção no PGVector
+            llm: Modelo de chat (padrão: build_llm na primeira pergunta)
+            searcher: Busca semântica (padrão: SemanticSearch da coleção)
+            answer_cache: Cache semântico de respostas (None = desativado)
+            filter: Filtro de metadata das buscas (ver `src.filters`)
+        """
+        self.collection_name = collection_name
+        self.filter = filter
+        self.answer_cache = answer_cache
+        self._llm = llm
+        self._searcher = searcher
+        self._setup = 0.0
+        self.last_timings: Optional[AnswerTimings] = None
+        
+        # Pergunta corrente: embedding e versão da coleção reaproveitados
+        # entre cached_answer, get_context e a gravação no cache
+        self._question: Optional[str] = None
+        self._embedding: Optional[List[float]] = None
+        self._version: Optional[str] = None
+    
+    @property
+    def llm(self) -> BaseChatModel:
+        if self._llm is None:
+            started = time.perf_counter()
+            self._llm = build_llm()
+            self._setup += time.perf_counter() - started
+        return self._llm
+    
+    @property
+    def searcher(self) -> SemanticSearch:
+        if self._searcher is None:
+            started = time.perf_counter()
+            self._searcher = SemanticSearch(collection_name=self.collection_name)
+            self._setup += time.perf_counter() - started
+        return self._searcher
+    
+    def _timings_for(self, question: str) -> AnswerTimings:
+        # Mesma pergunta ainda sem resposta: acumula nos tempos já medidos
+        timings = self.last_timings
+        if question != self._question or timings is None or timings.generate:
+            timings = AnswerTimings()
+            self.last_timings = timings
+            self._question = question
+            self._embedding = None
+            self._version = None
+        return timings
+    
+    @property
+    def _cache_scope(self) -> str:
+        # Filtro e parâmetros de recuperação mudam o contexto enviado ao LLM:
+        # cada combinação tem escopo próprio no cache
+        searcher = self.searcher
+        reranker = getattr(searcher, "reranker", None)
+        settings: Dict[str, Any] = {
+            "k": getattr(searcher, "k", None),
+            "max_context_tokens": getattr(searcher, "max_context_tokens", None),
+            "backend": getattr(searcher, "backend", None),
+            "quantization": getattr(searcher, "quantization", None),
+        }
+        if getattr(searcher, "reranks", False):
+            settings["coarse"] = [searcher.coarse_dimensions, searcher.rerank_factor]
+        if getattr(searcher, "hybrid", False):
+            settings["hybrid"] = [searcher.vector_weight, searcher.text_weight]
+        if getattr(searcher, "mmr", False):
+            settings["mmr"] = [searcher.fetch_k, searcher.mmr_lambda]
+        if reranker is not None:
+            settings["reranker"] = [reranker.method, searcher.rerank_candidates]
+        if self.filter:
+            settings["filter"] = self.filter
+        return f"{self.collection_name}|{json.dumps(settings, sort_keys=True, ensure_ascii=False)}"
+    
+    def _consume_setup(self, timings: AnswerTimings) -> None:
+        timings.setup += self._setup
+        self._setup = 0.0
+    
+    def _embed(self, question: str, timings: AnswerTimings) -> List[float]:
+        if self._embedding is None:
+            searcher = self.searcher
+            started = time.perf_counter()
+            self._embedding = searcher.embed_query(question)
+            timings.embed += time.perf_counter() - started
+        return self._embedding
+    
+    def cached_answer(self, question: str) -> Optional[CachedAnswer]:
+        """
+        Procura resposta para a pergunta (ou uma quase idêntica) no cache.
+        
+        O embedding calculado aqui é reaproveitado por `get_context`.
+        
+        Args:
+            question: Pergunta do usuário
+            
+        Returns:
+            CachedAnswer em caso de acerto; None se não houver ou cache desativado
+        """
+        if self.answer_cache is None:
+            return None
+        
+        timings = self._timings_for(question)
+        embedding = self._embed(question, timings)
+        self._consume_setup(timings)
+        
+        started = time.perf_counter()
+        self._version = collection_version(self.collection_name)
+        hit = None
+        if self._version is not None:
+            hit = self.answer_cache.lookup(self._cache_scope, self._version, embedding)
+        timings.retrieve += time.perf_counter() - started
+        return hit
+    
+    def get_context(self, question: str) -> str:
+        """
+        Recupera o contexto da pergunta, medindo embed e busca.
+        
+        Seleciona os chunks como `SemanticSearch.get_context` (MMR ou
+        re-ranker, se configurados; senão busca híbrida ou vetorial), pelo
+        cache de resultados da busca. O contexto respeita o orçamento
+        `max_context_tokens` da busca; os tokens usados ficam em
+        `last_timings.context_tokens`.
+        
+        Args:
+            question: Pergunta do usuário
+            
+        Returns:
+            String com contexto dos chunks encontrados
+        """
+        timings = self._timings_for(question)
+        embedding = self._embed(question, timings)
+        
+        # Entradas por texto: perguntas repetidas saem do cache de resultados
+        searcher = self.searcher
+        started = time.perf_counter()
+        if searcher.mmr:
+            results = searcher.search_mmr(question, filter=self.filter, embedding=embedding)
+        elif searcher.reranker is not None:
+            results = searcher.search_reranked(question, filter=self.filter, embedding=embedding)
+        else:
+            results = searcher.search(question, filter=self.filter, embedding=embedding)
+        packed = searcher.build_context(results)
+        timings.retrieve += time.perf_counter() - started
+        timings.context_tokens = packed.tokens
+        
+        self._consume_setup(timings)
+        return packed.text
+    
+    def _remember(self, question: str, context: str, answer: str, timings: AnswerTimings) -> None:
+        if self.answer_cache is None or not answer:
+            return
+        embedding = self._embed(question, timings)
+        version = self._version or collection_version(self.collection_name)
+        if version is not None:
+            self.answer_cache.store(
+                self._cache_scope, version, question, embedding, answer, context
+            )
+    
+    def ask(self, question: str, context: str) -> str:
+        """
+        Gera a resposta com o cliente da sessão.
+        
+        Args:
+            question: Pergunta do usuário
+            context: Contexto recuperado
+            
+        Returns:
+            Resposta do LLM
+        """
+        timings = self._timings_for(question)
+        llm = self.llm
+        self._consume_setup(timings)
+        
+        started = time.perf_counter()
+        response = llm.invoke(build_messages(question, context))
+        timings.generate = time.perf_counter() - started
+        
+        self._remember(question, context, response.content, timings)
+        return response.content
+    
+    def stream(self, question: str, context: str, on_token: Callable[[str], None]) -> str:
+        """
+        Gera a resposta em streaming com o cliente da sessão.
+        
+        Args:
+            question: Pergunta do usuário
+            context: Contexto recuperado
+            on_token: Chamado com cada trecho de texto recebido
+            
+        Returns:
+            Resposta completa
+        """
+        timings = self._timings_for(question)
+        llm = self.llm
+        self._consume_setup(timings)
+        
+        answer, stats = stream_llm(question, context, on_token, llm=llm)
+        timings.generate = stats.total_seconds
+        timings.time_to_first_token = stats.time_to_first_token
+        
+        self._remember(question, context, answer, timings)
+        return answer
+    
+    async def aask(self, question: str, context: str) -> str:
+        """
+        Versão assíncrona de `ask`.
+        
+        Args:
+            question: Pergunta do usuário
+            context: Contexto recuperado
+            
+        Returns:
+            Resposta do LLM
+        """
+        response = await self.llm.ainvoke(build_messages(question, context))
+        return response.content
+
+
 @app.command()
 def main(
     collection: str = typer.Option("rag_documents", help="Coleção no banco"),
+    stream: bool = typer.Option(True, help="Exibe tokens à medida que são gerados"),
+    use_cache: Optional[bool] = typer.Option(
+        None, "--cache/--no-cache", help="Usa o cache semântico de respostas (padrão: ANSWER_CACHE_ENABLED)"
+    ),
+    source: List[str] = typer.Option([], "--source", help="Busca só neste PDF de origem (repita para vários)"),
+    page_from: Optional[int] = typer.Option(None, help="Busca a partir desta página (base 0)"),
+    page_to: Optional[int] = typer.Option(None, help="Busca até esta página, inclusive"),
+    ingested_after: Optional[str] = typer.Option(
+        None, help="Busca chunks ingeridos a partir da data ISO (ex: 2026-01-31)"
+    ),
+    tag: List[str] = typer.Option([], "--tag", help="Busca só chunks com esta tag (repita para várias)"),
 ):
     """
     Inicia chat interativo com o sistema RAG.
@@ -106,14 +525,19 @@ def main(
     Exemplo:
         python src/chat.py
         python src/chat.py --collection custom_docs
+        python src/chat.py --no-stream
+        python src/chat.py --cache
+        python src/chat.py --source relatorios/2024.pdf --tag financeiro
     """
     typer.echo("🤖 Sistema de Busca Semântica")
     typer.echo("=" * 50)
     typer.echo("Digite 'quit', 'exit' ou 'sair' para encerrar\n")
     
     try:
-        # Inicializar busca
-        searcher = SemanticSearch(collection_name=collection)
+        # Sessão única: busca e cliente LLM reutilizados entre perguntas
+        answer_cache = get_answer_cache(enabled=use_cache)
+        filter = build_filter(source, page_from, page_to, ingested_after, tag)
+        session = ChatSession(collection_name=collection, answer_cache=answer_cache, filter=filter)
         
         while True:
             # Solicitar pergunta
@@ -121,6 +545,12 @@ def main(
             
             # Comandos de saída
             if question.lower() in ["quit", "exit", "sair"]:
+                if answer_cache is not None:
+                    stats = answer_cache.stats()
+                    typer.echo(
+                        f"\n🗃️  Cache de respostas: {stats['hits']} hits, "
+                        f"{stats['misses']} misses ({stats['entries']} entradas)"
+                    )
                 typer.echo("\n👋 Até logo!")
                 break
             
@@ -132,8 +562,19 @@ def main(
             try:
                 typer.echo("\n🔍 Buscando informações...")
                 
+                # Pergunta já respondida (ou quase idêntica)
+                cached = session.cached_answer(question)
+                if cached is not None:
+                    typer.echo(f"⚡ Resposta em cache (similaridade {cached.similarity:.2f})")
+                    typer.echo("\n📝 RESPOSTA:")
+                    typer.echo("-" * 50)
+                    typer.echo(cached.answer)
+                    typer.echo("-" * 50)
+                    typer.echo(f"⏱️  {session.last_timings.describe()}")
+                    continue
+                
                 # Buscar contexto
-                context = searcher.get_context(question)
+                context = session.get_context(question)
                 
                 if not context:
                     typer.echo("⚠️  Nenhum contexto encontrado no banco de dados.")
@@ -142,19 +583,29 @@ def main(
                 
                 typer.echo("💭 Gerando resposta...")
                 
-                # Perguntar ao LLM
-                answer = ask_llm(question, context)
-                
-                # Exibir resposta
-                typer.echo("\n📝 RESPOSTA:")
-                typer.echo("-" * 50)
-                typer.echo(answer)
-                typer.echo("-" * 50)
+                if stream:
+                    # Exibir tokens conforme chegam
+                    typer.echo("\n📝 RESPOSTA:")
+                    typer.echo("-" * 50)
+                    session.stream(question, context, on_token=lambda text: typer.echo(text, nl=False))
+                    typer.echo()
+                    typer.echo("-" * 50)
+                else:
+                    # Perguntar ao LLM
+                    answer = session.ask(question, context)
+                    
+                    # Exibir resposta
+                    typer.echo("\n📝 RESPOSTA:")
+                    typer.echo("-" * 50)
+                    typer.echo(answer)
+                    typer.echo("-" * 50)
                 
+                typer.echo(f"⏱️  {session.last_timings.describe()}")
+            
             except Exception as e:
                 typer.echo(f"\n❌ Erro ao processar pergunta: {e}", err=True)
                 typer.echo("Tente novamente ou digite 'quit' para sair.")
-                
+    
     except KeyboardInterrupt:
         typer.echo("\n\n👋 Interrompido pelo usuário. Até logo!")
         sys.exit(0)
@@ -0,0 +1,196 @@
+"""
+Montagem do contexto enviado ao LLM com orçamento de tokens.
+
+Em vez de concatenar sempre os k chunks encontrados, o contexto é
+empacotado em ordem de relevância até `CONTEXT_MAX_TOKENS`:
+
+- a contagem de cada chunk vem da metadata `tokens`, gravada na ingestão
+  (chunks antigos são contados na hora);
+- chunks da mesma página que se sobrepõem (overlap do chunking) viram um
+  único trecho, sem repetir o texto em comum; duplicatas exatas somem;
+- chunks que não cabem são pulados, e os seguintes ainda podem caber.
+
+Tokens são contados com `tiktoken` (encoding `CONTEXT_TOKENIZER`). Se o
+encoding não puder ser carregado (ex: servidor sem acesso à internet e sem
+`TIKTOKEN_CACHE_DIR`), usa-se a estimativa de 4 caracteres por token.
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.documents import Document
+
+# Encoding dos modelos gpt-4o / gpt-5
+DEFAULT_ENCODING = "o200k_base"
+
+# Estimativa usada quando o encoding não está disponível
+CHARS_PER_TOKEN = 4
+
+# Menor sobreposição aceita para unir dois chunks
+MIN_OVERLAP = 20
+
+SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: Optional[str] = None) -> Optional[Any]:
+    """
+    Carrega (uma vez por processo) o encoding do tokenizador.
+    
+    Args:
+        name: Nome do encoding (padrão: CONTEXT_TOKENIZER ou o200k_base)
+        
+    Returns:
+        Encoding do tiktoken ou None se não puder ser baixado
+        
+    Raises:
+        ValueError: Se o encoding não existir
+    """
+    try:
+        return tiktoken.get_encoding(name or os.getenv("CONTEXT_TOKENIZER", DEFAULT_ENCODING))
+    except OSError:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Conta os tokens de um texto.
+    
+    Args:
+        text: Texto a contar
+        
+    Returns:
+        Quantidade de tokens (estimada se o encoding não estiver disponível)
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def chunk_tokens(doc: Document) -> int:
+    """Tokens do chunk: contagem gravada na ingestão ou contada na hora."""
+    tokens = doc.metadata.get("tokens")
+    if isinstance(tokens, int) and not isinstance(tokens, bool):
+        return tokens
+    return count_tokens(doc.page_content)
+
+
+def merge_overlap(first: str, second: str, max_overlap: Optional[int] = None) -> Optional[str]:
+    """
+    Une dois chunks se o fim do primeiro for o começo do segundo.
+    
+    Args:
+        first: Chunk que vem antes no documento
+        second: Chunk que vem depois
+        max_overlap: Maior sobreposição procurada (padrão: CHUNK_OVERLAP)
+        
+    Returns:
+        Texto unido (o primeiro, se já contiver o segundo) ou None
+    """
+    if second in first:
+        return first
+    if max_overlap is None:
+        max_overlap = int(os.getenv("CHUNK_OVERLAP", "150"))
+    
+    for size in range(min(max_overlap, len(first), len(second) - 1), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+
+@dataclass
+class PackedContext:
+    """
+    Contexto montado para uma pergunta.
+    
+    Attributes:
+        text: Contexto no formato enviado ao LLM ("" se nada coube)
+        tokens: Tokens do contexto, incluindo rótulos e separadores
+        chunks: Chunks incluídos (inclusive os unidos a outro trecho)
+        merged: Chunks unidos a um trecho vizinho ou descartados como duplicata
+        dropped: Chunks que não couberam no orçamento
+    """
+    
+    text: str = ""
+    tokens: int = 0
+    chunks: int = 0
+    merged: int = 0
+    dropped: int = 0
+
+
+def pack_context(
+    results: List[Tuple[Document, float]], max_tokens: Optional[int] = None
+) -> PackedContext:
+    """
+    Empacota os chunks, em ordem de relevância, dentro do orçamento de tokens.
+    
+    A contagem de trechos unidos é a soma das partes menos o overlap, sem
+    retokenizar o texto inteiro (pode diferir em um token por junção).
+    
+    Args:
+        results: Lista de tuplas (documento, score), mais relevantes primeiro
+        max_tokens: Orçamento de tokens (None ou 0 = sem limite)
+        
+    Returns:
+        PackedContext com o texto e as estatísticas da montagem
+    """
+    packed = PackedContext()
+    texts: List[str] = []
+    pages: List[Tuple[Any, Any]] = []
+    sizes: List[int] = []
+    separator = count_tokens(SEPARATOR)
+    
+    for doc, _ in results:
+        content = doc.page_content
+        page = (doc.metadata.get("source"), doc.metadata.get("page"))
+        tokens = chunk_tokens(doc)
+        remaining = max_tokens - packed.tokens if max_tokens else None
+        
+        # Mesma página: tenta unir ao trecho já escolhido, pagando só o texto novo
+        joined = False
+        for i, text in enumerate(texts):
+            if pages[i] != page:
+                continue
+            merged = merge_overlap(text, content)
+            if merged is not None:
+                added = len(merged) - len(text)
+                extra = count_tokens(merged[-added:]) if added else 0
+            else:
+                merged = merge_overlap(content, text)
+                if merged is None:
+                    continue
+                if merged == content:
+                    # O trecho escolhido está contido no chunk novo
+                    extra = max(tokens - sizes[i], 0)
+                else:
+                    extra = count_tokens(merged[:len(merged) - len(text)])
+            if remaining is not None and extra > remaining:
+                continue
+            texts[i] = merged
+            sizes[i] += extra
+            packed.tokens += extra
+            packed.chunks += 1
+            packed.merged += 1
+            joined = True
+            break
+        if joined:
+            continue
+        
+        label = f"[Chunk {len(texts) + 1}] "
+        cost = count_tokens(label) + tokens + (separator if texts else 0)
+        if remaining is not None and cost > remaining:
+            packed.dropped += 1
+            continue
+        texts.append(content)
+        pages.append(page)
+        sizes.append(tokens)
+        packed.tokens += cost
+        packed.chunks += 1
+    
+    packed.text = SEPARATOR.join(f"[Chunk {i}] {text}" for i, text in enumerate(texts, 1))
+    return packed
@@ -0,0 +1,714 @@
+"""
+Utilitários de acesso ao PostgreSQL.
+
+Concentra a configuração de conexão e os recursos compartilhados do
+processo: pools psycopg 3, engines SQLAlchemy sobre esses pools e
+instâncias de PGVector reutilizadas entre buscas, nas versões síncrona e
+assíncrona (asyncio).
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_postgres import PGVector
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.embedding_cache import get_embeddings
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+COLLECTION_TABLE = "langchain_pg_collection"
+
+# Representação usada para indexar/buscar os vetores de uma coleção
+QUANTIZATIONS = ("none", "halfvec", "binary")
+
+# Busca lexical: coluna tsvector gerada a partir de document (índice GIN)
+TEXT_SEARCH_CONFIG = "portuguese"
+TSVECTOR_COLUMN = "document_tsv"
+TEXT_INDEX = "ix_embedding_document_tsv"
+
+# Campos de metadata com índice btree para filtros de intervalo (src.filters);
+# igualdade e contenção usam o índice GIN criado pelo langchain_postgres
+INDEXED_METADATA = ("page", "ingested_at")
+
+
+def get_database_url() -> str:
+    """
+    Lê DATABASE_URL do ambiente.
+    
+    Returns:
+        URL de conexão no formato SQLAlchemy (postgresql+psycopg://...)
+        
+    Raises:
+        ValueError: Se DATABASE_URL não configurada
+    """
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL não configurada no .env")
+    return database_url
+
+
+def psycopg_conninfo(database_url: Optional[str] = None) -> str:
+    """
+    Converte a URL do SQLAlchemy em conninfo aceito pelo psycopg.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        URL sem o sufixo de driver (postgresql://...)
+    """
+    database_url = database_url or get_database_url()
+    scheme, sep, rest = database_url.partition("://")
+    return f"{scheme.split('+')[0]}{sep}{rest}"
+
+
+def pool_sizes() -> Tuple[int, int]:
+    """
+    Lê os limites do pool de conexões do ambiente.
+    
+    Returns:
+        Tupla (DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE), padrão (1, 10)
+        
+    Raises:
+        ValueError: Se os limites forem inválidos
+    """
+    min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    if min_size < 0 or max_size < 1 or min_size > max_size:
+        raise ValueError(
+            f"Limites de pool inválidos: DB_POOL_MIN_SIZE={min_size}, DB_POOL_MAX_SIZE={max_size}"
+        )
+    return min_size, max_size
+
+
+_lock = threading.RLock()
+_pools: Dict[str, ConnectionPool] = {}
+_engines: Dict[str, Engine] = {}
+_vectorstores: Dict[Tuple[str, str, str], PGVector] = {}
+# Quantização por (URL, coleção); descartada a cada escrita da coleção
+_quantizations: Dict[Tuple[str, str], str] = {}
+_schema_ready: Set[Tuple[str, str]] = set()
+
+
+def get_pool(database_url: Optional[str] = None) -> ConnectionPool:
+    """
+    Retorna o pool psycopg compartilhado do processo para uma URL.
+    
+    Conexões são verificadas (health check) ao sair do pool, e fechar uma
+    conexão a devolve ao pool em vez de encerrá-la.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Instância única de ConnectionPool por URL
+    """
+    conninfo = psycopg_conninfo(database_url)
+    with _lock:
+        if conninfo not in _pools:
+            min_size, max_size = pool_sizes()
+            _pools[conninfo] = ConnectionPool(
+                conninfo,
+                min_size=min_size,
+                max_size=max_size,
+                check=ConnectionPool.check_connection,
+                close_returns=True,
+                name="rag",
+                open=True,
+            )
+        return _pools[conninfo]
+
+
+def get_engine(database_url: Optional[str] = None) -> Engine:
+    """
+    Retorna a engine SQLAlchemy compartilhada, apoiada no pool psycopg.
+    
+    O pool do SQLAlchemy é desativado (NullPool): quem controla tamanho,
+    reuso e verificação das conexões é o psycopg_pool.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Instância única de Engine por URL
+    """
+    database_url = database_url or get_database_url()
+    with _lock:
+        if database_url not in _engines:
+            pool = get_pool(database_url)
+            _engines[database_url] = create_engine(
+                "postgresql+psycopg://", creator=pool.getconn, poolclass=NullPool
+            )
+        return _engines[database_url]
+
+
+def get_vectorstore(
+    collection_name: str = "rag_documents",
+    embedding_model: Optional[str] = None,
+    database_url: Optional[str] = None,
+) -> PGVector:
+    """
+    Retorna o PGVector compartilhado do processo.
+    
+    Instâncias são chaveadas por (URL, coleção, modelo de embeddings), de
+    modo que só a primeira chamada cria a coleção e o modelo.
+    
+    Args:
+        collection_name: Nome da coleção no banco
+        embedding_model: Modelo de embeddings (padrão: EMBEDDING_MODEL)
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Instância de PGVector
+        
+    Raises:
+        ValueError: Se DATABASE_URL não configurada
+    """
+    database_url = database_url or get_database_url()
+    embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    key = (database_url, collection_name, embedding_model)
+    
+    with _lock:
+        if key not in _vectorstores:
+            _vectorstores[key] = PGVector(
+                embeddings=get_embeddings(embedding_model),
+                collection_name=collection_name,
+                connection=get_engine(database_url),
+                use_jsonb=True,
+            )
+        return _vectorstores[key]
+
+
+# Versão da coleção (parâmetro :name)
+_VERSION_QUERY = (
+    f"SELECT uuid, COALESCE(cmetadata->>'version', '0') FROM {COLLECTION_TABLE} WHERE name = :name"
+)
+
+
+def collection_version(collection_name: str, database_url: Optional[str] = None) -> Optional[str]:
+    """
+    Lê a versão atual de uma coleção.
+    
+    A versão combina o uuid da coleção com um contador incrementado a cada
+    escrita da ingestão (ver `bump_collection_version`); recriar a coleção
+    também gera versão nova. Caches derivados do conteúdo da coleção usam
+    esse valor para se invalidar.
+    
+    Args:
+        collection_name: Nome da coleção
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Versão opaca ("<uuid>:<contador>") ou None se a coleção não existir
+    """
+    with get_engine(database_url).connect() as conn:
+        row = conn.execute(text(_VERSION_QUERY), {"name": collection_name}).fetchone()
+    return f"{row[0]}:{row[1]}" if row else None
+
+
+async def acollection_version(
+    collection_name: str, database_url: Optional[str] = None
+) -> Optional[str]:
+    """
+    Versão assíncrona de `collection_version`, pelo pool assíncrono.
+    
+    Args:
+        collection_name: Nome da coleção
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Versão opaca ("<uuid>:<contador>") ou None se a coleção não existir
+    """
+    engine = await get_async_engine(database_url)
+    async with engine.connect() as conn:
+        row = (await conn.execute(text(_VERSION_QUERY), {"name": collection_name})).fetchone()
+    return f"{row[0]}:{row[1]}" if row else None
+
+
+def bump_collection_version(collection_name: str, database_url: Optional[str] = None) -> None:
+    """
+    Incrementa o contador de versão da coleção (chamado após escritas).
+    
+    Args:
+        collection_name: Nome da coleção
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+    """
+    with get_engine(database_url).begin() as conn:
+        conn.execute(
+            text(
+                f"UPDATE {COLLECTION_TABLE} SET cmetadata = jsonb_set("
+                "CASE WHEN json_typeof(cmetadata) = 'object' THEN cmetadata::jsonb "
+                "ELSE '{}'::jsonb END, '{version}', "
+                "to_jsonb(COALESCE((cmetadata->>'version')::bigint, 0) + 1))::json "
+                "WHERE name = :name"
+            ),
+            {"name": collection_name},
+        )
+    _forget_quantization(collection_name, database_url)
+
+
+def _forget_quantization(collection_name: str, database_url: Optional[str]) -> None:
+    with _lock:
+        _quantizations.pop((database_url or get_database_url(), collection_name), None)
+
+
+def _validate_quantization(quantization: str) -> None:
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(
+            f"Quantização inválida: {quantization} (opções: {', '.join(QUANTIZATIONS)})"
+        )
+
+
+def coarse_expression(column: str, dimensions: int) -> str:
+    """
+    Expressão SQL do prefixo de um vetor (primeiras N dimensões).
+    
+    Embeddings treinados com Matryoshka (text-embedding-3) mantêm boa
+    qualidade quando truncados; a distância de cosseno dispensa renormalizar.
+    
+    Args:
+        column: Expressão SQL do vetor completo
+        dimensions: Dimensões mantidas
+        
+    Returns:
+        Expressão do tipo vector(N)
+    """
+    return f"(({column})::real[])[1:{dimensions}]::vector({dimensions})"
+
+
+def quantized_expression(quantization: str, dimensions: int, column: str) -> str:
+    """
+    Expressão SQL do vetor na representação da quantização.
+    
+    É a expressão indexada por `src/index.py` e usada na ordenação da busca,
+    para que o planejador use o índice.
+    
+    Args:
+        quantization: "none", "halfvec" ou "binary"
+        dimensions: Dimensão dos vetores
+        column: Expressão SQL do vetor (tipo vector)
+        
+    Returns:
+        Expressão do tipo vector, halfvec ou bit
+        
+    Raises:
+        ValueError: Se quantização inválida
+    """
+    _validate_quantization(quantization)
+    if quantization == "halfvec":
+        return f"({column})::halfvec({dimensions})"
+    if quantization == "binary":
+        return f"binary_quantize({column})::bit({dimensions})"
+    return column
+
+
+def quantized_distance(quantization: str, dimensions: int, column: str, query: str) -> str:
+    """
+    Expressão SQL de distância usada para ordenar a busca.
+    
+    Args:
+        quantization: "none", "halfvec" ou "binary"
+        dimensions: Dimensão dos vetores
+        column: Expressão SQL do vetor armazenado
+        query: Expressão SQL do vetor da query (tipo vector)
+        
+    Returns:
+        Distância de cosseno (none/halfvec) ou de Hamming (binary)
+        
+    Raises:
+        ValueError: Se quantização inválida
+    """
+    operator = "<~>" if quantization == "binary" else "<=>"
+    return (
+        f"{quantized_expression(quantization, dimensions, column)} {operator} "
+        f"{quantized_expression(quantization, dimensions, query)}"
+    )
+
+
+def collection_quantization(collection_name: str, database_url: Optional[str] = None) -> str:
+    """
+    Lê a quantização configurada para uma coleção.
+    
+    O valor fica em memória por processo (criar outra busca da mesma coleção
+    não consulta o banco) e é descartado quando este processo grava a
+    coleção (`set_collection_quantization`, `bump_collection_version`).
+    
+    Args:
+        collection_name: Nome da coleção
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        "none", "halfvec" ou "binary" ("none" se não configurada)
+    """
+    key = (database_url or get_database_url(), collection_name)
+    with _lock:
+        if key in _quantizations:
+            return _quantizations[key]
+    
+    with get_engine(database_url).connect() as conn:
+        value = conn.execute(
+            text(f"SELECT cmetadata->>'quantization' FROM {COLLECTION_TABLE} WHERE name = :name"),
+            {"name": collection_name},
+        ).scalar()
+    with _lock:
+        _quantizations[key] = value or "none"
+    return value or "none"
+
+
+def set_collection_quantization(
+    collection_name: str, quantization: str, database_url: Optional[str] = None
+) -> None:
+    """
+    Configura a quantização de uma coleção e invalida caches derivados.
+    
+    Args:
+        collection_name: Nome da coleção (já criada)
+        quantization: "none", "halfvec" ou "binary"
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Raises:
+        ValueError: Se quantização inválida
+    """
+    _validate_quantization(quantization)
+    set_collection_metadata(collection_name, {"quantization": quantization}, database_url)
+    bump_collection_version(collection_name, database_url)
+
+
+def collection_metadata(collection_name: str, database_url: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lê os metadados de uma coleção (modelo, dimensão, quantização, versão).
+    
+    Args:
+        collection_name: Nome da coleção
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Dicionário de metadados (vazio se a coleção não existir ou não tiver)
+    """
+    with get_engine(database_url).connect() as conn:
+        value = conn.execute(
+            text(f"SELECT cmetadata FROM {COLLECTION_TABLE} WHERE name = :name"),
+            {"name": collection_name},
+        ).scalar()
+    return value if isinstance(value, dict) else {}
+
+
+def set_collection_metadata(
+    collection_name: str, values: Dict[str, Any], database_url: Optional[str] = None
+) -> None:
+    """
+    Grava chaves nos metadados de uma coleção, preservando as demais.
+    
+    Args:
+        collection_name: Nome da coleção (já criada)
+        values: Chaves e valores (serializáveis em JSON) a gravar
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+    """
+    with get_engine(database_url).begin() as conn:
+        conn.execute(
+            text(
+                f"UPDATE {COLLECTION_TABLE} SET cmetadata = ("
+                "CASE WHEN json_typeof(cmetadata) = 'object' THEN cmetadata::jsonb "
+                "ELSE '{}'::jsonb END || CAST(:values AS jsonb))::json "
+                "WHERE name = :name"
+            ),
+            {"name": collection_name, "values": json.dumps(values)},
+        )
+    _forget_quantization(collection_name, database_url)
+
+
+def ensure_text_search(database_url: Optional[str] = None) -> bool:
+    """
+    Garante a coluna tsvector (português) e o índice GIN da busca lexical.
+    
+    A coluna é gerada pelo PostgreSQL a partir de `document`, então toda
+    gravação (ORM, COPY ou importação) a mantém atualizada. Criá-la em uma
+    tabela já populada reescreve a tabela uma única vez.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        True se a coluna ou o índice foram criados nesta chamada
+    """
+    url = database_url or get_database_url()
+    if (url, TEXT_INDEX) in _schema_ready:
+        return False
+    
+    with get_engine(url).begin() as conn:
+        # Serializa processos de ingestão concorrentes durante o DDL
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": TSVECTOR_COLUMN})
+        exists = conn.execute(
+            text(
+                "SELECT COUNT(*) FROM pg_attribute "
+                "WHERE attrelid = CAST(:table AS regclass) AND attname = :column AND NOT attisdropped"
+            ),
+            {"table": EMBEDDING_TABLE, "column": TSVECTOR_COLUMN},
+        ).scalar()
+        indexed = conn.execute(
+            text("SELECT COUNT(*) FROM pg_indexes WHERE tablename = :table AND indexname = :name"),
+            {"table": EMBEDDING_TABLE, "name": TEXT_INDEX},
+        ).scalar()
+        if not exists:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {EMBEDDING_TABLE} ADD COLUMN {TSVECTOR_COLUMN} tsvector "
+                    f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(document, ''))) STORED"
+                )
+            )
+        if not indexed:
+            conn.execute(
+                text(f"CREATE INDEX IF NOT EXISTS {TEXT_INDEX} ON {EMBEDDING_TABLE} USING gin ({TSVECTOR_COLUMN})")
+            )
+    
+    with _lock:
+        _schema_ready.add((url, TEXT_INDEX))
+    return not (exists and indexed)
+
+
+def metadata_index_name(field: str) -> str:
+    """Nome do índice btree de um campo de metadata."""
+    return f"ix_cmetadata_{field}"
+
+
+def ensure_metadata_indexes(database_url: Optional[str] = None) -> List[str]:
+    """
+    Garante os índices btree dos campos de `INDEXED_METADATA`.
+    
+    A expressão indexada (`cmetadata -> 'campo'`) é a mesma gerada pelos
+    filtros de intervalo de `src.filters.compile_filter`.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Nomes dos índices criados nesta chamada
+    """
+    url = database_url or get_database_url()
+    if (url, "metadata") in _schema_ready:
+        return []
+    
+    created = []
+    with get_engine(url).begin() as conn:
+        existing = set(
+            conn.execute(
+                text("SELECT indexname FROM pg_indexes WHERE tablename = :table"),
+                {"table": EMBEDDING_TABLE},
+            ).scalars()
+        )
+        for field in INDEXED_METADATA:
+            name = metadata_index_name(field)
+            if name in existing:
+                continue
+            conn.execute(
+                text(f"CREATE INDEX IF NOT EXISTS {name} ON {EMBEDDING_TABLE} ((cmetadata -> '{field}'))")
+            )
+            created.append(name)
+    
+    with _lock:
+        _schema_ready.add((url, "metadata"))
+    return created
+
+
+def check_health(database_url: Optional[str] = None) -> Dict[str, object]:
+    """
+    Verifica a conexão com o banco e coleta estatísticas do pool.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Dicionário com ok, latência (ms), erro (se houver) e estatísticas do pool
+    """
+    pool = get_pool(database_url)
+    started = time.perf_counter()
+    try:
+        with get_engine(database_url).connect() as conn:
+            conn.execute(text("SELECT 1"))
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, str(e)
+    
+    return {
+        "ok": ok,
+        "latency_ms": (time.perf_counter() - started) * 1000,
+        "error": error,
+        "pool": pool.get_stats(),
+    }
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Estatísticas dos pools já abertos no processo, sem abrir novos.
+    
+    Returns:
+        Dicionário nome do pool ("rag" ou "rag-async") -> estatísticas do psycopg_pool
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    with _lock:
+        pools = list(_pools.values()) + list(_async_pools.values())
+    for pool in pools:
+        # Pools de URLs diferentes com o mesmo nome são somados
+        totals = stats.setdefault(pool.name, {})
+        for key, value in pool.get_stats().items():
+            totals[key] = totals.get(key, 0) + value
+    return stats
+
+
+def close_all() -> None:
+    """
+    Encerra engines e pools do processo (chamado automaticamente na saída).
+    """
+    with _lock:
+        _vectorstores.clear()
+        _quantizations.clear()
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+        _close_stale_async_pools(list(_async_pools.values()), _async_loop)
+        _async_pools.clear()
+        _async_engines.clear()
+        _async_vectorstores.clear()
+
+
+atexit.register(close_all)
+
+
+# Recursos assíncronos pertencem a um event loop; trocar de loop os recria
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_lock: Optional[asyncio.Lock] = None
+_async_pools: Dict[str, AsyncConnectionPool] = {}
+_async_engines: Dict[str, AsyncEngine] = {}
+_async_vectorstores: Dict[Tuple[str, str, str], PGVector] = {}
+
+
+def _close_stale_async_pools(
+    pools: List[AsyncConnectionPool], loop: Optional[asyncio.AbstractEventLoop]
+) -> None:
+    # Pools de um loop anterior não podem ser aguardados no loop corrente
+    if loop is not None and loop.is_running():
+        # O loop antigo segue vivo em outra thread: fecha os pools nele
+        for pool in pools:
+            asyncio.run_coroutine_threadsafe(pool.close(), loop)
+        return
+    # Loop encerrado: melhor esforço, fecha as conexões ociosas direto na libpq
+    for pool in pools:
+        pool._closed = True
+        connections = list(pool._pool)
+        pool._pool.clear()
+        for conn in connections:
+            try:
+                conn.pgconn.finish()
+            except Exception:
+                pass
+
+
+def _bind_async_loop() -> asyncio.Lock:
+    global _async_loop, _async_lock
+    loop = asyncio.get_running_loop()
+    if loop is not _async_loop:
+        _close_stale_async_pools(list(_async_pools.values()), _async_loop)
+        _async_pools.clear()
+        _async_engines.clear()
+        _async_vectorstores.clear()
+        _async_loop = loop
+        _async_lock = asyncio.Lock()
+    return _async_lock
+
+
+async def get_async_engine(database_url: Optional[str] = None) -> AsyncEngine:
+    """
+    Retorna a engine assíncrona compartilhada, apoiada em AsyncConnectionPool.
+    
+    Usa os mesmos limites (DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE) do pool
+    síncrono; coroutines além do máximo aguardam conexão livre.
+    
+    Args:
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Instância única de AsyncEngine por URL no event loop corrente
+    """
+    database_url = database_url or get_database_url()
+    async with _bind_async_loop():
+        if database_url not in _async_engines:
+            min_size, max_size = pool_sizes()
+            pool = AsyncConnectionPool(
+                psycopg_conninfo(database_url),
+                min_size=min_size,
+                max_size=max_size,
+                check=AsyncConnectionPool.check_connection,
+                close_returns=True,
+                name="rag-async",
+                open=False,
+            )
+            await pool.open()
+            _async_pools[database_url] = pool
+            _async_engines[database_url] = create_async_engine(
+                "postgresql+psycopg://", async_creator=pool.getconn, poolclass=NullPool
+            )
+        return _async_engines[database_url]
+
+
+async def get_async_vectorstore(
+    collection_name: str = "rag_documents",
+    embedding_model: Optional[str] = None,
+    database_url: Optional[str] = None,
+) -> PGVector:
+    """
+    Retorna o PGVector assíncrono compartilhado do event loop corrente.
+    
+    A coleção é criada na primeira chamada, antes de a instância ser
+    exposta, para que buscas concorrentes não disputem a inicialização.
+    
+    Args:
+        collection_name: Nome da coleção no banco
+        embedding_model: Modelo de embeddings (padrão: EMBEDDING_MODEL)
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Instância de PGVector em modo assíncrono
+    """
+    database_url = database_url or get_database_url()
+    embedding_model = embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    key = (database_url, collection_name, embedding_model)
+    
+    engine = await get_async_engine(database_url)
+    async with _bind_async_loop():
+        if key not in _async_vectorstores:
+            vectorstore = PGVector(
+                embeddings=get_embeddings(embedding_model),
+                collection_name=collection_name,
+                connection=engine,
+                use_jsonb=True,
+            )
+            await vectorstore.acreate_collection()
+            _async_vectorstores[key] = vectorstore
+        return _async_vectorstores[key]
+
+
+async def aclose_all() -> None:
+    """
+    Encerra engines e pools assíncronos do event loop corrente.
+    
+    Deve ser chamado no desligamento da aplicação (ex: lifespan do servidor).
+    """
+    async with _bind_async_loop():
+        _async_vectorstores.clear()
+        for engine in _async_engines.values():
+            await engine.dispose()
+        _async_engines.clear()
+        for pool in _async_pools.values():
+            await pool.close()
+        _async_pools.clear()
@@ -0,0 +1,249 @@
+"""
+Micro-batching de embeddings de consultas.
+
+Sob carga concorrente, cada busca faria sua própria chamada ao provedor
+com um único texto. O `BatchingEmbeddings` junta as consultas que chegam
+dentro de uma janela curta (EMBEDDING_QUERY_BATCH_WINDOW_MS) ou até
+EMBEDDING_QUERY_BATCH_MAX_SIZE textos em uma só chamada `embed_documents`, e
+devolve cada vetor ao chamador que o aguardava por um Future.
+
+Threads (`embed_query`) e corrotinas (`aembed_query`, que aguarda o mesmo
+Future sem bloquear o event loop) compartilham a mesma fila. No máximo
+EMBEDDING_QUERY_BATCH_WORKERS chamadas ficam em voo; enquanto todas estão
+ocupadas, a fila cresce e o próximo lote sai maior. Uma consulta que chega
+sem nenhuma chamada em voo nem outra na fila (ex: uso pela CLI) vai direto
+ao provedor, sem esperar a janela.
+
+Fica atrás do cache de embeddings (ver `get_embeddings`): consultas em
+cache não esperam a janela. Lotes explícitos (`embed_documents`, usados
+na ingestão e em `search_many`) vão direto ao provedor.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+def bucket(value: int) -> int:
+    """Limite superior (potência de 2) da faixa do histograma que contém value."""
+    return 1 << max(value - 1, 0).bit_length()
+
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Embeddings que agrupam consultas concorrentes em lotes.
+    
+    Attributes:
+        underlying: Provedor de embeddings real
+        window: Espera máxima por mais consultas após a primeira, em segundos
+        max_batch_size: Máximo de textos por chamada ao provedor
+        batches: Chamadas feitas ao provedor
+        texts: Consultas atendidas
+    """
+    
+    def __init__(
+        self,
+        underlying: Embeddings,
+        window_ms: float = 5.0,
+        max_batch_size: int = 64,
+        workers: int = 4,
+    ):
+        """
+        Cria o agrupador (a thread coletora inicia na primeira consulta).
+        
+        Args:
+            underlying: Provedor de embeddings
+            window_ms: Janela de agrupamento em milissegundos
+            max_batch_size: Máximo de textos por lote
+            workers: Máximo de chamadas simultâneas ao provedor
+            
+        Raises:
+            ValueError: Se parâmetros inválidos
+        """
+        if window_ms < 0 or max_batch_size <= 0 or workers <= 0:
+            raise ValueError("Janela, tamanho máximo do lote e workers inválidos")
+        self.underlying = underlying
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.texts = 0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed-batch")
+        self._batch_sizes: Counter = Counter()
+        self._queue_depths: Counter = Counter()
+        self._max_queue_depth = 0
+        self._inflight = 0
+        self._collector: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def submit(self, text: str) -> Future:
+        """
+        Enfileira uma consulta para o próximo lote.
+        
+        Args:
+            text: Texto da consulta
+            
+        Returns:
+            Future com o vetor (ou a exceção do provedor)
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._collector is None:
+                self._start_collector()
+            self._queue.put((text, future))
+            depth = self._queue.qsize()
+            self._queue_depths[bucket(depth)] += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+    
+    def _start_collector(self) -> None:
+        # Chamado com self._lock
+        self._collector = threading.Thread(
+            target=self._collect, name="embed-batch-collector", daemon=True
+        )
+        self._collector.start()
+    
+    def _collect(self) -> None:
+        while True:
+            # Com todas as chamadas em voo, as consultas acumulam na fila
+            self._slots.acquire()
+            batch: List[Tuple[str, Future]] = []
+            counted = False
+            try:
+                batch.append(self._queue.get())
+                with self._lock:
+                    idle = self._inflight == 0 and self._queue.empty()
+                # Consulta isolada: nada com que agrupar, não espera a janela
+                deadline = time.monotonic() + (0 if idle else self.window)
+                while len(batch) < self.max_batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+                with self._lock:
+                    self._inflight += 1
+                counted = True
+                self._executor.submit(self._flush, batch)
+            except Exception as e:
+                self._abort(batch, counted, e)
+                return
+    
+    def _abort(self, batch: List[Tuple[str, Future]], counted: bool, error: Exception) -> None:
+        # Coletor encerrado por erro: o lote já retirado da fila recebe o erro
+        # e a próxima consulta (ou a que já espera na fila) reinicia a thread
+        with self._lock:
+            if counted:
+                self._inflight -= 1
+            self._collector = None
+            if not self._queue.empty():
+                self._start_collector()
+        self._slots.release()
+        for _, future in batch:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+    
+    def _flush(self, batch: List[Tuple[str, Future]]) -> None:
+        # Corrotinas canceladas não precisam de vetor
+        pending = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        texts = list(dict.fromkeys(text for text, _ in pending))
+        error: Optional[Exception] = None
+        try:
+            if texts:
+                vectors = self.underlying.embed_documents(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(
+                        f"Provedor devolveu {len(vectors)} vetores para {len(texts)} textos"
+                    )
+                by_text = dict(zip(texts, vectors))
+        except Exception as e:
+            error = e
+        finally:
+            # Slot livre antes de acordar os chamadores: a próxima consulta
+            # deles já encontra o agrupador ocioso
+            with self._lock:
+                self._inflight -= 1
+            self._slots.release()
+        if not pending:
+            return
+        
+        if error is not None:
+            # Todos os chamadores do lote recebem o erro
+            for _, future in pending:
+                future.set_exception(error)
+            return
+        for text, future in pending:
+            future.set_result(by_text[text])
+        with self._lock:
+            self.batches += 1
+            self.texts += len(pending)
+            self._batch_sizes[bucket(len(texts))] += 1
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Retorna contadores e histogramas do agrupador.
+        
+        Os histogramas usam faixas em potências de 2 (chave = limite
+        superior: 1, 2, 4, 8, ...).
+        
+        Returns:
+            Dicionário com batches, texts, queue_depth (atual), max_queue_depth,
+            batch_sizes (textos distintos por chamada) e queue_depths (fila ao enfileirar)
+        """
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "texts": self.texts,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "queue_depths": dict(sorted(self._queue_depths.items())),
+            }
+
+
+_batchers: Dict[str, BatchingEmbeddings] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batching_embeddings(key: str, factory: Callable[[], Embeddings]) -> BatchingEmbeddings:
+    """
+    Retorna o agrupador compartilhado do processo para um modelo.
+    
+    Configurado por EMBEDDING_QUERY_BATCH_WINDOW_MS, EMBEDDING_QUERY_BATCH_MAX_SIZE e
+    EMBEDDING_QUERY_BATCH_WORKERS.
+    
+    Args:
+        key: Identificador do modelo (ex: "text-embedding-3-small@512")
+        factory: Cria o provedor na primeira chamada para a chave
+        
+    Returns:
+        Instância única de BatchingEmbeddings por modelo
+    """
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = BatchingEmbeddings(
+                factory(),
+                window_ms=float(os.getenv("EMBEDDING_QUERY_BATCH_WINDOW_MS", "5")),
+                max_batch_size=int(os.getenv("EMBEDDING_QUERY_BATCH_MAX_SIZE", "64")),
+                workers=int(os.getenv("EMBEDDING_QUERY_BATCH_WORKERS", "4")),
+            )
+        return _batchers[key]
@@ -0,0 +1,372 @@
+"""
+Cache persistente de embeddings.
+
+Armazena vetores já calculados em SQLite (float32 em BLOB), indexados por
+(modelo, hash do texto), com despejo LRU limitado por quantidade de entradas.
+Compartilhado por ingestão e busca para evitar chamadas repetidas ao provedor.
+
+Leituras não escrevem no arquivo: os acessos ficam em memória e são gravados
+em lote (a cada ACCESS_FLUSH_SIZE acessos, ACCESS_FLUSH_SECONDS segundos ou
+antes de um despejo).
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from src.embedding_batcher import get_batching_embeddings
+
+# Gravação em lote dos acessos (last_access) acumulados em memória
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_SECONDS = 30.0
+
+
+def text_hash(text: str) -> str:
+    """
+    Calcula hash SHA-256 de um texto.
+    
+    Args:
+        text: Texto a ser embedado
+        
+    Returns:
+        Hash em hexadecimal
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings em SQLite com despejo LRU.
+    
+    Attributes:
+        path: Caminho do arquivo SQLite
+        max_entries: Máximo de vetores mantidos no cache
+        hits: Vetores servidos pelo cache
+        misses: Vetores ausentes no cache
+    """
+    
+    def __init__(self, path: str, max_entries: int = 50_000):
+        """
+        Abre (ou cria) o cache.
+        
+        Args:
+            path: Caminho do arquivo SQLite
+            max_entries: Máximo de vetores mantidos no cache
+            
+        Raises:
+            ValueError: Se max_entries não for positivo
+        """
+        if max_entries <= 0:
+            raise ValueError(f"max_entries deve ser positivo: {max_entries}")
+        
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (modelo, hash) -> último acesso ainda não gravado
+        self._accessed: Dict[Tuple[str, str], float] = {}
+        self._flushed_at = time.monotonic()
+        
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        # Contagem mantida em memória (evita COUNT(*) a cada inserção)
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    
+    def _flush_accesses(self) -> None:
+        # Chamado com self._lock adquirido
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                [(at, model, hash_) for (model, hash_), at in self._accessed.items()],
+            )
+            self._conn.commit()
+            self._accessed.clear()
+        self._flushed_at = time.monotonic()
+    
+    def _touch(self, model: str, hashes: Sequence[str]) -> None:
+        # Chamado com self._lock adquirido
+        now = time.time()
+        for hash_ in hashes:
+            self._accessed[(model, hash_)] = now
+        if (
+            len(self._accessed) >= ACCESS_FLUSH_SIZE
+            or time.monotonic() - self._flushed_at >= ACCESS_FLUSH_SECONDS
+        ):
+            self._flush_accesses()
+    
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Busca vetores no cache.
+        
+        Args:
+            model: Identificador do modelo de embeddings
+            texts: Textos a buscar
+            
+        Returns:
+            Lista alinhada com `texts`; None para textos ausentes
+        """
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                )
+                for hash_, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[hash_] = vector.tolist()
+            
+            if found:
+                self._touch(model, list(found))
+            
+            results = [found.get(hash_) for hash_ in hashes]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        
+        return results
+    
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        """
+        Grava vetores no cache e aplica o despejo LRU.
+        
+        Args:
+            model: Identificador do modelo de embeddings
+            texts: Textos embedados
+            vectors: Vetores correspondentes
+        """
+        now = time.time()
+        rows = [
+            (model, text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        
+        with self._lock:
+            # Mesmo (modelo, hash) gera o mesmo vetor: linhas existentes só são tocadas
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            if inserted < len(rows):
+                self._touch(model, [hash_ for _, hash_, _, _ in rows])
+            self._count += inserted
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                # Acessos pendentes decidem quem é o menos recente
+                self._flush_accesses()
+                self._count -= self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+            self._conn.commit()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna contadores do cache.
+        
+        Returns:
+            Dicionário com hits, misses e entries
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+    
+    def close(self) -> None:
+        """Grava os acessos pendentes e fecha a conexão com o arquivo SQLite."""
+        with self._lock:
+            self._flush_accesses()
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings com cache persistente na frente do provedor.
+    
+    Apenas textos ausentes no cache são enviados ao provedor, em uma única
+    chamada por lote.
+    
+    Attributes:
+        underlying: Provedor de embeddings real
+        cache: Cache de vetores
+        model: Identificador do modelo (chave do cache)
+    """
+    
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache, model: str):
+        self.underlying = underlying
+        self.cache = cache
+        self.model = model
+    
+    def _split_misses(
+        self, texts: Sequence[str]
+    ) -> Tuple[List[Optional[List[float]]], List[str]]:
+        vectors = self.cache.get_many(self.model, texts)
+        # Deduplicar textos ausentes preservando a ordem
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        return vectors, missing
+    
+    def _merge(
+        self,
+        texts: Sequence[str],
+        vectors: List[Optional[List[float]]],
+        missing: List[str],
+        computed: List[List[float]],
+    ) -> List[List[float]]:
+        if missing:
+            self.cache.put_many(self.model, missing, computed)
+            by_text = dict(zip(missing, computed))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        return vectors
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._split_misses(texts)
+        computed = self.underlying.embed_documents(missing) if missing else []
+        return self._merge(texts, vectors, missing, computed)
+    
+    def embed_query(self, text: str) -> List[float]:
+        (vector,) = self.cache.get_many(self.model, [text])
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.cache.put_many(self.model, [text], [vector])
+        return vector
+    
+    # SQLite não tem driver assíncrono: leituras e gravações fora do event loop
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = await asyncio.to_thread(self._split_misses, texts)
+        computed = await self.underlying.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._merge, texts, vectors, missing, computed)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        (vector,) = await asyncio.to_thread(self.cache.get_many, self.model, [text])
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self.cache.put_many, self.model, [text], [vector])
+        return vector
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: Optional[str] = None) -> EmbeddingCache:
+    """
+    Retorna o cache compartilhado do processo para um caminho.
+    
+    Args:
+        path: Arquivo SQLite (padrão: EMBEDDING_CACHE_PATH ou .cache/embeddings.sqlite3)
+        
+    Returns:
+        Instância única de EmbeddingCache por caminho
+    """
+    path = path or os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+    with _caches_lock:
+        if path not in _caches:
+            max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+            _caches[path] = EmbeddingCache(path, max_entries=max_entries)
+        return _caches[path]
+
+
+def embedding_settings(model: Optional[str] = None) -> Tuple[str, Optional[int]]:
+    """
+    Retorna o modelo e a dimensão efetivos dos embeddings.
+    
+    Args:
+        model: Modelo de embeddings (padrão: EMBEDDING_MODEL)
+        
+    Returns:
+        Tupla (modelo, EMBEDDING_DIMENSIONS ou None para a dimensão nativa)
+        
+    Raises:
+        ValueError: Se EMBEDDING_DIMENSIONS não for positivo
+    """
+    model = model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+    if dimensions is not None and dimensions < 0:
+        raise ValueError(f"EMBEDDING_DIMENSIONS deve ser positivo: {dimensions}")
+    return model, dimensions
+
+
+def embedding_key(model: Optional[str] = None) -> str:
+    """
+    Identifica o espaço vetorial dos embeddings: modelo e dimensão.
+    
+    Chave do cache de embeddings e parte do `content_hash` dos chunks.
+    
+    Args:
+        model: Modelo de embeddings (padrão: EMBEDDING_MODEL)
+        
+    Returns:
+        "<modelo>@<dimensão>" com EMBEDDING_DIMENSIONS, senão "<modelo>"
+    """
+    model, dimensions = embedding_settings(model)
+    return f"{model}@{dimensions}" if dimensions else model
+
+
+def get_embeddings(model: Optional[str] = None) -> Embeddings:
+    """
+    Cria o modelo de embeddings usado por ingestão e busca.
+    
+    Com EMBEDDING_CACHE_ENABLED=true (padrão), o provedor fica atrás do
+    cache persistente compartilhado. Com EMBEDDING_QUERY_BATCHING_ENABLED=true
+    (padrão), as consultas que faltam no cache passam pelo agrupador
+    compartilhado do modelo (ver `src.embedding_batcher`). EMBEDDING_DIMENSIONS
+    pede ao provedor vetores encurtados (modelos text-embedding-3); a dimensão
+    entra na chave do cache.
+    
+    Args:
+        model: Modelo de embeddings (padrão: EMBEDDING_MODEL)
+        
+    Returns:
+        Instância de Embeddings
+        
+    Raises:
+        ValueError: Se EMBEDDING_DIMENSIONS não for positivo
+    """
+    model, dimensions = embedding_settings(model)
+    cache_key = embedding_key(model)
+    
+    if os.getenv("EMBEDDING_QUERY_BATCHING_ENABLED", "true").lower() == "true":
+        embeddings: Embeddings = get_batching_embeddings(
+            cache_key, lambda: OpenAIEmbeddings(model=model, dimensions=dimensions)
+        )
+    else:
+        embeddings = OpenAIEmbeddings(model=model, dimensions=dimensions)
+    
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        return embeddings
+    return CachedEmbeddings(embeddings, get_cache(), cache_key)
@@ -0,0 +1,128 @@
+"""
+Filtros de metadata compilados para predicados JSONB.
+
+Um filtro é um dicionário campo -> condição sobre a metadata dos chunks
+(`cmetadata`), com operadores no estilo do `langchain_postgres`:
+
+    {"source": "relatorios/2024.pdf"}                 igualdade
+    {"source": ["a.pdf", "b.pdf"]}                    qualquer um ($in)
+    {"page": {"$gte": 3, "$lte": 10}}                 intervalo
+    {"ingested_at": {"$gte": "2026-01-01"}}           datas ISO 8601 (texto)
+    {"tags": {"$contains": "financeiro"}}             elemento de lista
+
+Igualdade, $in e $contains viram `cmetadata @> ...` (índice GIN
+jsonb_path_ops da tabela); intervalos comparam `cmetadata -> 'campo'`,
+indexado por btree para os campos de `src.db.INDEXED_METADATA`. Campos
+diferentes são combinados com AND.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Operadores aceitos nas condições
+OPERATORS = ("$eq", "$in", "$gt", "$gte", "$lt", "$lte", "$contains")
+
+_RANGES = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_FIELD = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _json_type(value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"Intervalos aceitam apenas números ou texto: {value!r}")
+    return "string" if isinstance(value, str) else "number"
+
+
+def compile_filter(
+    filter: Optional[Dict[str, Any]], column: str = "cmetadata", prefix: str = "f"
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Compila um filtro de metadata para um predicado SQL parametrizado.
+    
+    Args:
+        filter: Campo -> valor, lista de valores ou {operador: valor}
+        column: Expressão SQL da coluna JSONB
+        prefix: Prefixo dos nomes de parâmetro (evita colisões na consulta)
+        
+    Returns:
+        Tupla (predicado, parâmetros); predicado "" se não houver filtro
+        
+    Raises:
+        ValueError: Se campo, operador ou valor inválidos
+    """
+    predicates: List[str] = []
+    params: Dict[str, Any] = {}
+    
+    def bind(value: Any) -> str:
+        name = f"{prefix}{len(params)}"
+        params[name] = json.dumps(value, ensure_ascii=False)
+        return f"CAST(:{name} AS jsonb)"
+    
+    for field, condition in (filter or {}).items():
+        if not _FIELD.match(field):
+            raise ValueError(f"Campo de filtro inválido: {field!r}")
+        if isinstance(condition, list):
+            condition = {"$in": condition}
+        elif not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        
+        for operator, value in condition.items():
+            if operator not in OPERATORS:
+                raise ValueError(f"Operador inválido: {operator} (opções: {', '.join(OPERATORS)})")
+            if operator == "$eq":
+                predicates.append(f"{column} @> {bind({field: value})}")
+            elif operator == "$contains":
+                predicates.append(f"{column} @> {bind({field: [value]})}")
+            elif operator == "$in":
+                if not isinstance(value, list):
+                    raise ValueError(f"$in exige uma lista: {field}")
+                # OR de contenções: BitmapOr sobre o índice GIN
+                options = [f"{column} @> {bind({field: item})}" for item in value]
+                predicates.append(f"({' OR '.join(options)})" if options else "FALSE")
+            else:
+                # jsonb ordena tipos diferentes entre si: compara só o mesmo tipo
+                target = f"({column} -> '{field}')"
+                predicates.append(
+                    f"{target} {_RANGES[operator]} {bind(value)} "
+                    f"AND jsonb_typeof({target}) = '{_json_type(value)}'"
+                )
+    
+    return " AND ".join(predicates), params
+
+
+def build_filter(
+    sources: Optional[List[str]] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    ingested_after: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Monta o filtro das opções de linha de comando.
+    
+    Args:
+        sources: Arquivos de origem aceitos (metadata `source`)
+        page_from: Primeira página (índice do PyPDFLoader, base 0)
+        page_to: Última página, inclusive
+        ingested_after: Data/hora ISO 8601 mínima da ingestão
+        tags: Tags exigidas (todas)
+        
+    Returns:
+        Filtro para `compile_filter` ou None se nenhuma opção informada
+    """
+    filter: Dict[str, Any] = {}
+    if sources:
+        filter["source"] = list(sources)
+    page: Dict[str, int] = {}
+    if page_from is not None:
+        page["$gte"] = page_from
+    if page_to is not None:
+        page["$lte"] = page_to
+    if page:
+        filter["page"] = page
+    if ingested_after:
+        filter["ingested_at"] = {"$gte": ingested_after}
+    if tags:
+        # Um campo por chave: várias tags viram uma única contenção
+        filter["tags"] = {"$eq": list(tags)}
+    return filter or None
@@ -0,0 +1,605 @@
+"""
+Gerenciamento de índices ANN (HNSW / IVFFlat) do pgvector.
+
+Cria, reconstrói e remove índices vetoriais sobre a coluna de embeddings e
+mede o trade-off recall x latência contra a busca exata.
+
+Exemplo:
+    python src/index.py create --method hnsw --m 16 --ef-construction 64
+    python src/index.py report --collection rag_documents
+    python src/index.py text
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import psycopg
+import typer
+from dotenv import load_dotenv
+from psycopg import sql
+
+from src.db import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    QUANTIZATIONS,
+    TEXT_INDEX,
+    coarse_expression,
+    ensure_metadata_indexes,
+    ensure_text_search,
+    psycopg_conninfo,
+    quantized_expression,
+)
+
+load_dotenv()
+
+app = typer.Typer()
+
+METHODS = ("hnsw", "ivfflat")
+
+# Parâmetro de busca (GUC) de cada método
+SEARCH_SETTINGS = {"hnsw": "hnsw.ef_search", "ivfflat": "ivfflat.probes"}
+
+# Classe de operadores de cada quantização
+OPERATOR_CLASSES = {
+    "none": "vector_cosine_ops",
+    "halfvec": "halfvec_cosine_ops",
+    "binary": "bit_hamming_ops",
+}
+
+
+def index_name(
+    method: str, quantization: str = "none", coarse_dimensions: Optional[int] = None
+) -> str:
+    """
+    Nome do índice de um método.
+    
+    Args:
+        method: "hnsw" ou "ivfflat"
+        quantization: "none", "halfvec" ou "binary"
+        coarse_dimensions: Dimensões do prefixo indexado (None = vetor completo)
+        
+    Returns:
+        Nome do índice no banco
+    """
+    suffix = f"_d{coarse_dimensions}" if coarse_dimensions else ""
+    if quantization == "halfvec":
+        return f"ix_embedding_{method}_halfvec_cosine{suffix}"
+    if quantization == "binary":
+        return f"ix_embedding_{method}_binary_hamming{suffix}"
+    return f"ix_embedding_{method}_cosine{suffix}"
+
+
+def index_target(quantization: str, dimensions: int, coarse_dimensions: Optional[int] = None) -> str:
+    """
+    Expressão e classe de operadores indexadas.
+    
+    Devem coincidir com `src.db.quantized_distance`, usada na busca.
+    
+    Args:
+        quantization: "none", "halfvec" ou "binary"
+        dimensions: Dimensão dos vetores
+        coarse_dimensions: Dimensões do prefixo indexado (None = vetor completo)
+        
+    Returns:
+        Trecho SQL entre os parênteses do CREATE INDEX
+    """
+    if quantization == "none" and not coarse_dimensions:
+        return "embedding vector_cosine_ops"
+    column = "embedding"
+    if coarse_dimensions:
+        column, dimensions = coarse_expression(column, coarse_dimensions), coarse_dimensions
+    return f"({quantized_expression(quantization, dimensions, column)}) {OPERATOR_CLASSES[quantization]}"
+
+
+def _validate_method(
+    method: str, quantization: str = "none", coarse_dimensions: Optional[int] = None
+) -> None:
+    if method not in METHODS:
+        raise ValueError(f"Método inválido: {method} (opções: {', '.join(METHODS)})")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(
+            f"Quantização inválida: {quantization} (opções: {', '.join(QUANTIZATIONS)})"
+        )
+    if coarse_dimensions is not None and coarse_dimensions <= 0:
+        raise ValueError(f"coarse_dimensions deve ser positivo: {coarse_dimensions}")
+
+
+def connect() -> psycopg.Connection:
+    """
+    Abre conexão em autocommit (exigido por CREATE INDEX CONCURRENTLY).
+    
+    Returns:
+        Conexão psycopg
+    """
+    return psycopg.connect(psycopg_conninfo(), autocommit=True)
+
+
+def collection_dimensions(conn: psycopg.Connection) -> Dict[str, List[int]]:
+    """
+    Descobre as dimensões dos vetores armazenados em cada coleção.
+    
+    Args:
+        conn: Conexão com o banco
+        
+    Returns:
+        Dicionário nome da coleção -> dimensões encontradas (ordenadas)
+    """
+    rows = conn.execute(
+        f"SELECT c.name, vector_dims(e.embedding) AS dims FROM {EMBEDDING_TABLE} AS e "
+        f"JOIN {COLLECTION_TABLE} AS c ON c.uuid = e.collection_id "
+        "WHERE e.embedding IS NOT NULL GROUP BY c.name, dims ORDER BY c.name, dims"
+    ).fetchall()
+    dimensions: Dict[str, List[int]] = {}
+    for name, dims in rows:
+        dimensions.setdefault(name, []).append(dims)
+    return dimensions
+
+
+def _describe_dimensions(dimensions: Dict[str, List[int]]) -> str:
+    return ", ".join(
+        f"{name}: {'/'.join(str(dims) for dims in found)}" for name, found in dimensions.items()
+    )
+
+
+def embedding_dimensions(conn: psycopg.Connection) -> Optional[int]:
+    """
+    Descobre a dimensão dos vetores armazenados.
+    
+    Args:
+        conn: Conexão com o banco
+        
+    Returns:
+        Dimensão dos vetores ou None se a tabela estiver vazia
+        
+    Raises:
+        ValueError: Se houver vetores de dimensões diferentes
+    """
+    by_collection = collection_dimensions(conn)
+    found = sorted({dims for dimensions in by_collection.values() for dims in dimensions})
+    if len(found) > 1:
+        raise ValueError(
+            f"Vetores com dimensões diferentes na tabela ({_describe_dimensions(by_collection)}): "
+            "a coluna embedding é compartilhada entre as coleções e o índice ANN exige uma "
+            "única dimensão; use o mesmo EMBEDDING_DIMENSIONS em todas ou bancos separados"
+        )
+    return found[0] if found else None
+
+
+def ensure_typed_column(conn: psycopg.Connection, dimensions: int) -> None:
+    """
+    Fixa a dimensão da coluna de embeddings (vector -> vector(N)).
+    
+    O langchain_postgres cria a coluna sem dimensão, e o pgvector só indexa
+    colunas com dimensão declarada. A coluna é compartilhada por todas as
+    coleções: depois de fixada, o banco recusa vetores de outra dimensão.
+    
+    Args:
+        conn: Conexão com o banco
+        dimensions: Dimensão dos vetores
+        
+    Raises:
+        ValueError: Se alguma coleção guarda vetores de outra dimensão
+    """
+    (column_type,) = conn.execute(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attname = 'embedding'",
+        (EMBEDDING_TABLE,),
+    ).fetchone()
+    if column_type == f"vector({dimensions})":
+        return
+    
+    # Fixar a dimensão quebraria as coleções com vetores de outra dimensão
+    others = {
+        name: found for name, found in collection_dimensions(conn).items() if found != [dimensions]
+    }
+    if others:
+        raise ValueError(
+            f"Não é possível fixar a coluna embedding em vector({dimensions}): coleções com "
+            f"outras dimensões ({_describe_dimensions(others)}) compartilham a coluna"
+        )
+    
+    typer.echo(f"🔧 Alterando coluna embedding: {column_type} -> vector({dimensions})")
+    conn.execute(
+        sql.SQL("ALTER TABLE {} ALTER COLUMN embedding TYPE vector({})").format(
+            sql.Identifier(EMBEDDING_TABLE), sql.Literal(dimensions)
+        )
+    )
+
+
+def create_index(
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    concurrently: bool = False,
+    quantization: str = "none",
+    coarse_dimensions: Optional[int] = None,
+) -> str:
+    """
+    Cria índice ANN com distância de cosseno (mesma métrica da busca).
+    
+    Com quantização, o índice é de expressão sobre a coluna float32:
+    halfvec (metade do tamanho, cosseno) ou bits (1/32, Hamming). A coluna
+    float32 continua sendo a usada no re-rank e nos scores. Com
+    coarse_dimensions, indexa só o prefixo do vetor (busca em dois estágios).
+    
+    Args:
+        method: "hnsw" ou "ivfflat"
+        m: Conexões por nó (HNSW)
+        ef_construction: Lista de candidatos na construção (HNSW)
+        lists: Número de listas (IVFFlat); padrão: linhas / 1000 (mínimo 1)
+        concurrently: Usa CREATE INDEX CONCURRENTLY (não bloqueia escritas)
+        quantization: "none", "halfvec" ou "binary"
+        coarse_dimensions: Dimensões do prefixo indexado (None = vetor completo)
+        
+    Returns:
+        Nome do índice criado
+        
+    Raises:
+        ValueError: Se método/quantização inválidos ou tabela sem vetores
+    """
+    _validate_method(method, quantization, coarse_dimensions)
+    name = index_name(method, quantization, coarse_dimensions)
+    
+    with connect() as conn:
+        dimensions = embedding_dimensions(conn)
+        if dimensions is None:
+            raise ValueError("Nenhum embedding armazenado; ingira documentos antes")
+        ensure_typed_column(conn, dimensions)
+        if coarse_dimensions and coarse_dimensions >= dimensions:
+            raise ValueError(
+                f"coarse_dimensions ({coarse_dimensions}) deve ser menor que a dimensão ({dimensions})"
+            )
+        
+        if method == "hnsw":
+            options = {"m": m, "ef_construction": ef_construction}
+        else:
+            if lists is None:
+                (rows,) = conn.execute(f"SELECT COUNT(*) FROM {EMBEDDING_TABLE}").fetchone()
+                lists = max(1, rows // 1000)
+            options = {"lists": lists}
+        
+        with_clause = sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.SQL(key), sql.Literal(value))
+            for key, value in options.items()
+        )
+        statement = sql.SQL(
+            "CREATE INDEX {concurrently} IF NOT EXISTS {name} ON {table} "
+            "USING {method} ({target}) WITH ({options})"
+        ).format(
+            concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+            name=sql.Identifier(name),
+            table=sql.Identifier(EMBEDDING_TABLE),
+            method=sql.SQL(method),
+            target=sql.SQL(index_target(quantization, dimensions, coarse_dimensions)),
+            options=with_clause,
+        )
+        
+        typer.echo(f"🏗️  Criando índice {name} ({', '.join(f'{k}={v}' for k, v in options.items())})")
+        started = time.perf_counter()
+        conn.execute(statement)
+        # Estatísticas atualizadas para o planejador escolher o índice
+        conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(EMBEDDING_TABLE)))
+        typer.echo(f"✓ Índice criado em {time.perf_counter() - started:.2f}s")
+    
+    return name
+
+
+def drop_index(
+    method: str = "hnsw",
+    concurrently: bool = False,
+    quantization: str = "none",
+    coarse_dimensions: Optional[int] = None,
+) -> None:
+    """
+    Remove o índice ANN de um método, se existir.
+    
+    Args:
+        method: "hnsw" ou "ivfflat"
+        concurrently: Usa DROP INDEX CONCURRENTLY
+        quantization: "none", "halfvec" ou "binary"
+        coarse_dimensions: Dimensões do prefixo indexado (None = vetor completo)
+    """
+    _validate_method(method, quantization, coarse_dimensions)
+    with connect() as conn:
+        conn.execute(
+            sql.SQL("DROP INDEX {} IF EXISTS {}").format(
+                sql.SQL("CONCURRENTLY" if concurrently else ""),
+                sql.Identifier(index_name(method, quantization, coarse_dimensions)),
+            )
+        )
+
+
+def list_indexes() -> List[Dict[str, str]]:
+    """
+    Lista índices da tabela de embeddings.
+    
+    Returns:
+        Lista de dicionários com nome, tamanho e definição
+    """
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT indexname, pg_size_pretty(pg_relation_size(quote_ident(indexname)::regclass)), "
+            "indexdef FROM pg_indexes WHERE tablename = %s ORDER BY indexname",
+            (EMBEDDING_TABLE,),
+        ).fetchall()
+    return [{"name": name, "size": size, "definition": definition} for name, size, definition in rows]
+
+
+def _top_k(
+    conn: psycopg.Connection,
+    collection_id: str,
+    query: str,
+    k: int,
+    settings: Dict[str, str],
+) -> List[str]:
+    with conn.transaction():
+        for name, value in settings.items():
+            conn.execute("SELECT set_config(%s, %s, true)", (name, value))
+        rows = conn.execute(
+            f"SELECT id FROM {EMBEDDING_TABLE} WHERE collection_id = %s "
+            "ORDER BY embedding <=> %s::vector LIMIT %s",
+            (collection_id, query, k),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def recall_report(
+    collection_name: str,
+    method: str = "hnsw",
+    values: Sequence[int] = (10, 20, 40, 80, 160),
+    queries: int = 50,
+    k: int = 10,
+) -> List[Dict[str, float]]:
+    """
+    Mede recall@k e latência do índice ANN contra a busca exata.
+    
+    Usa embeddings já armazenados como consultas (sem custo de API). A busca
+    exata roda com varreduras de índice desabilitadas; a aproximada, com
+    varredura sequencial desabilitada para forçar o uso do índice.
+    
+    Args:
+        collection_name: Coleção usada na medição
+        method: Método do índice ("hnsw" ou "ivfflat")
+        values: Valores de ef_search (HNSW) ou probes (IVFFlat) a testar
+        queries: Quantidade de consultas amostradas
+        k: Tamanho do top-k
+        
+    Returns:
+        Uma linha por configuração: setting, value, recall, latência média e p95 (ms)
+        
+    Raises:
+        ValueError: Se coleção não existir ou estiver vazia
+    """
+    _validate_method(method)
+    setting = SEARCH_SETTINGS[method]
+    
+    with connect() as conn:
+        row = conn.execute(
+            f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = %s", (collection_name,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Coleção não encontrada: {collection_name}")
+        collection_id = row[0]
+        
+        samples = [
+            sample
+            for (sample,) in conn.execute(
+                f"SELECT embedding::text FROM {EMBEDDING_TABLE} WHERE collection_id = %s "
+                "ORDER BY random() LIMIT %s",
+                (collection_id, queries),
+            )
+        ]
+        if not samples:
+            raise ValueError(f"Coleção vazia: {collection_name}")
+        
+        exact = [
+            set(_top_k(conn, collection_id, q, k, {"enable_indexscan": "off"}))
+            for q in samples
+        ]
+        
+        report = []
+        for value in values:
+            latencies = []
+            hits = 0
+            for query, truth in zip(samples, exact):
+                started = time.perf_counter()
+                found = _top_k(
+                    conn, collection_id, query, k, {setting: str(value), "enable_seqscan": "off"}
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits += len(truth.intersection(found))
+            
+            report.append({
+                "setting": setting,
+                "value": value,
+                "recall": hits / sum(len(truth) for truth in exact),
+                "mean_ms": statistics.mean(latencies),
+                "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))],
+            })
+    
+    return report
+
+
+@app.callback()
+def callback() -> None:
+    """Gerencia índices ANN da tabela de embeddings."""
+
+
+@app.command()
+def create(
+    method: str = typer.Option("hnsw", help="Método: hnsw ou ivfflat"),
+    m: int = typer.Option(16, help="HNSW: conexões por nó"),
+    ef_construction: int = typer.Option(64, help="HNSW: candidatos na construção"),
+    lists: Optional[int] = typer.Option(None, help="IVFFlat: número de listas (padrão: linhas/1000)"),
+    concurrently: bool = typer.Option(False, help="Não bloqueia escritas durante a criação"),
+    quantization: str = typer.Option("none", help="Quantização: none, halfvec ou binary"),
+    coarse_dimensions: Optional[int] = typer.Option(
+        None, help="Indexa só as primeiras N dimensões (busca em dois estágios)"
+    ),
+) -> None:
+    """
+    Cria índice ANN.
+    
+    Exemplo:
+        python src/index.py create --method hnsw --m 16 --ef-construction 64
+        python src/index.py create --method ivfflat --lists 100
+        python src/index.py create --method hnsw --quantization halfvec
+        python src/index.py create --method hnsw --coarse-dimensions 256
+    """
+    try:
+        create_index(
+            method, m, ef_construction, lists, concurrently, quantization, coarse_dimensions
+        )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def rebuild(
+    method: str = typer.Option("hnsw", help="Método: hnsw ou ivfflat"),
+    m: int = typer.Option(16, help="HNSW: conexões por nó"),
+    ef_construction: int = typer.Option(64, help="HNSW: candidatos na construção"),
+    lists: Optional[int] = typer.Option(None, help="IVFFlat: número de listas (padrão: linhas/1000)"),
+    concurrently: bool = typer.Option(False, help="Não bloqueia escritas durante a recriação"),
+    quantization: str = typer.Option("none", help="Quantização: none, halfvec ou binary"),
+    coarse_dimensions: Optional[int] = typer.Option(
+        None, help="Indexa só as primeiras N dimensões (busca em dois estágios)"
+    ),
+) -> None:
+    """
+    Recria índice ANN (ex: após grandes ingestões ou para mudar parâmetros).
+    
+    Exemplo:
+        python src/index.py rebuild --method ivfflat --lists 200
+    """
+    try:
+        drop_index(method, concurrently, quantization, coarse_dimensions)
+        create_index(
+            method, m, ef_construction, lists, concurrently, quantization, coarse_dimensions
+        )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def drop(
+    method: str = typer.Option("hnsw", help="Método: hnsw ou ivfflat"),
+    concurrently: bool = typer.Option(False, help="Não bloqueia escritas durante a remoção"),
+    quantization: str = typer.Option("none", help="Quantização: none, halfvec ou binary"),
+    coarse_dimensions: Optional[int] = typer.Option(
+        None, help="Indexa só as primeiras N dimensões (busca em dois estágios)"
+    ),
+) -> None:
+    """
+    Remove índice ANN.
+    
+    Exemplo:
+        python src/index.py drop --method hnsw
+    """
+    try:
+        drop_index(method, concurrently, quantization, coarse_dimensions)
+        typer.echo(f"✓ Índice {index_name(method, quantization, coarse_dimensions)} removido")
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command("text")
+def text_index() -> None:
+    """
+    Cria a coluna tsvector e o índice GIN da busca híbrida (se ausentes).
+    
+    A ingestão já faz isso; o comando serve para bancos ingeridos antes.
+    
+    Exemplo:
+        python src/index.py text
+    """
+    try:
+        started = time.perf_counter()
+        if ensure_text_search():
+            typer.echo(f"✓ Índice {TEXT_INDEX} criado em {time.perf_counter() - started:.2f}s")
+        else:
+            typer.echo(f"✓ Índice {TEXT_INDEX} já existe")
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def metadata() -> None:
+    """
+    Cria os índices btree dos filtros de metadata (page, ingested_at), se ausentes.
+    
+    A ingestão já faz isso; o comando serve para bancos ingeridos antes.
+    
+    Exemplo:
+        python src/index.py metadata
+    """
+    try:
+        created = ensure_metadata_indexes()
+        for name in created:
+            typer.echo(f"✓ Índice {name} criado")
+        if not created:
+            typer.echo("✓ Índices de metadata já existem")
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def status() -> None:
+    """
+    Lista índices da tabela de embeddings.
+    
+    Exemplo:
+        python src/index.py status
+    """
+    try:
+        for index in list_indexes():
+            typer.echo(f"📇 {index['name']} ({index['size']})")
+            typer.echo(f"   {index['definition']}")
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def report(
+    collection: str = typer.Option("rag_documents", help="Coleção no banco"),
+    method: str = typer.Option("hnsw", help="Método do índice: hnsw ou ivfflat"),
+    values: List[int] = typer.Option(
+        [10, 20, 40, 80, 160], "--value", help="ef_search (HNSW) ou probes (IVFFlat) a testar"
+    ),
+    queries: int = typer.Option(50, help="Consultas amostradas da coleção"),
+    k: int = typer.Option(10, help="Tamanho do top-k"),
+) -> None:
+    """
+    Relatório de recall@k x latência do índice contra a busca exata.
+    
+    Exemplo:
+        python src/index.py report --method hnsw --value 20 --value 40 --value 80
+    """
+    try:
+        rows = recall_report(collection, method, values, queries, k)
+        typer.echo(f"{'parâmetro':<20} {'recall@' + str(k):>10} {'média (ms)':>12} {'p95 (ms)':>10}")
+        for row in rows:
+            typer.echo(
+                f"{row['setting'] + '=' + str(row['value']):<20} {row['recall']:>10.3f} "
+                f"{row['mean_ms']:>12.2f} {row['p95_ms']:>10.2f}"
+            )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
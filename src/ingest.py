@@ -4,39 +4,150 @@ Módulo de ingestão de documentos PDF.
 Processa documentos PDF, divide em chunks, gera embeddings e armazena no PGVector.
 """
 
+import copy
+import glob
+import hashlib
+import multiprocessing
 import os
 import sys
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
+import numpy as np
+import psycopg
 import typer
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_postgres import PGVector
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pgvector.psycopg import register_vector
+from psycopg.types.json import Jsonb
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.context import count_tokens
+from src.db import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    QUANTIZATIONS,
+    bump_collection_version,
+    ensure_metadata_indexes,
+    ensure_text_search,
+    get_database_url,
+    get_engine,
+    psycopg_conninfo,
+    set_collection_metadata,
+    set_collection_quantization,
+)
+from src.embedding_cache import embedding_key, embedding_settings, get_cache, get_embeddings
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
 app = typer.Typer()
 
+T = TypeVar("T")
+
+# Grava um lote: (chunks, vetores) -> None
+BatchWriter = Callable[[List[Document], List[List[float]]], None]
+
+WRITERS = ("orm", "copy")
+
 
-def load_pdf(file_path: str) -> List[Document]:
+@dataclass
+class FileIngestResult:
+    """Resultado da ingestão de um arquivo."""
+    path: str
+    pages: int = 0
+    chunks: int = 0
+    stored: int = 0
+    parse_seconds: float = 0.0  # Leitura do PDF + chunking
+    store_seconds: float = 0.0  # Embeddings + gravação
+    error: Optional[str] = None
+
+
+def resolve_writer(writer: Optional[str] = None) -> str:
     """
-    Carrega documento PDF.
+    Resolve e valida o caminho de gravação da ingestão.
     
     Args:
-        file_path: Caminho para o arquivo PDF
+        writer: "orm" ou "copy" (padrão: INGEST_WRITER ou "orm")
         
     Returns:
-        Lista de documentos carregados
+        Writer validado
         
     Raises:
-        FileNotFoundError: Se arquivo não existir
-        ValueError: Se arquivo não for PDF
+        ValueError: Se writer inválido
     """
+    writer = writer or os.getenv("INGEST_WRITER", "orm")
+    if writer not in WRITERS:
+        raise ValueError(f"Writer inválido: {writer} (opções: {', '.join(WRITERS)})")
+    return writer
+
+
+def resolve_pdf_paths(patterns: Sequence[str]) -> List[str]:
+    """
+    Expande caminhos, diretórios e padrões glob em arquivos PDF.
+    
+    Diretórios são percorridos recursivamente; padrões glob aceitam `**`.
+    Caminhos literais são mantidos mesmo que não existam, para que
+    `load_pdf` reporte o erro.
+    
+    Args:
+        patterns: Caminhos de arquivos, diretórios ou padrões glob
+        
+    Returns:
+        Caminhos de PDFs, sem duplicatas, na ordem informada
+        
+    Raises:
+        FileNotFoundError: Se nenhum PDF for encontrado
+    """
+    resolved: Dict[str, None] = {}
+    
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(
+                str(p) for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf"
+            )
+        elif glob.has_magic(pattern):
+            matches = sorted(
+                p for p in glob.glob(pattern, recursive=True) if p.lower().endswith(".pdf")
+            )
+        else:
+            matches = [pattern]
+        
+        for match in matches:
+            resolved.setdefault(match, None)
+    
+    if not resolved:
+        raise FileNotFoundError(f"Nenhum PDF encontrado em: {', '.join(patterns)}")
+    
+    return list(resolved)
+
+
+def _validate_pdf_path(file_path: str) -> Path:
     pdf_path = Path(file_path)
     
     if not pdf_path.exists():
@@ -45,15 +156,89 @@ def load_pdf(file_path: str) -> List[Document]:
     if pdf_path.suffix.lower() != ".pdf":
         raise ValueError(f"Arquivo deve ser PDF: {file_path}")
     
-    typer.echo(f"📄 Carregando PDF: {pdf_path.name}")
+    return pdf_path
+
+
+def load_pdf(file_path: str, verbose: bool = True) -> List[Document]:
+    """
+    Carrega documento PDF.
+    
+    Args:
+        file_path: Caminho para o arquivo PDF
+        verbose: Exibe progresso no terminal
+        
+    Returns:
+        Lista de documentos carregados
+        
+    Raises:
+        FileNotFoundError: Se arquivo não existir
+        ValueError: Se arquivo não for PDF
+    """
+    pdf_path = _validate_pdf_path(file_path)
+    
+    if verbose:
+        typer.echo(f"📄 Carregando PDF: {pdf_path.name}")
     loader = PyPDFLoader(str(pdf_path))
     documents = loader.load()
     
-    typer.echo(f"✓ {len(documents)} páginas carregadas")
+    if verbose:
+        typer.echo(f"✓ {len(documents)} páginas carregadas")
     return documents
 
 
-def split_documents(documents: List[Document]) -> List[Document]:
+def compute_content_hash(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model: str,
+) -> str:
+    """
+    Calcula hash estável do conteúdo de um chunk.
+    
+    Inclui os parâmetros de chunking e o modelo de embeddings com a
+    dimensão: mudar qualquer um deles invalida o hash e força novo embedding.
+    
+    Args:
+        text: Texto do chunk
+        chunk_size: Tamanho configurado dos chunks
+        chunk_overlap: Overlap configurado dos chunks
+        embedding_model: Modelo e dimensão dos embeddings (ver `embedding_key`)
+        
+    Returns:
+        Hash SHA-256 em hexadecimal
+    """
+    payload = "\x1f".join([embedding_model, str(chunk_size), str(chunk_overlap), text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_id(collection_name: str, chunk: Document) -> str:
+    """
+    Gera id determinístico de um chunk dentro de uma coleção.
+    
+    O id combina coleção, origem, página e hash do conteúdo, de modo que
+    reingerir o mesmo documento produz os mesmos ids.
+    
+    Args:
+        collection_name: Nome da coleção no banco
+        chunk: Chunk com `content_hash` na metadata
+        
+    Returns:
+        UUID (v5) em formato string
+    """
+    metadata = chunk.metadata
+    content_hash = metadata.get("content_hash") or hashlib.sha256(
+        chunk.page_content.encode("utf-8")
+    ).hexdigest()
+    key = "\x1f".join([
+        collection_name,
+        str(metadata.get("source", "")),
+        str(metadata.get("page", "")),
+        content_hash,
+    ])
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def split_documents(documents: List[Document], verbose: bool = True) -> List[Document]:
     """
     Divide documentos em chunks.
     
@@ -61,8 +246,13 @@ def split_documents(documents: List[Document]) -> List[Document]:
     - Tamanho do chunk: 1000 caracteres (RN-005)
     - Overlap: 150 caracteres (RN-005)
     
+    Cada chunk recebe `content_hash` na metadata (texto + parâmetros de
+    chunking + modelo e dimensão dos embeddings), usado na ingestão incremental, e
+    `tokens`, usado no orçamento de contexto (ver `src.context`).
+    
     Args:
         documents: Lista de documentos a dividir
+        verbose: Exibe progresso no terminal
         
     Returns:
         Lista de chunks
@@ -70,7 +260,8 @@ def split_documents(documents: List[Document]) -> List[Document]:
     chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
     chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "150"))
     
-    typer.echo(f"✂️  Dividindo em chunks (size={chunk_size}, overlap={chunk_overlap})")
+    if verbose:
+        typer.echo(f"✂️  Dividindo em chunks (size={chunk_size}, overlap={chunk_overlap})")
     
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -81,85 +272,842 @@ def split_documents(documents: List[Document]) -> List[Document]:
     
     chunks = text_splitter.split_documents(documents)
     
-    typer.echo(f"✓ {len(chunks)} chunks criados")
+    embedding_model = embedding_key()
+    for chunk in chunks:
+        chunk.metadata["content_hash"] = compute_content_hash(
+            chunk.page_content, chunk_size, chunk_overlap, embedding_model
+        )
+        chunk.metadata["tokens"] = count_tokens(chunk.page_content)
+    
+    if verbose:
+        typer.echo(f"✓ {len(chunks)} chunks criados")
     return chunks
 
 
-def store_in_vectorstore(chunks: List[Document], collection_name: str = "rag_documents") -> None:
+def load_and_split(file_path: str) -> Tuple[List[Document], int, float]:
+    """
+    Carrega e divide um PDF (executado nos processos do pool).
+    
+    Args:
+        file_path: Caminho para o arquivo PDF
+        
+    Returns:
+        Tupla (chunks, quantidade de páginas, segundos gastos)
+    """
+    started = time.perf_counter()
+    documents = load_pdf(file_path, verbose=False)
+    chunks = split_documents(documents, verbose=False)
+    return chunks, len(documents), time.perf_counter() - started
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Document]:
+    """
+    Carrega um PDF página a página, sem materializar o documento inteiro.
+    
+    Args:
+        file_path: Caminho para o arquivo PDF
+        
+    Yields:
+        Um Document por página
+        
+    Raises:
+        FileNotFoundError: Se arquivo não existir
+        ValueError: Se arquivo não for PDF
+    """
+    pdf_path = _validate_pdf_path(file_path)
+    yield from PyPDFLoader(str(pdf_path)).lazy_load()
+
+
+def iter_chunks(pages: Iterable[Document]) -> Iterator[Document]:
+    """
+    Divide páginas em chunks de forma incremental.
+    
+    Diferente de `split_documents`, que trata cada página isoladamente, o
+    overlap atravessa a fronteira entre páginas: o início de cada página é
+    precedido pelos últimos CHUNK_OVERLAP caracteres da página anterior
+    (cortados em fronteira de palavra). A metadata de cada chunk é a da
+    página em que ele começa a ser lido.
+    
+    Args:
+        pages: Páginas em ordem (ex: `iter_pdf_pages`)
+        
+    Yields:
+        Chunks com `content_hash` e `tokens` na metadata
+    """
+    chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
+    chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "150"))
+    embedding_model = embedding_key()
+    
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    
+    carry = ""
+    previous_source = None
+    
+    for page in pages:
+        source = page.metadata.get("source")
+        if source != previous_source:
+            carry = ""
+        
+        for text in text_splitter.split_text(carry + page.page_content):
+            metadata = copy.deepcopy(page.metadata)
+            metadata["content_hash"] = compute_content_hash(
+                text, chunk_size, chunk_overlap, embedding_model
+            )
+            metadata["tokens"] = count_tokens(text)
+            yield Document(page_content=text, metadata=metadata)
+        
+        tail = page.page_content[-chunk_overlap:] if chunk_overlap else ""
+        if len(page.page_content) > chunk_overlap and " " in tail:
+            # Não começar o próximo chunk no meio de uma palavra
+            tail = tail[tail.index(" ") + 1:]
+        carry = f"{tail} " if tail.strip() else ""
+        previous_source = source
+
+
+def iter_batches(items: Sequence[T], batch_size: int) -> Iterator[List[T]]:
+    """
+    Divide uma sequência em lotes de tamanho fixo.
+    
+    Args:
+        items: Sequência a dividir
+        batch_size: Tamanho máximo de cada lote
+        
+    Yields:
+        Lotes consecutivos (o último pode ser menor)
+        
+    Raises:
+        ValueError: Se batch_size não for positivo
+    """
+    if batch_size <= 0:
+        raise ValueError(f"batch_size deve ser positivo: {batch_size}")
+    
+    for start in range(0, len(items), batch_size):
+        yield list(items[start:start + batch_size])
+
+
+class CopyWriter:
+    """
+    Grava lotes com COPY binário do PostgreSQL (psycopg 3).
+    
+    Cada lote é copiado para uma tabela temporária e então aplicado em
+    langchain_pg_embedding com INSERT ... ON CONFLICT, preservando o
+    upsert por id do caminho padrão. Em caso de erro, o writer passa a
+    usar `PGVector.add_embeddings` até o fim da ingestão.
+    
+    Attributes:
+        vectorstore: PGVector da coleção (usado também no fallback)
+        failed: Se o COPY falhou e o fallback está ativo
+    """
+    
+    def __init__(self, vectorstore: PGVector, database_url: Optional[str] = None):
+        """
+        Abre a conexão usada pelo COPY.
+        
+        Args:
+            vectorstore: PGVector da coleção (tabelas e coleção já criadas)
+            database_url: URL do banco (padrão: DATABASE_URL)
+        """
+        self.vectorstore = vectorstore
+        self.failed = False
+        self._conn = psycopg.connect(psycopg_conninfo(database_url), autocommit=True)
+        try:
+            register_vector(self._conn)
+            row = self._conn.execute(
+                f"SELECT uuid FROM {COLLECTION_TABLE} WHERE name = %s",
+                (vectorstore.collection_name,),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Coleção não encontrada: {vectorstore.collection_name}")
+        except Exception:
+            self._conn.close()
+            raise
+        self._collection_id = row[0]
+    
+    def _copy(self, batch: List[Document], vectors: List[List[float]]) -> None:
+        with self._conn.transaction(), self._conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS _ingest_stage ("
+                "id varchar, collection_id uuid, embedding vector, "
+                "document varchar, cmetadata jsonb) ON COMMIT DELETE ROWS"
+            )
+            with cur.copy(
+                "COPY _ingest_stage (id, collection_id, embedding, document, cmetadata) "
+                "FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["varchar", "uuid", "vector", "varchar", "jsonb"])
+                for chunk, vector in zip(batch, vectors):
+                    copy.write_row((
+                        chunk.id or str(uuid.uuid4()),
+                        self._collection_id,
+                        np.asarray(vector, dtype=np.float32),
+                        chunk.page_content,
+                        Jsonb(chunk.metadata),
+                    ))
+            cur.execute(
+                f"INSERT INTO {EMBEDDING_TABLE} "
+                "(id, collection_id, embedding, document, cmetadata) "
+                "SELECT id, collection_id, embedding, document, cmetadata FROM _ingest_stage "
+                "ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding, "
+                "document = EXCLUDED.document, cmetadata = EXCLUDED.cmetadata"
+            )
+    
+    def __call__(self, batch: List[Document], vectors: List[List[float]]) -> None:
+        if not self.failed:
+            try:
+                self._copy(batch, vectors)
+                return
+            except Exception as e:
+                self.failed = True
+                typer.echo(f"⚠️  COPY falhou ({e}); usando add_embeddings", err=True)
+        
+        write_with_orm(self.vectorstore, batch, vectors)
+    
+    def close(self) -> None:
+        """Fecha a conexão do COPY."""
+        self._conn.close()
+
+
+def open_copy_writer(vectorstore: PGVector) -> Optional[CopyWriter]:
+    """
+    Cria o CopyWriter da coleção, ou sinaliza o fallback para o caminho padrão.
+    
+    Args:
+        vectorstore: PGVector da coleção
+        
+    Returns:
+        CopyWriter; None se a conexão ou a consulta da coleção falharem
+        (gravar com `write_with_orm`)
+    """
+    try:
+        return CopyWriter(vectorstore)
+    except Exception as e:
+        typer.echo(f"⚠️  COPY indisponível ({e}); usando add_embeddings", err=True)
+        return None
+
+
+def write_with_orm(vectorstore: PGVector, batch: List[Document], vectors: List[List[float]]) -> None:
+    """
+    Grava um lote pelo caminho padrão do langchain_postgres.
+    
+    Args:
+        vectorstore: PGVector da coleção
+        batch: Chunks do lote
+        vectors: Embeddings correspondentes
+    """
+    vectorstore.add_embeddings(
+        texts=[chunk.page_content for chunk in batch],
+        embeddings=vectors,
+        metadatas=[chunk.metadata for chunk in batch],
+        ids=[chunk.id for chunk in batch],
+    )
+
+
+def embed_and_store(
+    chunks: Sequence[Document],
+    embeddings: Embeddings,
+    vectorstore: PGVector,
+    batch_size: int,
+    max_workers: int,
+    writer: Optional[BatchWriter] = None,
+) -> int:
+    """
+    Gera embeddings em lotes concorrentes e grava cada lote no vectorstore.
+    
+    No máximo `max_workers` lotes ficam em processamento ao mesmo tempo.
+    A gravação acontece na thread chamadora, na ordem original dos lotes,
+    enquanto os lotes seguintes continuam gerando embeddings nas threads
+    do pool (sobreposição entre embedding do lote N+1 e escrita do lote N).
+    
+    Args:
+        chunks: Chunks a armazenar
+        embeddings: Modelo de embeddings
+        vectorstore: Destino dos vetores
+        batch_size: Quantidade de chunks por lote
+        max_workers: Máximo de lotes em processamento simultâneo
+        writer: Função de gravação de lote (padrão: `write_with_orm`)
+        
+    Returns:
+        Quantidade de chunks gravados
+    """
+    if max_workers <= 0:
+        raise ValueError(f"max_workers deve ser positivo: {max_workers}")
+    
+    total = len(chunks)
+    stored = 0
+    pending: Deque[Tuple[List[Document], Future]] = deque()
+    
+    def write_oldest() -> int:
+        batch, future = pending.popleft()
+        if writer is None:
+            write_with_orm(vectorstore, batch, future.result())
+        else:
+            writer(batch, future.result())
+        return len(batch)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in iter_batches(chunks, batch_size):
+            # Limitar lotes em voo: grava o mais antigo antes de enviar outro
+            if len(pending) >= max_workers:
+                stored += write_oldest()
+                typer.echo(f"   ↳ {stored}/{total} chunks armazenados")
+            
+            texts = [chunk.page_content for chunk in batch]
+            pending.append((batch, executor.submit(embeddings.embed_documents, texts)))
+        
+        while pending:
+            stored += write_oldest()
+            typer.echo(f"   ↳ {stored}/{total} chunks armazenados")
+    
+    return stored
+
+
+def fetch_existing_ids(vectorstore: PGVector, ids: Sequence[str]) -> Set[str]:
+    """
+    Retorna quais dos ids informados já existem na coleção.
+    
+    Args:
+        vectorstore: Vectorstore da coleção
+        ids: Ids a verificar
+        
+    Returns:
+        Conjunto com os ids já armazenados
+    """
+    store = vectorstore.EmbeddingStore
+    existing: Set[str] = set()
+    
+    with vectorstore.session_maker() as session:
+        collection = vectorstore.get_collection(session)
+        for batch in iter_batches(ids, 1000):
+            rows = session.query(store.id).filter(
+                store.collection_id == collection.uuid,
+                store.id.in_(batch),
+            )
+            existing.update(row.id for row in rows)
+    
+    return existing
+
+
+def prune_stale_chunks(
+    vectorstore: PGVector,
+    sources: Set[str],
+    current_ids: Set[str],
+) -> int:
+    """
+    Remove chunks das origens reingeridas que não existem mais.
+    
+    Cobre páginas removidas do PDF e versões antigas de chunks alterados.
+    
+    Args:
+        vectorstore: Vectorstore da coleção
+        sources: Origens (campo `source` da metadata) reingeridas
+        current_ids: Ids produzidos pela ingestão atual
+        
+    Returns:
+        Quantidade de chunks removidos
+    """
+    if not sources:
+        return 0
+    
+    store = vectorstore.EmbeddingStore
+    with vectorstore.session_maker() as session:
+        collection = vectorstore.get_collection(session)
+        rows = session.query(store.id).filter(
+            store.collection_id == collection.uuid,
+            store.cmetadata["source"].astext.in_(sorted(sources)),
+        )
+        stale = [row.id for row in rows if row.id not in current_ids]
+    
+    for batch in iter_batches(stale, 1000):
+        vectorstore.delete(ids=batch, collection_only=True)
+    
+    return len(stale)
+
+
+def normalize_tags(tags: Optional[Sequence[str]]) -> List[str]:
+    """
+    Normaliza tags de ingestão (sem espaços extras, vazias ou repetidas).
+    
+    Args:
+        tags: Tags informadas pelo usuário
+        
+    Returns:
+        Tags ordenadas
+    """
+    return sorted({tag.strip() for tag in tags or [] if tag.strip()})
+
+
+def retag_chunks(ids: Sequence[str], tags: List[str]) -> int:
+    """
+    Aplica as tags da ingestão atual a chunks já armazenados.
+    
+    Chunks inalterados não são regravados; só a metadata `tags` muda.
+    
+    Args:
+        ids: Ids dos chunks existentes
+        tags: Tags normalizadas
+        
+    Returns:
+        Quantidade de chunks cujas tags mudaram
+    """
+    updated = 0
+    with psycopg.connect(psycopg_conninfo()) as conn:
+        for batch in iter_batches(list(ids), 1000):
+            updated += conn.execute(
+                f"UPDATE {EMBEDDING_TABLE} SET cmetadata = jsonb_set(cmetadata, '{{tags}}', %(tags)s) "
+                "WHERE id = ANY(%(ids)s) AND cmetadata -> 'tags' IS DISTINCT FROM %(tags)s",
+                {"tags": Jsonb(tags), "ids": batch},
+            ).rowcount
+    return updated
+
+
+def build_vectorstore(collection_name: str, embeddings: Embeddings) -> PGVector:
+    """
+    Cria o PGVector da coleção sobre a engine compartilhada (pool de conexões).
+    
+    Args:
+        collection_name: Nome da coleção no banco
+        embeddings: Modelo de embeddings
+        
+    Returns:
+        Instância do PGVector
+        
+    Raises:
+        ValueError: Se DATABASE_URL não configurada
+    """
+    return PGVector(
+        embeddings=embeddings,
+        collection_name=collection_name,
+        connection=get_engine(),
+        use_jsonb=True,
+    )
+
+
+def store_in_vectorstore(
+    chunks: List[Document],
+    collection_name: str = "rag_documents",
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    prune: bool = False,
+    vectorstore: Optional[PGVector] = None,
+    writer: Optional[str] = None,
+    tags: Optional[Sequence[str]] = None,
+) -> int:
     """
     Armazena chunks no PGVector.
     
+    Embeddings são gerados em lotes (EMBEDDING_BATCH_SIZE, padrão 64) com até
+    EMBEDDING_CONCURRENCY (padrão 4) lotes simultâneos.
+    
+    A ingestão é incremental: cada chunk recebe um id determinístico
+    (ver `chunk_id`) e chunks já presentes na coleção não são reenviados
+    ao provedor de embeddings.
+    
+    Chunks novos recebem na metadata `ingested_at` (ISO 8601, UTC) e, se
+    informadas, `tags`; chunks existentes só têm as tags atualizadas.
+    Ambas podem ser filtradas na busca (ver `src.filters`).
+    
     Args:
         chunks: Lista de chunks a armazenar
         collection_name: Nome da coleção no banco
+        batch_size: Chunks por lote de embedding (sobrescreve o .env)
+        max_workers: Lotes simultâneos (sobrescreve o .env)
+        prune: Remove chunks antigos das mesmas origens que não foram
+            produzidos nesta ingestão
+        vectorstore: PGVector já criado para a coleção (reutilizado entre
+            arquivos); criado aqui se omitido
+        writer: "orm" (add_embeddings) ou "copy" (COPY binário com
+            fallback para orm); padrão: INGEST_WRITER ou "orm"
+        tags: Tags gravadas na metadata `tags` dos chunks
+        
+    Returns:
+        Quantidade de chunks novos armazenados
         
     Raises:
         ValueError: Se DATABASE_URL não configurada
         Exception: Se houver erro ao armazenar
     """
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        raise ValueError("DATABASE_URL não configurada no .env")
+    get_database_url()
+    writer = resolve_writer(writer)
     
     # Verificar se há chunks para armazenar
     if not chunks:
         typer.echo("⚠️  Nenhum chunk para armazenar")
-        return
+        return 0
     
-    embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    embedding_model, dimensions = embedding_settings()
+    batch_size = batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    max_workers = max_workers or int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
     
     typer.echo(f"🔢 Gerando embeddings com {embedding_model}")
-    embeddings = OpenAIEmbeddings(model=embedding_model)
+    if vectorstore is None:
+        vectorstore = build_vectorstore(collection_name, get_embeddings(embedding_model))
+    embeddings = vectorstore.embeddings
     
-    typer.echo(f"💾 Armazenando no PGVector (collection: {collection_name})")
-    
-    vectorstore = PGVector(
-        embeddings=embeddings,
-        collection_name=collection_name,
-        connection=database_url,
-        use_jsonb=True,
+    typer.echo(
+        f"💾 Armazenando no PGVector (collection: {collection_name}, "
+        f"lotes de {batch_size}, {max_workers} simultâneos)"
     )
     
-    # Adicionar chunks ao vectorstore
-    vectorstore.add_documents(chunks)
+    # Ids determinísticos; duplicatas no mesmo lote quebrariam o upsert
+    unique: Dict[str, Document] = {}
+    for chunk in chunks:
+        chunk.id = chunk_id(collection_name, chunk)
+        unique.setdefault(chunk.id, chunk)
     
-    typer.echo(f"✓ {len(chunks)} chunks armazenados com sucesso")
+    existing = fetch_existing_ids(vectorstore, list(unique))
+    new_chunks = [chunk for id_, chunk in unique.items() if id_ not in existing]
+    
+    if existing:
+        typer.echo(f"♻️  {len(existing)} chunks inalterados (ignorados)")
+    
+    tags = normalize_tags(tags)
+    ingested_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for chunk in new_chunks:
+        chunk.metadata["ingested_at"] = ingested_at
+        if tags:
+            chunk.metadata["tags"] = tags
+    
+    removed = 0
+    retagged = 0
+    try:
+        if tags and existing:
+            retagged = retag_chunks(sorted(existing), tags)
+            if retagged:
+                typer.echo(f"🏷️  Tags atualizadas em {retagged} chunks existentes")
+        
+        if prune:
+            sources = {str(c.metadata["source"]) for c in chunks if "source" in c.metadata}
+            removed = prune_stale_chunks(vectorstore, sources, set(unique))
+            typer.echo(f"🧹 {removed} chunks obsoletos removidos")
+        
+        copy_writer = open_copy_writer(vectorstore) if writer == "copy" and new_chunks else None
+        try:
+            stored = embed_and_store(
+                new_chunks, embeddings, vectorstore, batch_size, max_workers, copy_writer
+            )
+        finally:
+            if copy_writer is not None:
+                copy_writer.close()
+    finally:
+        # Modelo e dimensão dos vetores gravados (lidos pela exportação)
+        if new_chunks:
+            set_collection_metadata(
+                collection_name,
+                {"embedding_model": embedding_model, "embedding_dimensions": dimensions},
+            )
+        # Invalida caches de busca e respostas, mesmo após escrita parcial
+        if new_chunks or removed or retagged:
+            bump_collection_version(collection_name)
+    
+    typer.echo(f"✓ {stored} chunks armazenados com sucesso")
+    return stored
+
+
+def stream_ingest_file(
+    file_path: str,
+    collection_name: str,
+    vectorstore: PGVector,
+    window: int,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    prune: bool = False,
+    writer: Optional[str] = None,
+    tags: Optional[Sequence[str]] = None,
+) -> FileIngestResult:
+    """
+    Ingere um PDF em modo streaming, com memória limitada.
+    
+    Páginas são lidas sob demanda, divididas com `iter_chunks` e gravadas em
+    janelas de `window` chunks; apenas uma janela fica em memória por vez,
+    independente do tamanho do documento.
+    
+    Args:
+        file_path: Caminho para o arquivo PDF
+        collection_name: Nome da coleção no banco
+        vectorstore: PGVector da coleção
+        window: Chunks por janela de gravação
+        batch_size: Chunks por lote de embedding
+        max_workers: Lotes de embedding simultâneos
+        prune: Remove chunks obsoletos do arquivo ao final
+        writer: Caminho de gravação ("orm" ou "copy")
+        tags: Tags gravadas na metadata dos chunks
+        
+    Returns:
+        Resultado da ingestão do arquivo
+    """
+    if window <= 0:
+        raise ValueError(f"window deve ser positivo: {window}")
+    
+    result = FileIngestResult(path=file_path)
+    started = time.perf_counter()
+    seen_ids: Set[str] = set()
+    sources: Set[str] = set()
+    buffer: List[Document] = []
+    
+    def pages_counted() -> Iterator[Document]:
+        for page in iter_pdf_pages(file_path):
+            result.pages += 1
+            yield page
+    
+    def flush() -> None:
+        flush_started = time.perf_counter()
+        result.stored += store_in_vectorstore(
+            buffer, collection_name, batch_size, max_workers, False, vectorstore, writer, tags
+        )
+        result.store_seconds += time.perf_counter() - flush_started
+        seen_ids.update(chunk.id for chunk in buffer)
+        sources.update(str(c.metadata["source"]) for c in buffer if "source" in c.metadata)
+        buffer.clear()
+    
+    for chunk in iter_chunks(pages_counted()):
+        result.chunks += 1
+        buffer.append(chunk)
+        if len(buffer) >= window:
+            flush()
+    if buffer:
+        flush()
+    
+    if prune:
+        removed = prune_stale_chunks(vectorstore, sources, seen_ids)
+        typer.echo(f"🧹 {removed} chunks obsoletos removidos")
+    
+    result.parse_seconds = time.perf_counter() - started - result.store_seconds
+    return result
+
+
+def ingest_files(
+    paths: Sequence[str],
+    collection_name: str,
+    batch_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    prune: bool = False,
+    processes: Optional[int] = None,
+    stream: bool = False,
+    window: Optional[int] = None,
+    writer: Optional[str] = None,
+    tags: Optional[Sequence[str]] = None,
+) -> List[FileIngestResult]:
+    """
+    Ingere vários PDFs com leitura e chunking em um pool de processos.
+    
+    Os arquivos são lidos e divididos em paralelo (um processo por núcleo,
+    ou INGEST_PROCESSES) e cada resultado segue para embeddings e gravação
+    assim que fica pronto, sem esperar os demais arquivos.
+    
+    Em modo streaming os arquivos são processados um a um no processo
+    principal (ver `stream_ingest_file`), priorizando memória constante.
+    
+    Args:
+        paths: Caminhos dos PDFs
+        collection_name: Nome da coleção no banco
+        batch_size: Chunks por lote de embedding
+        max_workers: Lotes de embedding simultâneos
+        prune: Remove chunks obsoletos de cada arquivo
+        processes: Tamanho do pool de processos
+        stream: Usa ingestão página a página com janelas de gravação
+        window: Chunks por janela no modo streaming (padrão: STREAM_WINDOW ou 256)
+        writer: Caminho de gravação ("orm" ou "copy")
+        tags: Tags gravadas na metadata dos chunks
+        
+    Returns:
+        Resultado por arquivo, na ordem de conclusão
+        
+    Raises:
+        ValueError: Se writer inválido
+    """
+    # Writer inválido falha antes de ler qualquer arquivo
+    writer = resolve_writer(writer)
+    processes = processes or int(os.getenv("INGEST_PROCESSES", "0")) or os.cpu_count() or 1
+    processes = min(processes, len(paths))
+    vectorstore = build_vectorstore(collection_name, get_embeddings())
+    if ensure_text_search():
+        typer.echo("🔤 Coluna tsvector e índice GIN da busca híbrida criados")
+    for name in ensure_metadata_indexes():
+        typer.echo(f"🗂️  Índice de metadata criado: {name}")
+    results: List[FileIngestResult] = []
+    
+    if stream:
+        window = window or int(os.getenv("STREAM_WINDOW", "256"))
+        for index, path in enumerate(paths, 1):
+            typer.echo(f"\n📄 [{index}/{len(paths)}] {path} (streaming, janelas de {window})")
+            try:
+                result = stream_ingest_file(
+                    path, collection_name, vectorstore, window,
+                    batch_size, max_workers, prune, writer, tags,
+                )
+            except Exception as e:
+                result = FileIngestResult(path=path, error=str(e))
+                typer.echo(f"❌ Falha em {path}: {e}", err=True)
+            results.append(result)
+        return results
+    
+    def store(result: FileIngestResult, chunks: List[Document]) -> None:
+        started = time.perf_counter()
+        result.stored = store_in_vectorstore(
+            chunks, collection_name, batch_size, max_workers, prune, vectorstore, writer, tags
+        )
+        result.store_seconds = time.perf_counter() - started
+    
+    if processes <= 1:
+        for path in paths:
+            result = FileIngestResult(path=path)
+            results.append(result)
+            typer.echo(f"\n📄 [{len(results)}/{len(paths)}] {path}")
+            
+            try:
+                chunks, result.pages, result.parse_seconds = load_and_split(path)
+                result.chunks = len(chunks)
+                store(result, chunks)
+            except Exception as e:
+                result.error = str(e)
+                typer.echo(f"❌ Falha em {path}: {e}", err=True)
+        return results
+    
+    typer.echo(f"⚙️  Lendo {len(paths)} PDFs com {processes} processos")
+    # spawn: o processo principal já tem threads (pool de embeddings, cache)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+        futures = {executor.submit(load_and_split, path): path for path in paths}
+        
+        for future in as_completed(futures):
+            result = FileIngestResult(path=futures[future])
+            results.append(result)
+            typer.echo(f"\n📄 [{len(results)}/{len(paths)}] {result.path}")
+            
+            try:
+                chunks, result.pages, result.parse_seconds = future.result()
+                result.chunks = len(chunks)
+                store(result, chunks)
+            except Exception as e:
+                result.error = str(e)
+                typer.echo(f"❌ Falha em {result.path}: {e}", err=True)
+    
+    return results
 
 
 @app.command()
 def main(
-    pdf_path: str = typer.Argument(..., help="Caminho para o arquivo PDF"),
+    pdf_paths: List[str] = typer.Argument(
+        ..., help="Arquivos PDF, diretórios ou padrões glob (ex: 'docs/**/*.pdf')"
+    ),
     collection: str = typer.Option("rag_documents", help="Nome da coleção no banco"),
+    batch_size: Optional[int] = typer.Option(
+        None, help="Chunks por lote de embedding (padrão: EMBEDDING_BATCH_SIZE ou 64)"
+    ),
+    workers: Optional[int] = typer.Option(
+        None, help="Lotes de embedding simultâneos (padrão: EMBEDDING_CONCURRENCY ou 4)"
+    ),
+    prune: bool = typer.Option(
+        False, help="Remove chunks de páginas/trechos que não existem mais no PDF"
+    ),
+    processes: Optional[int] = typer.Option(
+        None, help="Processos para leitura dos PDFs (padrão: INGEST_PROCESSES ou núcleos)"
+    ),
+    stream: bool = typer.Option(
+        False, help="Lê páginas sob demanda e grava em janelas (memória constante)"
+    ),
+    window: Optional[int] = typer.Option(
+        None, help="Chunks por janela no modo --stream (padrão: STREAM_WINDOW ou 256)"
+    ),
+    writer: Optional[str] = typer.Option(
+        None, help="Gravação: 'orm' (add_embeddings) ou 'copy' (COPY binário); padrão: INGEST_WRITER"
+    ),
+    quantization: Optional[str] = typer.Option(
+        None, help="Quantização da coleção na busca: none, halfvec ou binary"
+    ),
+    tag: List[str] = typer.Option(
+        [], "--tag", help="Tag gravada na metadata dos chunks (repita para várias)"
+    ),
 ) -> None:
     """
-    Ingere documento PDF no sistema RAG.
+    Ingere documentos PDF no sistema RAG.
     
     Processo:
-    1. Carrega PDF
+    1. Carrega PDFs (em paralelo quando há vários)
     2. Divide em chunks de 1000 caracteres (overlap 150)
-    3. Gera embeddings
+    3. Gera embeddings em lotes concorrentes
     4. Armazena no PGVector
     
     Exemplo:
         python src/ingest.py document.pdf
         python src/ingest.py document.pdf --collection custom_docs
+        python src/ingest.py document.pdf --batch-size 128 --workers 8
+        python src/ingest.py document.pdf --prune
+        python src/ingest.py relatorios/ 'anexos/**/*.pdf' --processes 8
+        python src/ingest.py relatorio_gigante.pdf --stream --window 512
+        python src/ingest.py relatorios/ --writer copy
+        python src/ingest.py relatorios/ --quantization halfvec
+        python src/ingest.py relatorios/ --tag financeiro --tag 2024
     """
     try:
-        typer.echo("🚀 Iniciando ingestão de documento\n")
+        writer = resolve_writer(writer)
+    except ValueError as e:
+        typer.echo(f"❌ Erro de validação: {e}", err=True)
+        raise typer.Exit(code=1)
+    
+    try:
+        typer.echo("🚀 Iniciando ingestão de documentos\n")
         
-        # 1. Carregar PDF
-        documents = load_pdf(pdf_path)
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Quantização inválida: {quantization} (opções: {', '.join(QUANTIZATIONS)})"
+            )
         
-        # 2. Dividir em chunks
-        chunks = split_documents(documents)
+        paths = resolve_pdf_paths(pdf_paths)
         
-        # 3. Armazenar no vectorstore
-        store_in_vectorstore(chunks, collection)
+        started = time.perf_counter()
+        results = ingest_files(
+            paths, collection, batch_size, workers, prune, processes, stream, window, writer, tag
+        )
+        elapsed = time.perf_counter() - started
         
-        typer.echo("\n✅ Ingestão concluída com sucesso!")
-        typer.echo(f"📊 Total de chunks: {len(chunks)}")
+        if quantization is not None:
+            set_collection_quantization(collection, quantization)
+        
+        failed = [r for r in results if r.error]
+        total_chunks = sum(r.chunks for r in results)
+        total_stored = sum(r.stored for r in results)
+        
+        typer.echo("\n📋 Resumo por arquivo:")
+        for r in results:
+            name = Path(r.path).name
+            if r.error:
+                typer.echo(f"   ❌ {name}: {r.error}")
+            else:
+                typer.echo(
+                    f"   ✓ {name}: {r.pages} páginas, {r.chunks} chunks "
+                    f"({r.stored} novos) — leitura {r.parse_seconds:.2f}s, "
+                    f"armazenamento {r.store_seconds:.2f}s"
+                )
+        
+        if failed:
+            typer.echo(f"\n⚠️  Ingestão concluída com {len(failed)} arquivo(s) com falha")
+        else:
+            typer.echo("\n✅ Ingestão concluída com sucesso!")
+        typer.echo(f"📊 Total de chunks: {total_chunks} em {len(results)} arquivo(s)")
         typer.echo(f"🗄️  Coleção: {collection}")
+        if quantization not in (None, "none"):
+            typer.echo(
+                f"🗜️  Quantização: {quantization} "
+                f"(índice: python src/index.py create --quantization {quantization})"
+            )
+        if total_stored and elapsed > 0:
+            typer.echo(f"⚡ Throughput: {total_stored / elapsed:.1f} chunks/s ({elapsed:.2f}s)")
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            stats = get_cache().stats()
+            typer.echo(
+                f"🗃️  Cache de embeddings: {stats['hits']} hits, "
+                f"{stats['misses']} misses ({stats['entries']} entradas)"
+            )
         
+        if failed:
+            sys.exit(1)
+    
     except FileNotFoundError as e:
         typer.echo(f"❌ Erro: {e}", err=True)
         sys.exit(1)
@@ -0,0 +1,435 @@
+"""
+Busca exata em memória com NumPy.
+
+Alternativa ao PGVector para coleções pequenas e médias: os embeddings da
+coleção ficam em uma matriz float32 contígua com linhas já normalizadas, e o
+top-k sai de um único produto matriz-vetor seguido de `argpartition`. Os
+scores são distâncias de cosseno, como no PGVector.
+
+A matriz pode ser salva em um snapshot no disco e reaberta por memory-map,
+sem carregar nada além do que as buscas tocam:
+
+    <dir>/manifest.json   coleção, versão, modelo, quantidade e dimensão
+    <dir>/vectors.npy     matriz float32 (N x D) normalizada
+    <dir>/offsets.npy     int64 (N + 1) com o início de cada registro no blob
+    <dir>/blob.bin        registros JSON (id, documento, metadados) concatenados
+
+Uso:
+    python src/memory_index.py build --collection rag_documents
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import typer
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from src.db import COLLECTION_TABLE, EMBEDDING_TABLE, collection_version, get_database_url, get_engine
+
+load_dotenv()
+
+app = typer.Typer()
+
+
+@app.callback()
+def callback() -> None:
+    """Snapshots da busca exata em memória."""
+
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+OFFSETS_FILE = "offsets.npy"
+BLOB_FILE = "blob.bin"
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normaliza as linhas de uma matriz (norma L2 = 1).
+    
+    Args:
+        matrix: Matriz (N x D) ou vetor (D)
+        
+    Returns:
+        Matriz float32 contígua com linhas unitárias (linhas nulas ficam nulas)
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def encode_record(document: Document) -> bytes:
+    """
+    Serializa um documento (id, conteúdo e metadados) para o blob.
+    
+    Args:
+        document: Documento com id
+        
+    Returns:
+        Registro JSON em UTF-8
+    """
+    return json.dumps(
+        {"id": document.id, "document": document.page_content, "metadata": document.metadata},
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def decode_record(record: bytes) -> Document:
+    """
+    Reconstrói um documento serializado por `encode_record`.
+    
+    Args:
+        record: Registro JSON em UTF-8
+        
+    Returns:
+        Document com id, conteúdo e metadados
+    """
+    data = json.loads(record.decode("utf-8"))
+    return Document(id=data["id"], page_content=data["document"], metadata=data["metadata"])
+
+
+class MemoryIndex:
+    """
+    Índice exato em memória de uma coleção.
+    
+    Attributes:
+        collection_name: Nome da coleção
+        version: Versão da coleção carregada (ver `collection_version`)
+        embedding_model: Modelo que gerou os embeddings
+        vectors: Matriz float32 (N x D) normalizada (pode ser memory-map)
+        checked_at: Instante da última verificação de versão
+    """
+    
+    def __init__(
+        self,
+        collection_name: str,
+        version: Optional[str],
+        embedding_model: str,
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        blob,
+    ):
+        self.collection_name = collection_name
+        self.version = version
+        self.embedding_model = embedding_model
+        self.vectors = vectors
+        self._offsets = offsets
+        self._blob = blob
+        self.checked_at = time.monotonic()
+    
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+    
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+    
+    def document(self, row: int) -> Document:
+        """
+        Decodifica o documento de uma linha da matriz.
+        
+        Args:
+            row: Índice da linha
+            
+        Returns:
+            Document com id, conteúdo e metadados
+        """
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return decode_record(bytes(self._blob[start:end]))
+    
+    def _top_rows(self, scores: np.ndarray, k: int) -> np.ndarray:
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        # Ordenar só os candidatos: similaridade decrescente = distância crescente
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+    
+    def _top_k(self, scores: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        return [(self.document(int(row)), float(1 - scores[row])) for row in self._top_rows(scores, k)]
+    
+    def search(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        """
+        Busca os k documentos mais próximos de um vetor.
+        
+        Args:
+            embedding: Vetor da query
+            k: Número de resultados
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) ordenada por relevância
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+        scores = self.vectors @ normalize_rows(embedding)
+        return self._top_k(scores, k)
+    
+    def search_with_vectors(
+        self, embedding: List[float], k: int
+    ) -> Tuple[List[Tuple[Document, float]], np.ndarray]:
+        """
+        Como `search`, devolvendo também os vetores dos resultados (ex: para MMR).
+        
+        Args:
+            embedding: Vetor da query
+            k: Número de resultados
+            
+        Returns:
+            Tupla (resultados, matriz float32 k x D normalizada na mesma ordem)
+        """
+        if len(self) == 0 or k <= 0:
+            return [], np.empty((0, self.dimensions), dtype=np.float32)
+        scores = self.vectors @ normalize_rows(embedding)
+        rows = self._top_rows(scores, k)
+        results = [(self.document(int(row)), float(1 - scores[row])) for row in rows]
+        return results, np.asarray(self.vectors[rows])
+    
+    def search_many(self, embeddings: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+        """
+        Busca vários vetores com um único produto de matrizes.
+        
+        Args:
+            embeddings: Vetores das queries
+            k: Número de resultados por query
+            
+        Returns:
+            Uma lista de tuplas (documento, distância) por vetor, na ordem de entrada
+        """
+        if not embeddings:
+            return []
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in embeddings]
+        scores = normalize_rows(embeddings) @ self.vectors.T
+        return [self._top_k(row, k) for row in scores]
+    
+    @classmethod
+    def from_database(
+        cls,
+        collection_name: str,
+        embedding_model: str,
+        database_url: Optional[str] = None,
+    ) -> "MemoryIndex":
+        """
+        Carrega todos os embeddings de uma coleção do PostgreSQL.
+        
+        Args:
+            collection_name: Nome da coleção
+            embedding_model: Modelo que gerou os embeddings
+            database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+            
+        Returns:
+            MemoryIndex com a coleção inteira
+        """
+        version = collection_version(collection_name, database_url)
+        documents: List[Document] = []
+        embeddings: List[np.ndarray] = []
+        
+        with get_engine(database_url).connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=1000).execute(
+                text(
+                    f"SELECT e.id, e.document, e.cmetadata, e.embedding::real[] "
+                    f"FROM {EMBEDDING_TABLE} e JOIN {COLLECTION_TABLE} c ON c.uuid = e.collection_id "
+                    f"WHERE c.name = :name ORDER BY e.id"
+                ),
+                {"name": collection_name},
+            )
+            for id_, document, metadata, embedding in result:
+                documents.append(Document(id=str(id_), page_content=document, metadata=metadata or {}))
+                embeddings.append(np.asarray(embedding, dtype=np.float32))
+        
+        return cls.from_documents(collection_name, version, embedding_model, documents, embeddings)
+    
+    @classmethod
+    def from_documents(
+        cls,
+        collection_name: str,
+        version: Optional[str],
+        embedding_model: str,
+        documents: List[Document],
+        embeddings: List[List[float]],
+    ) -> "MemoryIndex":
+        """
+        Monta o índice a partir de documentos e seus embeddings.
+        
+        Args:
+            collection_name: Nome da coleção
+            version: Versão da coleção
+            embedding_model: Modelo que gerou os embeddings
+            documents: Documentos (com id) na ordem dos embeddings
+            embeddings: Vetores dos documentos
+            
+        Returns:
+            MemoryIndex em memória
+        """
+        records = [encode_record(doc) for doc in documents]
+        if len(embeddings):
+            vectors = normalize_rows(np.stack([np.asarray(e, dtype=np.float32) for e in embeddings]))
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(record) for record in records])
+        return cls(collection_name, version, embedding_model, vectors, offsets, b"".join(records))
+    
+    def save(self, path: str) -> None:
+        """
+        Grava o snapshot em um diretório (substituído por inteiro).
+        
+        Args:
+            path: Diretório do snapshot
+        """
+        target = Path(path)
+        staging = target.with_name(target.name + ".tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        
+        np.save(staging / VECTORS_FILE, np.ascontiguousarray(self.vectors))
+        np.save(staging / OFFSETS_FILE, np.asarray(self._offsets))
+        (staging / BLOB_FILE).write_bytes(bytes(self._blob))
+        manifest = {
+            "collection": self.collection_name,
+            "version": self.version,
+            "embedding_model": self.embedding_model,
+            "count": len(self),
+            "dimensions": self.dimensions,
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        
+        shutil.rmtree(target, ignore_errors=True)
+        staging.rename(target)
+    
+    @classmethod
+    def load(cls, path: str) -> "MemoryIndex":
+        """
+        Abre um snapshot por memory-map.
+        
+        Args:
+            path: Diretório do snapshot
+            
+        Returns:
+            MemoryIndex apoiado nos arquivos do snapshot
+            
+        Raises:
+            FileNotFoundError: Se o snapshot não existir
+        """
+        directory = Path(path)
+        manifest = json.loads((directory / MANIFEST_FILE).read_text(encoding="utf-8"))
+        vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+        offsets = np.load(directory / OFFSETS_FILE, mmap_mode="r")
+        blob_path = directory / BLOB_FILE
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if blob_path.stat().st_size else b""
+        return cls(
+            manifest["collection"],
+            manifest["version"],
+            manifest["embedding_model"],
+            vectors,
+            offsets,
+            blob,
+        )
+
+
+def snapshot_path(collection_name: str, snapshot_dir: Optional[str] = None) -> str:
+    """
+    Caminho do snapshot de uma coleção.
+    
+    Args:
+        collection_name: Nome da coleção
+        snapshot_dir: Diretório base (padrão: SEARCH_SNAPSHOT_DIR ou .cache/snapshots)
+        
+    Returns:
+        Diretório do snapshot da coleção
+    """
+    snapshot_dir = snapshot_dir or os.getenv("SEARCH_SNAPSHOT_DIR", ".cache/snapshots")
+    return str(Path(snapshot_dir) / collection_name)
+
+
+_lock = threading.Lock()
+_indexes: Dict[Tuple[str, str, str], MemoryIndex] = {}
+
+
+def get_memory_index(
+    collection_name: str,
+    embedding_model: str,
+    database_url: Optional[str] = None,
+    snapshot_dir: Optional[str] = None,
+) -> MemoryIndex:
+    """
+    Retorna o índice em memória compartilhado do processo.
+    
+    Abre o snapshot da coleção se ele corresponder à versão atual da
+    coleção; senão carrega do banco e regrava o snapshot. A versão é
+    reverificada a cada SEARCH_MEMORY_REFRESH_SECONDS (padrão 60; 0 = a
+    cada busca), de modo que uma reingestão é percebida sem reiniciar.
+    
+    Args:
+        collection_name: Nome da coleção
+        embedding_model: Modelo que gerou os embeddings
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        snapshot_dir: Diretório base dos snapshots (padrão: SEARCH_SNAPSHOT_DIR)
+        
+    Returns:
+        Instância de MemoryIndex
+    """
+    database_url = database_url or get_database_url()
+    key = (database_url, collection_name, embedding_model)
+    refresh_seconds = float(os.getenv("SEARCH_MEMORY_REFRESH_SECONDS", "60"))
+    
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None and time.monotonic() - index.checked_at < refresh_seconds:
+            return index
+        
+        version = collection_version(collection_name, database_url)
+        if index is not None and index.version == version:
+            index.checked_at = time.monotonic()
+            return index
+        
+        path = snapshot_path(collection_name, snapshot_dir)
+        try:
+            index = MemoryIndex.load(path)
+        except (FileNotFoundError, KeyError, ValueError):
+            index = None
+        if index is None or index.version != version or index.embedding_model != embedding_model:
+            index = MemoryIndex.from_database(collection_name, embedding_model, database_url)
+            index.save(path)
+        
+        _indexes[key] = index
+        return index
+
+
+@app.command()
+def build(
+    collection: str = typer.Option("rag_documents", help="Coleção no banco"),
+    snapshot_dir: Optional[str] = typer.Option(None, help="Diretório base dos snapshots"),
+) -> None:
+    """
+    Gera (ou regenera) o snapshot em disco de uma coleção.
+    """
+    try:
+        embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        started = time.perf_counter()
+        index = MemoryIndex.from_database(collection, embedding_model)
+        path = snapshot_path(collection, snapshot_dir)
+        index.save(path)
+        typer.echo(
+            f"✓ Snapshot de {collection} gravado em {path} "
+            f"({len(index)} vetores x {index.dimensions} dims, {time.perf_counter() - started:.2f}s)"
+        )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
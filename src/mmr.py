@@ -0,0 +1,68 @@
+"""
+Seleção de contexto com diversidade (Maximal Marginal Relevance).
+
+Chunks vizinhos compartilham o overlap do `split_documents` e costumam
+aparecer juntos no top-k, repetindo quase o mesmo texto no prompt. O MMR
+escolhe, entre candidatos já recuperados, um a um o chunk que maximiza
+
+    lambda * sim(query, chunk) - (1 - lambda) * max sim(chunk, escolhidos)
+
+Os vetores dos candidatos vêm da própria busca (nada é embedado de novo);
+a matriz de similaridade entre candidatos é calculada uma única vez e a
+redundância de cada candidato é atualizada incrementalmente.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+from src.memory_index import normalize_rows
+
+
+def maximal_marginal_relevance(
+    query: Sequence[float],
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Seleciona k candidatos equilibrando relevância e diversidade.
+    
+    Args:
+        query: Vetor da query
+        candidates: Matriz (N x D) com os vetores dos candidatos
+        k: Quantidade a selecionar
+        lambda_mult: 1 = só relevância (top-k); 0 = só diversidade
+        
+    Returns:
+        Índices das linhas selecionadas, na ordem de seleção
+        
+    Raises:
+        ValueError: Se lambda_mult fora de [0, 1]
+    """
+    if not 0 <= lambda_mult <= 1:
+        raise ValueError(f"lambda_mult deve estar entre 0 e 1: {lambda_mult}")
+    if k <= 0 or len(candidates) == 0:
+        return []
+    
+    vectors = normalize_rows(candidates)
+    relevance = vectors @ normalize_rows(query)
+    similarity = vectors @ vectors.T
+    k = min(k, len(vectors))
+    
+    first = int(np.argmax(relevance))
+    selected = [first]
+    # Maior similaridade de cada candidato com os já escolhidos
+    redundancy = similarity[first].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[first] = False
+    
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    
+    return selected
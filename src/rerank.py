@@ -0,0 +1,304 @@
+"""
+Re-ranking local dos candidatos da busca vetorial.
+
+A busca traz N candidatos (SEARCH_RERANK_CANDIDATES) e um scorer local
+reordena-os, devolvendo um top-k mais preciso para `get_context`:
+
+- "bm25": BM25 calculado sobre o próprio conjunto de candidatos (IDF e
+  tamanho médio entre eles), sem índice nem dependências extras;
+- "onnx": cross-encoder pequeno exportado para ONNX (ex: ms-marco-MiniLM),
+  carregado de RERANK_MODEL_PATH; requer `onnxruntime` e `tokenizers`.
+
+No "onnx", os candidatos são processados em lotes (RERANK_BATCH_SIZE) em um
+pool de threads (RERANK_WORKERS), em paralelo porque o ONNX libera o GIL. O
+BM25 é Python puro (preso ao GIL) e roda na thread de quem chama.
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Scorers disponíveis
+RERANKERS = ("bm25", "onnx")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_WORD = re.compile(r"\w+")
+
+# Palavras sem peso na consulta (artigos, preposições, pronomes)
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas "
+    "para com sem sob ao aos e ou que se qual quais quem como onde quando quanto "
+    "é foi são ser ter tem há seu sua seus suas este esta isto esse essa isso".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Divide o texto em termos para o BM25.
+    
+    Args:
+        text: Texto a dividir
+        
+    Returns:
+        Termos em minúsculas, sem acentos e sem stopwords
+    """
+    # NFKD separa os acentos, descartados na conversão para ASCII
+    folded = unicodedata.normalize("NFKD", text.casefold()).encode("ascii", "ignore").decode("ascii")
+    return [term for term in _WORD.findall(folded) if term not in STOPWORDS]
+
+
+def bm25_scores(
+    query: Sequence[str], documents: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75
+) -> np.ndarray:
+    """
+    Pontua documentos por BM25, com estatísticas do próprio conjunto.
+    
+    Args:
+        query: Termos da consulta
+        documents: Termos de cada documento
+        k1: Saturação da frequência do termo
+        b: Normalização pelo tamanho do documento
+        
+    Returns:
+        Vetor float32 com um score por documento (maior é melhor)
+    """
+    terms = list(dict.fromkeys(query))
+    if not documents or not terms:
+        return np.zeros(len(documents), dtype=np.float32)
+    
+    counts = [Counter(doc) for doc in documents]
+    tf = np.array([[c[t] for t in terms] for c in counts], dtype=np.float32)
+    lengths = np.array([len(doc) for doc in documents], dtype=np.float32)
+    
+    df = (tf > 0).sum(axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1).astype(np.float32)
+
+
+class CrossEncoder:
+    """
+    Cross-encoder ONNX local: pontua pares (query, chunk) em CPU.
+    
+    O diretório deve conter `model.onnx` e `tokenizer.json` (ex: exportados
+    com `optimum-cli export onnx --model cross-encoder/ms-marco-MiniLM-L-6-v2`).
+    """
+    
+    def __init__(self, model_path: str, max_length: int = 512):
+        """
+        Carrega modelo e tokenizador.
+        
+        Args:
+            model_path: Diretório com model.onnx e tokenizer.json
+            max_length: Tokens máximos por par (query + chunk)
+            
+        Raises:
+            ImportError: Se onnxruntime ou tokenizers não instalados
+            FileNotFoundError: Se arquivos do modelo ausentes
+        """
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "Re-ranker onnx requer onnxruntime e tokenizers: pip install onnxruntime tokenizers"
+            ) from e
+        
+        path = Path(model_path)
+        for name in ("model.onnx", "tokenizer.json"):
+            if not (path / name).exists():
+                raise FileNotFoundError(f"Arquivo do modelo não encontrado: {path / name}")
+        
+        options = onnxruntime.SessionOptions()
+        # Paralelismo vem do pool de lotes: uma thread por execução
+        options.intra_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(path / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+    
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        """
+        Pontua um lote de chunks contra a query.
+        
+        Args:
+            query: Pergunta do usuário
+            texts: Chunks do lote
+            
+        Returns:
+            Vetor float32 com o logit de relevância de cada chunk
+        """
+        encodings = self.tokenizer.encode_batch([(query, text) for text in texts])
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        logits = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+        # Uma saída (score) ou duas classes (irrelevante, relevante)
+        return np.asarray(logits, dtype=np.float32).reshape(len(texts), -1)[:, -1]
+
+
+class Reranker:
+    """
+    Reordena candidatos da busca com um scorer local (ONNX em lotes paralelos).
+    
+    Attributes:
+        method: "bm25" ou "onnx"
+        batch_size: Candidatos por lote
+        queries: Consultas reordenadas
+        candidates: Candidatos pontuados (soma)
+        retrieve_seconds: Tempo total do 1º estágio (busca dos candidatos)
+        rerank_seconds: Tempo total do 2º estágio (pontuação e ordenação)
+    """
+    
+    def __init__(
+        self,
+        method: str = "bm25",
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        model_path: Optional[str] = None,
+    ):
+        """
+        Cria o re-ranker.
+        
+        Args:
+            method: Scorer (ver RERANKERS)
+            batch_size: Candidatos por lote (padrão: RERANK_BATCH_SIZE ou 16)
+            workers: Threads do pool (padrão: RERANK_WORKERS ou 4)
+            model_path: Modelo do cross-encoder (padrão: RERANK_MODEL_PATH)
+            
+        Raises:
+            ValueError: Se método ou parâmetros inválidos
+            ImportError: Se "onnx" sem onnxruntime/tokenizers
+        """
+        if method not in RERANKERS:
+            raise ValueError(f"Re-ranker inválido: {method} (opções: {', '.join(RERANKERS)})")
+        self.method = method
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        workers = workers or int(os.getenv("RERANK_WORKERS", "4"))
+        if self.batch_size <= 0 or workers <= 0:
+            raise ValueError("RERANK_BATCH_SIZE e RERANK_WORKERS devem ser positivos")
+        
+        self.model: Optional[CrossEncoder] = None
+        if method == "onnx":
+            model_path = model_path or os.getenv("RERANK_MODEL_PATH")
+            if not model_path:
+                raise ValueError("RERANK_MODEL_PATH não configurado para o re-ranker onnx")
+            self.model = CrossEncoder(model_path)
+        
+        self.queries = 0
+        self.candidates = 0
+        self.retrieve_seconds = 0.0
+        self.rerank_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rerank")
+        self._lock = threading.Lock()
+    
+    def _map(self, fn: Callable[[List[T]], R], items: Sequence[T]) -> List[R]:
+        batches = [list(items[i:i + self.batch_size]) for i in range(0, len(items), self.batch_size)]
+        if len(batches) <= 1:
+            # Um lote só: evita a troca de thread
+            return [fn(batch) for batch in batches]
+        return list(self._executor.map(fn, batches))
+    
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        """
+        Pontua os candidatos (maior é mais relevante).
+        
+        Args:
+            query: Pergunta do usuário
+            texts: Conteúdo dos candidatos
+            
+        Returns:
+            Vetor float32 com um score por candidato
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        if self.model is not None:
+            return np.concatenate(self._map(lambda batch: self.model.score(query, batch), texts))
+        
+        # BM25 segura o GIL: o pool só somaria troca de thread
+        return bm25_scores(tokenize(query), [tokenize(text) for text in texts])
+    
+    def rerank(
+        self, query: str, results: List[Tuple[Document, float]], k: int
+    ) -> List[Tuple[Document, float]]:
+        """
+        Reordena os candidatos e mantém os k melhores.
+        
+        Empates (ex: BM25 sem termos em comum) preservam a ordem da busca.
+        
+        Args:
+            query: Pergunta do usuário
+            results: Candidatos (documento, distância de cosseno) da busca
+            k: Quantidade a manter
+            
+        Returns:
+            Os k candidatos mais relevantes, com a distância de cosseno original
+        """
+        scores = self.score(query, [doc.page_content for doc, _ in results])
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [results[i] for i in order]
+    
+    def record(self, candidates: int, retrieve_seconds: float, rerank_seconds: float) -> None:
+        """Acumula as latências dos dois estágios de uma consulta."""
+        with self._lock:
+            self.queries += 1
+            self.candidates += candidates
+            self.retrieve_seconds += retrieve_seconds
+            self.rerank_seconds += rerank_seconds
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Retorna médias por consulta de cada estágio.
+        
+        Returns:
+            Dicionário com queries, candidates, retrieve_ms e rerank_ms (médias)
+        """
+        with self._lock:
+            queries = max(self.queries, 1)
+            return {
+                "queries": self.queries,
+                "candidates": self.candidates / queries,
+                "retrieve_ms": self.retrieve_seconds / queries * 1000,
+                "rerank_ms": self.rerank_seconds / queries * 1000,
+            }
+
+
+_rerankers: Dict[str, Reranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(method: Optional[str] = None) -> Optional[Reranker]:
+    """
+    Retorna o re-ranker compartilhado do processo.
+    
+    Args:
+        method: Scorer (padrão: SEARCH_RERANKER ou "none")
+        
+    Returns:
+        Instância única de Reranker por método, ou None se "none"
+        
+    Raises:
+        ValueError: Se método inválido
+    """
+    method = (method or os.getenv("SEARCH_RERANKER", "none")).lower()
+    if method == "none":
+        return None
+    with _rerankers_lock:
+        if method not in _rerankers:
+            _rerankers[method] = Reranker(method)
+        return _rerankers[method]
@@ -4,19 +4,250 @@ Módulo de busca semântica.
 Implementa busca vetorial no PGVector para recuperar chunks relevantes.
 """
 
+import asyncio
+import json
 import os
-from typing import List, Tuple
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import typer
+import numpy as np
 from dotenv import load_dotenv
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_postgres import PGVector
+from sqlalchemy import Engine, event, text
+
+from src.context import PackedContext, pack_context
+from src.db import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    QUANTIZATIONS,
+    TEXT_SEARCH_CONFIG,
+    TSVECTOR_COLUMN,
+    coarse_expression,
+    acollection_version,
+    collection_quantization,
+    collection_version,
+    get_async_engine,
+    get_async_vectorstore,
+    get_engine,
+    get_vectorstore,
+    quantized_distance,
+)
+from src.filters import build_filter, compile_filter
+from src.memory_index import MemoryIndex, get_memory_index
+from src.mmr import maximal_marginal_relevance
+from src.rerank import RERANKERS, get_reranker
 
 load_dotenv()
 
 app = typer.Typer()
 
+# Backends de recuperação: PGVector (banco) ou busca exata em memória (NumPy)
+BACKENDS = ("pgvector", "memory")
+
+# Subconsulta do id da coleção (parâmetro :collection)
+COLLECTION_ID = f"(SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :collection)"
+
+# Parâmetros de busca ANN da consulta corrente (GUC -> valor)
+_search_settings: ContextVar[Dict[str, str]] = ContextVar("search_settings", default={})
+
+
+def _apply_search_settings(connection) -> None:
+    """Aplica hnsw.ef_search / ivfflat.probes no início da transação da busca."""
+    for name, value in _search_settings.get().items():
+        connection.execute(
+            text("SELECT set_config(:name, :value, true)"), {"name": name, "value": value}
+        )
+
+
+def _watch_engine(engine: Engine) -> None:
+    """Registra a aplicação dos parâmetros de busca nas transações da engine."""
+    if not event.contains(engine, "begin", _apply_search_settings):
+        event.listen(engine, "begin", _apply_search_settings)
+
+
+def search_settings(ef_search: Optional[int] = None, probes: Optional[int] = None) -> Dict[str, str]:
+    """
+    Monta os parâmetros de busca ANN do pgvector.
+    
+    Args:
+        ef_search: Lista de candidatos do HNSW (maior = mais recall, mais lento)
+        probes: Listas visitadas pelo IVFFlat (maior = mais recall, mais lento)
+        
+    Returns:
+        Dicionário GUC -> valor, apenas com os parâmetros informados
+    """
+    settings = {}
+    if ef_search is not None:
+        settings["hnsw.ef_search"] = str(ef_search)
+    if probes is not None:
+        settings["ivfflat.probes"] = str(probes)
+    return settings
+
+
+def vector_literal(embedding: List[float]) -> str:
+    """Formata um vetor como literal do pgvector ('[x1,x2,...]')."""
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza a query para uso como chave de cache.
+    
+    Args:
+        query: Pergunta do usuário
+        
+    Returns:
+        Query sem diferenças de caixa e espaços
+    """
+    return " ".join(query.split()).casefold()
+
+
+class ResultCache:
+    """
+    Cache LRU em memória de resultados de busca.
+    
+    As chaves incluem a versão da coleção (ver `collection_version`), que a
+    ingestão incrementa a cada escrita: resultados anteriores a uma
+    reingestão nunca são servidos e são descartados ao surgir versão nova.
+    A versão lida do banco vale por `version_ttl` segundos, de modo que um
+    acerto não custa uma ida ao banco; uma reingestão feita por outro
+    processo é percebida em até `version_ttl` segundos.
+    
+    Attributes:
+        max_entries: Máximo de resultados mantidos
+        version_ttl: Validade da versão lida do banco (0 = ler a cada busca)
+        hits: Buscas servidas pelo cache
+        misses: Buscas que foram ao banco
+    """
+    
+    def __init__(self, max_entries: int = 256, version_ttl: float = 1.0):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, List[Tuple[Document, float]]]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._checked: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def known_version(self, collection: str) -> Optional[str]:
+        """
+        Retorna a versão da coleção lida há menos de `version_ttl` segundos.
+        
+        Args:
+            collection: Nome da coleção
+            
+        Returns:
+            Versão ainda válida ou None (ler do banco e chamar `remember_version`)
+        """
+        with self._lock:
+            checked = self._checked.get(collection)
+        if checked is None or time.monotonic() - checked[1] >= self.version_ttl:
+            return None
+        return checked[0]
+    
+    def remember_version(self, collection: str, version: Optional[str]) -> None:
+        """
+        Registra a versão recém-lida do banco.
+        
+        Args:
+            collection: Nome da coleção
+            version: Versão lida (None se a coleção não existir)
+        """
+        with self._lock:
+            if version is None:
+                self._checked.pop(collection, None)
+            else:
+                self._checked[collection] = (version, time.monotonic())
+    
+    def forget_version(self, collection: str) -> None:
+        """
+        Descarta a versão registrada (a próxima busca lê do banco).
+        
+        Args:
+            collection: Nome da coleção
+        """
+        self.remember_version(collection, None)
+    
+    def get(
+        self, collection: str, version: str, key: Hashable
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """
+        Busca resultados em cache.
+        
+        Args:
+            collection: Nome da coleção
+            version: Versão atual da coleção
+            key: Demais componentes da chave (query normalizada, k, ...)
+            
+        Returns:
+            Cópia da lista de resultados ou None
+        """
+        with self._lock:
+            if self._versions.get(collection) != version:
+                # Coleção mudou: descartar resultados das versões anteriores
+                for stale in [k for k in self._entries if k[0] == collection]:
+                    del self._entries[stale]
+                self._versions[collection] = version
+            
+            results = self._entries.get((collection, version, key))
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((collection, version, key))
+            self.hits += 1
+            return list(results)
+    
+    def put(
+        self, collection: str, version: str, key: Hashable, results: List[Tuple[Document, float]]
+    ) -> None:
+        """
+        Armazena resultados, despejando os menos usados além do limite.
+        
+        Args:
+            collection: Nome da coleção
+            version: Versão da coleção na busca
+            key: Demais componentes da chave
+            results: Resultados da busca
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._versions.get(collection) != version:
+                return
+            self._entries[(collection, version, key)] = list(results)
+            self._entries.move_to_end((collection, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Retorna contadores do cache.
+        
+        Returns:
+            Dicionário com hits, misses e entries
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+
+# Cache compartilhado do processo (SEARCH_CACHE_MAX_ENTRIES=0 desativa)
+result_cache = ResultCache(
+    int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256")),
+    float(os.getenv("SEARCH_CACHE_VERSION_TTL", "1.0")),
+)
+
 
 class SemanticSearch:
     """
@@ -25,53 +256,281 @@ class SemanticSearch:
     Attributes:
         vectorstore: Instância do PGVector
         k: Número de resultados a retornar (fixo em 10 conforme RN-006)
+        ef_search: hnsw.ef_search padrão das buscas (None = padrão do servidor)
+        probes: ivfflat.probes padrão das buscas (None = padrão do servidor)
+        backend: "pgvector" (busca no banco) ou "memory" (ver `src.memory_index`)
+        quantization: "none", "halfvec" ou "binary" (ver `src.db.QUANTIZATIONS`)
+        coarse_dimensions: Prefixo do vetor usado no 1º estágio (None = vetor completo)
+        rerank_factor: Candidatos por resultado nas buscas com re-rank em float32
+            (e por caminho na busca híbrida)
+        hybrid: Se `search` combina busca vetorial e lexical (ver `search_hybrid`)
+        vector_weight: Peso padrão do caminho vetorial na fusão RRF
+        text_weight: Peso padrão do caminho lexical (full-text) na fusão RRF
+        rrf_k: Constante da fusão RRF (1 / (rrf_k + posição))
+        mmr: Se `get_context` seleciona os chunks com diversidade (ver `search_mmr`)
+        fetch_k: Candidatos recuperados para a seleção MMR
+        mmr_lambda: Equilíbrio do MMR (1 = só relevância, 0 = só diversidade)
+        max_context_tokens: Orçamento de tokens de `get_context` (0 = sem limite)
+        reranker: Re-ranker local de `get_context` (None = desativado, ver `src.rerank`)
+        rerank_candidates: Candidatos trazidos para o re-ranker
     """
     
-    def __init__(self, collection_name: str = "rag_documents"):
+    def __init__(
+        self,
+        collection_name: str = "rag_documents",
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        backend: Optional[str] = None,
+        quantization: Optional[str] = None,
+        coarse_dimensions: Optional[int] = None,
+        hybrid: Optional[bool] = None,
+        mmr: Optional[bool] = None,
+        max_context_tokens: Optional[int] = None,
+        reranker: Optional[str] = None,
+    ):
         """
         Inicializa busca semântica.
         
         Args:
             collection_name: Nome da coleção no PGVector
+            ef_search: hnsw.ef_search padrão (padrão: SEARCH_EF_SEARCH)
+            probes: ivfflat.probes padrão (padrão: SEARCH_PROBES)
+            backend: Backend de recuperação (padrão: SEARCH_BACKEND ou "pgvector")
+            quantization: Quantização da busca (padrão: a configurada na coleção)
+            coarse_dimensions: Dimensões do 1º estágio (padrão: SEARCH_COARSE_DIMENSIONS)
+            hybrid: Busca híbrida em `search` (padrão: SEARCH_HYBRID ou false)
+            mmr: Seleção MMR em `get_context` (padrão: SEARCH_MMR ou false)
+            max_context_tokens: Orçamento do contexto (padrão: CONTEXT_MAX_TOKENS ou 3000)
+            reranker: "none", "bm25" ou "onnx" (padrão: SEARCH_RERANKER ou "none")
+            
+        Raises:
+            ValueError: Se DATABASE_URL não configurada, backend, quantização,
+                pesos, parâmetros do MMR ou re-ranker inválidos, ou MMR e
+                re-ranker ativados juntos
         """
         database_url = os.getenv("DATABASE_URL")
         if not database_url:
             raise ValueError("DATABASE_URL não configurada no .env")
         
+        backend = backend or os.getenv("SEARCH_BACKEND", "pgvector")
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend inválido: {backend} (use {', '.join(BACKENDS)})")
+        self.backend = backend
+        
         embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-        embeddings = OpenAIEmbeddings(model=embedding_model)
         
-        self.vectorstore = PGVector(
-            embeddings=embeddings,
-            collection_name=collection_name,
-            connection=database_url,
-            use_jsonb=True,
-        )
+        # PGVector compartilhado do processo (pool de conexões)
+        self.vectorstore = get_vectorstore(collection_name, embedding_model, database_url)
+        _watch_engine(get_engine(database_url))
+        
+        # Versão assíncrona criada sob demanda no event loop de quem chama
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.database_url = database_url
         
         # k=10 fixo conforme RN-006
         self.k = int(os.getenv("SEARCH_K", "10"))
+        
+        if ef_search is None and os.getenv("SEARCH_EF_SEARCH"):
+            ef_search = int(os.getenv("SEARCH_EF_SEARCH"))
+        if probes is None and os.getenv("SEARCH_PROBES"):
+            probes = int(os.getenv("SEARCH_PROBES"))
+        self.ef_search = ef_search
+        self.probes = probes
+        
+        if quantization is not None and quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Quantização inválida: {quantization} (opções: {', '.join(QUANTIZATIONS)})"
+            )
+        if quantization is None and backend == "pgvector":
+            quantization = collection_quantization(collection_name, database_url)
+        self.quantization = quantization or "none"
+        
+        if coarse_dimensions is None and os.getenv("SEARCH_COARSE_DIMENSIONS"):
+            coarse_dimensions = int(os.getenv("SEARCH_COARSE_DIMENSIONS"))
+        if coarse_dimensions is not None and coarse_dimensions <= 0:
+            raise ValueError(f"coarse_dimensions deve ser positivo: {coarse_dimensions}")
+        self.coarse_dimensions = coarse_dimensions
+        self.rerank_factor = int(os.getenv("SEARCH_RERANK_FACTOR", "10"))
+        
+        if hybrid is None:
+            hybrid = os.getenv("SEARCH_HYBRID", "false").lower() == "true"
+        if hybrid and backend != "pgvector":
+            raise ValueError("Busca híbrida requer o backend pgvector")
+        self.hybrid = hybrid
+        self.vector_weight, self.text_weight = self._weights(
+            float(os.getenv("SEARCH_HYBRID_VECTOR_WEIGHT", "1.0")),
+            float(os.getenv("SEARCH_HYBRID_TEXT_WEIGHT", "1.0")),
+        )
+        self.rrf_k = int(os.getenv("SEARCH_RRF_K", "60"))
+        
+        if mmr is None:
+            mmr = os.getenv("SEARCH_MMR", "false").lower() == "true"
+        self.mmr = mmr
+        self.fetch_k, self.mmr_lambda = self._mmr_params(
+            int(os.getenv("SEARCH_MMR_FETCH_K", "40")),
+            float(os.getenv("SEARCH_MMR_LAMBDA", "0.5")),
+        )
+        
+        if max_context_tokens is None:
+            max_context_tokens = int(os.getenv("CONTEXT_MAX_TOKENS", "3000"))
+        if max_context_tokens < 0:
+            raise ValueError(f"max_context_tokens não pode ser negativo: {max_context_tokens}")
+        self.max_context_tokens = max_context_tokens
+        
+        self.reranker = get_reranker(reranker)
+        self.rerank_candidates = int(os.getenv("SEARCH_RERANK_CANDIDATES", "50"))
+        if self.rerank_candidates <= 0:
+            raise ValueError(f"SEARCH_RERANK_CANDIDATES deve ser positivo: {self.rerank_candidates}")
+        if self.mmr and self.reranker is not None:
+            raise ValueError(
+                "MMR e re-ranker são alternativos na seleção do contexto: "
+                "desative SEARCH_MMR ou SEARCH_RERANKER"
+            )
+    
+    @property
+    def reranks(self) -> bool:
+        """Se a busca seleciona candidatos e os reordena pela distância float32."""
+        return self.quantization == "binary" or self.coarse_dimensions is not None
+    
+    def _settings(
+        self,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        candidates: bool = False,
+        k: Optional[int] = None,
+    ) -> Dict[str, str]:
+        settings = search_settings(
+            self.ef_search if ef_search is None else ef_search,
+            self.probes if probes is None else probes,
+        )
+        if candidates and ef_search is None and self.ef_search is None:
+            # O HNSW devolve no máximo ef_search linhas: precisa cobrir os candidatos
+            settings["hnsw.ef_search"] = str(self._candidates(k))
+        return settings
+    
+    def _candidates(self, k: Optional[int] = None) -> int:
+        # Candidatos do 1º estágio (re-rank) ou de cada caminho da busca híbrida
+        return min((self.k if k is None else k) * self.rerank_factor, 1000)
+    
+    def _vector_order(self, dimensions: int, query: str) -> str:
+        """Expressão de ordenação indexada (quantização e prefixo do vetor)."""
+        column = "embedding"
+        if self.coarse_dimensions is not None and self.coarse_dimensions < dimensions:
+            column = coarse_expression(column, self.coarse_dimensions)
+            query = coarse_expression(query, self.coarse_dimensions)
+            dimensions = self.coarse_dimensions
+        return quantized_distance(self.quantization, dimensions, column, query)
+    
+    def _cache_key(
+        self,
+        query: str,
+        settings: Tuple[Tuple[str, str], ...],
+        weights: Optional[Tuple[float, float]] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        mmr: Optional[Tuple[int, float]] = None,
+    ) -> Hashable:
+        # Tudo que muda o resultado além da versão da coleção
+        fusion = (weights, self.rrf_k, self.rerank_factor) if weights else None
+        filter_key = json.dumps(filter, sort_keys=True, ensure_ascii=False) if filter else None
+        return (
+            normalize_query(query), self.k, settings,
+            self.quantization, self.coarse_dimensions, fusion, filter_key, mmr,
+        )
+    
+    def _mmr_params(self, fetch_k: int, lambda_mult: float) -> Tuple[int, float]:
+        if fetch_k <= 0:
+            raise ValueError(f"fetch_k deve ser positivo: {fetch_k}")
+        if not 0 <= lambda_mult <= 1:
+            raise ValueError(f"lambda do MMR deve estar entre 0 e 1: {lambda_mult}")
+        # Menos candidatos que k não deixaria o que selecionar
+        return max(fetch_k, self.k), float(lambda_mult)
     
-    def search(self, query: str) -> List[Tuple[Document, float]]:
+    def _filter_predicate(self, filter: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        """Compila o filtro de metadata (vazio se não houver) para o SQL da busca."""
+        if filter and self.backend != "pgvector":
+            raise ValueError("Filtros de metadata requerem o backend pgvector")
+        predicate, params = compile_filter(filter)
+        return (f"AND ({predicate}) " if predicate else ""), params
+    
+    @staticmethod
+    def _weights(vector_weight: float, text_weight: float) -> Tuple[float, float]:
+        if vector_weight < 0 or text_weight < 0 or vector_weight + text_weight == 0:
+            raise ValueError(
+                f"Pesos inválidos (vetorial={vector_weight}, lexical={text_weight}): "
+                "use valores >= 0, ao menos um positivo"
+            )
+        return float(vector_weight), float(text_weight)
+    
+    def memory_index(self) -> MemoryIndex:
         """
-        Busca chunks mais similares à query.
+        Retorna o índice em memória da coleção (backend "memory").
+        
+        Returns:
+            MemoryIndex compartilhado, recarregado se a coleção mudou
+        """
+        return get_memory_index(self.collection_name, self.embedding_model, self.database_url)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Gera o embedding da query (primeira etapa de `search`).
         
         Args:
             query: Pergunta do usuário
             
         Returns:
-            Lista de tuplas (documento, score) ordenada por relevância
+            Vetor da query
             
         Raises:
             ValueError: Se query vazia
-            Exception: Se erro na busca
+            Exception: Se erro ao gerar o embedding
         """
         if not query or not query.strip():
             raise ValueError("Query não pode ser vazia")
         
+        try:
+            return self.vectorstore.embeddings.embed_query(query)
+        except Exception as e:
+            raise Exception(f"Erro na busca semântica: {e}")
+    
+    def search_by_vector(
+        self,
+        embedding: List[float],
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca chunks mais similares a um vetor já calculado.
+        
+        Args:
+            embedding: Vetor da query
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `src.filters`)
+            
+        Returns:
+            Lista de tuplas (documento, score) ordenada por relevância
+            
+        Raises:
+            ValueError: Se filtro inválido
+            Exception: Se erro na busca
+        """
+        if filter:
+            return self.search_many_by_vectors([embedding], ef_search, probes, filter)[0]
+        if self.backend == "memory":
+            try:
+                return self.memory_index().search(embedding, self.k)
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+        if self.quantization != "none" or self.reranks:
+            return self.search_many_by_vectors([embedding], ef_search, probes)[0]
+        
+        token = _search_settings.set(self._settings(ef_search, probes))
         try:
             # Busca com scores
-            results = self.vectorstore.similarity_search_with_score(
-                query=query,
+            results = self.vectorstore.similarity_search_with_score_by_vector(
+                embedding=embedding,
                 k=self.k
             )
             
@@ -80,61 +539,1227 @@ class SemanticSearch:
             results_sorted = sorted(results, key=lambda x: x[1])
             
             return results_sorted
+        
+        except Exception as e:
+            raise Exception(f"Erro na busca semântica: {e}")
+        finally:
+            _search_settings.reset(token)
+    
+    def search_many_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Busca os chunks mais similares a vários vetores em um único SQL.
+        
+        Os vetores vão em uma lista VALUES e cada um é resolvido por um
+        LATERAL com ORDER BY distância LIMIT k, que usa o índice ANN como
+        a busca individual. Com quantização "halfvec" a ordenação usa a
+        expressão halfvec; com "binary" ou coarse_dimensions (prefixo do
+        vetor), o 1º estágio seleciona k * rerank_factor candidatos,
+        reordenados pela distância no vetor completo. Os scores retornados
+        são sempre a distância de cosseno em float32.
+        
+        O filtro de metadata vira predicado JSONB no próprio SQL (ver
+        `src.filters`); com filtro, o ef_search do HNSW cobre os
+        k * rerank_factor candidatos, pois o índice filtra após a varredura.
+        
+        Args:
+            embeddings: Vetores das queries
+            ef_search: hnsw.ef_search das consultas (padrão: self.ef_search)
+            probes: ivfflat.probes das consultas (padrão: self.probes)
+            filter: Filtro de metadata aplicado a todas as consultas
+            
+        Returns:
+            Uma lista de tuplas (documento, score) por vetor, na ordem de entrada
+            
+        Raises:
+            ValueError: Se filtro inválido
+            Exception: Se erro na busca
+        """
+        if not embeddings:
+            return []
+        predicate, filter_params = self._filter_predicate(filter)
+        
+        if self.backend == "memory":
+            try:
+                return self.memory_index().search_many(embeddings, self.k)
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+        
+        rows = self._nearest_rows(embeddings, self.k, ef_search, probes, predicate, filter_params)
+        results: List[List[Tuple[Document, float]]] = [[] for _ in embeddings]
+        for ord_, id_, document, metadata, distance in rows:
+            results[ord_].append(
+                (Document(id=str(id_), page_content=document, metadata=metadata), distance)
+            )
+        return results
+    
+    def _execute(self, statement: Any, params: Dict[str, Any], settings: Dict[str, str]) -> List[Any]:
+        """Executa o SQL de busca no pool síncrono, com os parâmetros ANN da consulta."""
+        token = _search_settings.set(settings)
+        try:
+            with get_engine(self.database_url).connect() as conn:
+                return conn.execute(statement, params).fetchall()
+        except Exception as e:
+            raise Exception(f"Erro na busca semântica: {e}")
+        finally:
+            _search_settings.reset(token)
+    
+    async def _aexecute(
+        self, statement: Any, params: Dict[str, Any], settings: Dict[str, str]
+    ) -> List[Any]:
+        """Versão de `_execute` no pool assíncrono (não bloqueia o event loop)."""
+        # ContextVar é isolada por task: cada coroutine vê seus parâmetros
+        token = _search_settings.set(settings)
+        try:
+            engine = await get_async_engine(self.database_url)
+            _watch_engine(engine.sync_engine)
+            async with engine.connect() as conn:
+                return (await conn.execute(statement, params)).fetchall()
+        except Exception as e:
+            raise Exception(f"Erro na busca semântica: {e}")
+        finally:
+            _search_settings.reset(token)
+    
+    def _nearest_rows(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        predicate: str,
+        filter_params: Dict[str, Any],
+        vectors: bool = False,
+    ) -> List[Any]:
+        """Executa o SQL de `search_many_by_vectors`; com vectors, cada linha traz o embedding (real[])."""
+        return self._execute(
+            *self._nearest_statement(embeddings, k, ef_search, probes, predicate, filter_params, vectors)
+        )
+    
+    async def _anearest_rows(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        predicate: str,
+        filter_params: Dict[str, Any],
+        vectors: bool = False,
+    ) -> List[Any]:
+        """Versão assíncrona de `_nearest_rows`."""
+        return await self._aexecute(
+            *self._nearest_statement(embeddings, k, ef_search, probes, predicate, filter_params, vectors)
+        )
+    
+    def _nearest_statement(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        predicate: str,
+        filter_params: Dict[str, Any],
+        vectors: bool,
+    ) -> Tuple[Any, Dict[str, Any], Dict[str, str]]:
+        """Monta (SQL, parâmetros, GUCs) de `_nearest_rows`."""
+        values = ", ".join(f"({i}, CAST(:q{i} AS vector))" for i in range(len(embeddings)))
+        params = {f"q{i}": vector_literal(embedding) for i, embedding in enumerate(embeddings)}
+        candidates = self._candidates(k)
+        params.update({"collection": self.collection_name, "k": k, "candidates": candidates})
+        params.update(filter_params)
+        
+        rows_of_collection = f"FROM {EMBEDDING_TABLE} WHERE collection_id = {COLLECTION_ID} {predicate}"
+        order = self._vector_order(len(embeddings[0]), "q.embedding")
+        if self.reranks:
+            nearest = (
+                f"SELECT id, document, cmetadata, embedding, embedding <=> q.embedding AS distance FROM ("
+                f"SELECT id, document, cmetadata, embedding {rows_of_collection}"
+                f"ORDER BY {order} LIMIT :candidates"
+                f") AS c ORDER BY distance LIMIT :k"
+            )
+        else:
+            nearest = (
+                f"SELECT id, document, cmetadata, embedding, embedding <=> q.embedding AS distance "
+                f"{rows_of_collection}ORDER BY {order} LIMIT :k"
+            )
+        vector_column = ", CAST(e.embedding AS real[])" if vectors else ""
+        statement = text(
+            f"SELECT q.ord, e.id, e.document, e.cmetadata, e.distance{vector_column} "
+            f"FROM (VALUES {values}) AS q(ord, embedding) "
+            f"CROSS JOIN LATERAL ({nearest}) AS e "
+            f"ORDER BY q.ord, e.distance"
+        )
+        return statement, params, self._settings(ef_search, probes, self.reranks or bool(predicate), k)
+    
+    def _version(self) -> Optional[str]:
+        """Versão da coleção para o cache de resultados (ver `ResultCache.version_ttl`)."""
+        version = result_cache.known_version(self.collection_name)
+        if version is None:
+            try:
+                version = collection_version(self.collection_name, self.database_url)
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+            result_cache.remember_version(self.collection_name, version)
+        return version
+    
+    async def _aversion(self) -> Optional[str]:
+        """Versão assíncrona de `_version`."""
+        version = result_cache.known_version(self.collection_name)
+        if version is None:
+            try:
+                version = await acollection_version(self.collection_name, self.database_url)
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+            result_cache.remember_version(self.collection_name, version)
+        return version
+    
+    def _query_vector(self, query: str, embedding: Optional[List[float]]) -> List[float]:
+        return self.embed_query(query) if embedding is None else embedding
+    
+    def _cached(
+        self, key: Hashable, compute: Callable[[], List[Tuple[Document, float]]]
+    ) -> List[Tuple[Document, float]]:
+        """Resolve uma busca pelo cache de resultados da versão corrente da coleção."""
+        # Busca em memória custa menos que a leitura da versão para o cache
+        if self.backend == "memory" or result_cache.max_entries <= 0:
+            return compute()
+        
+        version = self._version()
+        if version is not None:
+            cached = result_cache.get(self.collection_name, version, key)
+            if cached is not None:
+                return cached
+        
+        results = compute()
+        if version is not None:
+            result_cache.put(self.collection_name, version, key, results)
+        return results
+    
+    async def _acached(
+        self, key: Hashable, compute: Callable[[], Awaitable[List[Tuple[Document, float]]]]
+    ) -> List[Tuple[Document, float]]:
+        """Versão assíncrona de `_cached`: mesmas chaves, versão lida pelo pool assíncrono."""
+        if self.backend == "memory" or result_cache.max_entries <= 0:
+            return await compute()
+        
+        version = await self._aversion()
+        if version is not None:
+            cached = result_cache.get(self.collection_name, version, key)
+            if cached is not None:
+                return cached
+        
+        results = await compute()
+        if version is not None:
+            result_cache.put(self.collection_name, version, key, results)
+        return results
+    
+    def search(
+        self,
+        query: str,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca chunks mais similares à query.
+        
+        Com `hybrid`, combina busca vetorial e lexical com os pesos padrão
+        (ver `search_hybrid`).
+        
+        Args:
+            query: Pergunta do usuário
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata, ex: {"source": ["a.pdf"], "page": {"$lte": 5}}
+            embedding: Vetor da query já calculado (padrão: `embed_query`)
+            
+        Returns:
+            Lista de tuplas (documento, score) ordenada por relevância
+            
+        Raises:
+            ValueError: Se query vazia ou filtro inválido
+            Exception: Se erro na busca
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        if self.hybrid:
+            return self.search_hybrid(
+                query, ef_search=ef_search, probes=probes, filter=filter, embedding=embedding
+            )
+        
+        self._filter_predicate(filter)
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        return self._cached(
+            self._cache_key(query, settings, filter=filter),
+            lambda: self.search_by_vector(
+                self._query_vector(query, embedding), ef_search, probes, filter
+            ),
+        )
+    
+    def search_hybrid(
+        self,
+        query: str,
+        vector_weight: Optional[float] = None,
+        text_weight: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca híbrida: vetorial + full-text (português) com fusão RRF.
+        
+        Recupera números, nomes e códigos que a similaridade de cosseno
+        sozinha perde. Ver `search_hybrid_by_vector`.
+        
+        Args:
+            query: Pergunta do usuário
+            vector_weight: Peso do caminho vetorial (padrão: self.vector_weight)
+            text_weight: Peso do caminho lexical (padrão: self.text_weight)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata aplicado aos dois caminhos
+            embedding: Vetor da query já calculado (padrão: `embed_query`)
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem da fusão
+            
+        Raises:
+            ValueError: Se query vazia, pesos/filtro inválidos ou backend não for pgvector
+            Exception: Se erro na busca
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        if self.backend != "pgvector":
+            raise ValueError("Busca híbrida requer o backend pgvector")
+        weights = self._weights(
+            self.vector_weight if vector_weight is None else vector_weight,
+            self.text_weight if text_weight is None else text_weight,
+        )
+        
+        self._filter_predicate(filter)
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        return self._cached(
+            self._cache_key(query, settings, weights, filter),
+            lambda: self.search_hybrid_by_vector(
+                query, self._query_vector(query, embedding), *weights, ef_search, probes, filter
+            ),
+        )
+    
+    def search_hybrid_by_vector(
+        self,
+        query: str,
+        embedding: List[float],
+        vector_weight: Optional[float] = None,
+        text_weight: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca híbrida com o vetor da query já calculado, em um único SQL.
+        
+        Cada caminho seleciona k * rerank_factor candidatos: o vetorial pelo
+        índice ANN (com a quantização/prefixo configurados) e o lexical pela
+        coluna tsvector com índice GIN, casando qualquer termo da query
+        (`plainto_tsquery` com OR) e ordenando por `ts_rank_cd`. As listas
+        são fundidas por Reciprocal Rank Fusion: cada documento soma
+        peso / (rrf_k + posição) dos caminhos em que aparece. Caminhos com
+        peso 0 não são executados.
+        
+        Args:
+            query: Pergunta do usuário (caminho lexical)
+            embedding: Vetor da query (caminho vetorial)
+            vector_weight: Peso do caminho vetorial (padrão: self.vector_weight)
+            text_weight: Peso do caminho lexical (padrão: self.text_weight)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata aplicado aos dois caminhos
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem da fusão
+            
+        Raises:
+            ValueError: Se pesos ou filtro inválidos
+            Exception: Se erro na busca (ex: coluna tsvector ausente;
+                ver `src.db.ensure_text_search`)
+        """
+        vector_weight, text_weight = self._weights(
+            self.vector_weight if vector_weight is None else vector_weight,
+            self.text_weight if text_weight is None else text_weight,
+        )
+        rows = self._hybrid_rows(
+            query, embedding, self.k, vector_weight, text_weight, ef_search, probes, filter
+        )
+        return [
+            (Document(id=str(id_), page_content=document, metadata=metadata), distance)
+            for id_, document, metadata, distance in rows
+        ]
+    
+    def _hybrid_rows(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int,
+        vector_weight: float,
+        text_weight: float,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+        vectors: bool = False,
+    ) -> List[Any]:
+        """Executa o SQL de `search_hybrid_by_vector`; com vectors, cada linha traz o embedding (real[])."""
+        return self._execute(*self._hybrid_statement(
+            query, embedding, k, vector_weight, text_weight, ef_search, probes, filter, vectors
+        ))
+    
+    async def _ahybrid_rows(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int,
+        vector_weight: float,
+        text_weight: float,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+        vectors: bool = False,
+    ) -> List[Any]:
+        """Versão assíncrona de `_hybrid_rows`."""
+        return await self._aexecute(*self._hybrid_statement(
+            query, embedding, k, vector_weight, text_weight, ef_search, probes, filter, vectors
+        ))
+    
+    def _hybrid_statement(
+        self,
+        query: str,
+        embedding: List[float],
+        k: int,
+        vector_weight: float,
+        text_weight: float,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+        vectors: bool,
+    ) -> Tuple[Any, Dict[str, Any], Dict[str, str]]:
+        """Monta (SQL, parâmetros, GUCs) de `_hybrid_rows`."""
+        predicate, params = self._filter_predicate(filter)
+        params.update({
+            "collection": self.collection_name,
+            "query": query,
+            "embedding": vector_literal(embedding),
+            "config": TEXT_SEARCH_CONFIG,
+            "candidates": self._candidates(k),
+            "k": k,
+            "rrf_k": self.rrf_k,
+            "vector_weight": vector_weight,
+            "text_weight": text_weight,
+        })
+        vector_column = ", CAST(e.embedding AS real[])" if vectors else ""
+        statement = text(self._fused_query(
+            ":query", "CAST(:embedding AS vector)", len(embedding),
+            predicate, vector_weight, text_weight, vector_column,
+        ))
+        return statement, params, self._settings(ef_search, probes, vector_weight > 0, k)
+    
+    def _fused_query(
+        self,
+        query: str,
+        embedding: str,
+        dimensions: int,
+        predicate: str,
+        vector_weight: float,
+        text_weight: float,
+        columns: str,
+    ) -> str:
+        """SELECT da fusão RRF para as expressões SQL da query e do vetor (k em :k)."""
+        rows_of_collection = f"FROM {EMBEDDING_TABLE} WHERE collection_id = {COLLECTION_ID} {predicate}"
+        
+        paths = []
+        hits = []
+        if vector_weight > 0:
+            order = self._vector_order(dimensions, embedding)
+            paths.append(
+                "vector_hits AS ("
+                "SELECT id, ROW_NUMBER() OVER (ORDER BY distance, id) AS rank FROM ("
+                f"SELECT id, embedding <=> {embedding} AS distance {rows_of_collection}"
+                f"ORDER BY {order} LIMIT :candidates"
+                ") AS v)"
+            )
+            hits.append(
+                "SELECT id, CAST(:vector_weight AS float8) / (:rrf_k + rank) AS score FROM vector_hits"
+            )
+        if text_weight > 0:
+            # plainto_tsquery junta os termos com AND; OR recupera trechos com qualquer termo
+            terms = (
+                f"CAST(replace(CAST(plainto_tsquery(CAST(:config AS regconfig), {query}) AS text), "
+                "' & ', ' | ') AS tsquery)"
+            )
+            paths.append(
+                "text_hits AS ("
+                "SELECT id, ROW_NUMBER() OVER (ORDER BY rank_cd DESC, id) AS rank FROM ("
+                f"SELECT id, ts_rank_cd({TSVECTOR_COLUMN}, terms) AS rank_cd "
+                f"FROM {EMBEDDING_TABLE}, {terms} AS terms "
+                f"WHERE collection_id = {COLLECTION_ID} {predicate}AND {TSVECTOR_COLUMN} @@ terms "
+                "ORDER BY rank_cd DESC LIMIT :candidates"
+                ") AS t)"
+            )
+            hits.append(
+                "SELECT id, CAST(:text_weight AS float8) / (:rrf_k + rank) AS score FROM text_hits"
+            )
+        
+        return (
+            f"WITH {', '.join(paths)}, "
+            f"fused AS (SELECT id, SUM(score) AS score FROM ({' UNION ALL '.join(hits)}) AS h GROUP BY id) "
+            f"SELECT e.id, e.document, e.cmetadata, e.embedding <=> {embedding} AS distance"
+            f"{columns} FROM fused AS f JOIN {EMBEDDING_TABLE} AS e ON e.id = f.id "
+            "ORDER BY f.score DESC, distance LIMIT :k"
+        )
+    
+    def _search_many_hybrid(
+        self,
+        queries: List[str],
+        embeddings: List[List[float]],
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+    ) -> List[List[Tuple[Document, float]]]:
+        """Busca híbrida de várias queries: a fusão de cada uma roda em um LATERAL do mesmo SQL."""
+        rows = self._execute(*self._hybrid_many_statement(queries, embeddings, ef_search, probes, filter))
+        results: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+        for ord_, id_, document, metadata, distance in rows:
+            results[ord_].append(
+                (Document(id=str(id_), page_content=document, metadata=metadata), distance)
+            )
+        return results
+    
+    def _hybrid_many_statement(
+        self,
+        queries: List[str],
+        embeddings: List[List[float]],
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+    ) -> Tuple[Any, Dict[str, Any], Dict[str, str]]:
+        """Monta (SQL, parâmetros, GUCs) da busca híbrida de várias queries em um único SQL."""
+        predicate, params = self._filter_predicate(filter)
+        values = ", ".join(
+            f"({i}, CAST(:t{i} AS text), CAST(:q{i} AS vector))" for i in range(len(queries))
+        )
+        for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+            params[f"t{i}"] = query
+            params[f"q{i}"] = vector_literal(embedding)
+        params.update({
+            "collection": self.collection_name,
+            "config": TEXT_SEARCH_CONFIG,
+            "candidates": self._candidates(self.k),
+            "k": self.k,
+            "rrf_k": self.rrf_k,
+            "vector_weight": self.vector_weight,
+            "text_weight": self.text_weight,
+        })
+        fused = self._fused_query(
+            "q.query", "q.embedding", len(embeddings[0]),
+            predicate, self.vector_weight, self.text_weight, ", f.score",
+        )
+        statement = text(
+            "SELECT q.ord, h.id, h.document, h.cmetadata, h.distance "
+            f"FROM (VALUES {values}) AS q(ord, query, embedding) "
+            f"CROSS JOIN LATERAL ({fused}) AS h "
+            "ORDER BY q.ord, h.score DESC, h.distance"
+        )
+        return statement, params, self._settings(ef_search, probes, self.vector_weight > 0, self.k)
+    
+    def search_many(
+        self,
+        queries: List[str],
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Busca várias queries de uma vez.
+        
+        Queries já presentes no cache de resultados não vão ao banco; as
+        demais (sem repetição) são embedadas em uma única chamada e
+        resolvidas em um único SQL (ver `search_many_by_vectors`). Com
+        `hybrid`, a fusão RRF de cada query roda em um LATERAL do mesmo SQL.
+        
+        Args:
+            queries: Perguntas dos usuários
+            ef_search: hnsw.ef_search das consultas (padrão: self.ef_search)
+            probes: ivfflat.probes das consultas (padrão: self.probes)
+            filter: Filtro de metadata aplicado a todas as queries
+            
+        Returns:
+            Uma lista de tuplas (documento, score) por query, na ordem de entrada
+            
+        Raises:
+            ValueError: Se alguma query vazia ou filtro inválido
+            Exception: Se erro na busca
+        """
+        for query in queries:
+            if not query or not query.strip():
+                raise ValueError("Query não pode ser vazia")
+        if not queries:
+            return []
+        self._filter_predicate(filter)
+        
+        weights = (self.vector_weight, self.text_weight) if self.hybrid else None
+        use_cache = self.backend != "memory" and result_cache.max_entries > 0
+        version = self._version() if use_cache else None
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        
+        results: Dict[str, List[Tuple[Document, float]]] = {}
+        missing: List[str] = []
+        for query in dict.fromkeys(queries):
+            key = self._cache_key(query, settings, weights, filter)
+            cached = result_cache.get(self.collection_name, version, key) if version else None
+            if cached is not None:
+                results[query] = cached
+            else:
+                missing.append(query)
+        
+        if missing:
+            try:
+                embeddings = self.vectorstore.embeddings.embed_documents(missing)
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+            if self.hybrid:
+                found = self._search_many_hybrid(missing, embeddings, ef_search, probes, filter)
+            else:
+                found = self.search_many_by_vectors(embeddings, ef_search, probes, filter)
+            for query, query_results in zip(missing, found):
+                results[query] = query_results
+                if version is not None:
+                    key = self._cache_key(query, settings, weights, filter)
+                    result_cache.put(self.collection_name, version, key, query_results)
+        
+        return [list(results[query]) for query in queries]
+    
+    def search_mmr(
+        self,
+        query: str,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca k chunks relevantes e diversos (Maximal Marginal Relevance).
+        
+        Ver `search_mmr_by_vector`.
+        
+        Args:
+            query: Pergunta do usuário
+            fetch_k: Candidatos recuperados (padrão: self.fetch_k)
+            lambda_mult: Equilíbrio relevância/diversidade (padrão: self.mmr_lambda)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            embedding: Vetor da query já calculado (padrão: `embed_query`)
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem de seleção
+            
+        Raises:
+            ValueError: Se query vazia ou parâmetros inválidos
+            Exception: Se erro na busca
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        mmr = self._mmr_params(
+            self.fetch_k if fetch_k is None else fetch_k,
+            self.mmr_lambda if lambda_mult is None else lambda_mult,
+        )
+        self._filter_predicate(filter)
+        
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        weights = (self.vector_weight, self.text_weight) if self.hybrid else None
+        return self._cached(
+            self._cache_key(query, settings, weights, filter, mmr),
+            lambda: self.search_mmr_by_vector(
+                self._query_vector(query, embedding), query, *mmr, ef_search, probes, filter
+            ),
+        )
+    
+    def search_mmr_by_vector(
+        self,
+        embedding: List[float],
+        query: Optional[str] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Seleciona k chunks por MMR entre fetch_k candidatos de um vetor já calculado.
+        
+        Os candidatos vêm com os próprios embeddings no mesmo SQL da busca
+        (vetorial, ou híbrida se `hybrid` e query informada) ou do índice em
+        memória; a seleção é feita em NumPy (ver `src.mmr`), sem reembedar.
+        
+        Args:
+            embedding: Vetor da query
+            query: Texto da query (caminho lexical da busca híbrida)
+            fetch_k: Candidatos recuperados (padrão: self.fetch_k)
+            lambda_mult: Equilíbrio relevância/diversidade (padrão: self.mmr_lambda)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
             
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem de seleção
+            
+        Raises:
+            ValueError: Se parâmetros ou filtro inválidos
+            Exception: Se erro na busca
+        """
+        fetch_k, lambda_mult = self._mmr_params(
+            self.fetch_k if fetch_k is None else fetch_k,
+            self.mmr_lambda if lambda_mult is None else lambda_mult,
+        )
+        candidates, vectors = self.fetch_candidates(
+            embedding, query, fetch_k, ef_search, probes, filter, vectors=True
+        )
+        selected = maximal_marginal_relevance(embedding, vectors, self.k, lambda_mult)
+        return [candidates[i] for i in selected]
+    
+    def fetch_candidates(
+        self,
+        embedding: List[float],
+        query: Optional[str],
+        fetch_k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        vectors: bool = False,
+    ) -> Tuple[List[Tuple[Document, float]], Optional[np.ndarray]]:
+        """
+        Busca fetch_k candidatos pelo mesmo caminho de `search`.
+        
+        Vetorial (ou híbrida, se `hybrid` e query informada) com filtros, ou
+        no índice em memória; base do MMR e do re-ranking.
+        
+        Args:
+            embedding: Vetor da query
+            query: Texto da query (caminho lexical da busca híbrida)
+            fetch_k: Candidatos a buscar
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            vectors: Também devolve os embeddings dos candidatos
+            
+        Returns:
+            Tupla (candidatos ordenados por relevância, matriz float32 N x D ou None)
+            
+        Raises:
+            ValueError: Se filtro inválido
+            Exception: Se erro na busca
+        """
+        predicate, filter_params = self._filter_predicate(filter)
+        
+        if self.backend == "memory":
+            try:
+                if vectors:
+                    return self.memory_index().search_with_vectors(embedding, fetch_k)
+                return self.memory_index().search(embedding, fetch_k), None
+            except Exception as e:
+                raise Exception(f"Erro na busca semântica: {e}")
+        
+        if self.hybrid and query:
+            rows = self._hybrid_rows(
+                query, embedding, fetch_k, self.vector_weight, self.text_weight,
+                ef_search, probes, filter, vectors=vectors,
+            )
+        else:
+            rows = [
+                row[1:] for row in self._nearest_rows(
+                    [embedding], fetch_k, ef_search, probes, predicate, filter_params, vectors=vectors
+                )
+            ]
+        return _candidates_from_rows(rows, vectors)
+    
+    async def afetch_candidates(
+        self,
+        embedding: List[float],
+        query: Optional[str],
+        fetch_k: int,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        vectors: bool = False,
+    ) -> Tuple[List[Tuple[Document, float]], Optional[np.ndarray]]:
+        """
+        Versão assíncrona de `fetch_candidates` (SQL no pool assíncrono).
+        
+        Args:
+            embedding: Vetor da query
+            query: Texto da query (caminho lexical da busca híbrida)
+            fetch_k: Candidatos a buscar
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            vectors: Também devolve os embeddings dos candidatos
+            
+        Returns:
+            Tupla (candidatos ordenados por relevância, matriz float32 N x D ou None)
+        """
+        predicate, filter_params = self._filter_predicate(filter)
+        
+        if self.backend == "memory":
+            # Busca exata em NumPy é CPU, não I/O: roda fora do event loop
+            return await asyncio.to_thread(
+                self.fetch_candidates, embedding, query, fetch_k, ef_search, probes, filter, vectors
+            )
+        
+        if self.hybrid and query:
+            rows = await self._ahybrid_rows(
+                query, embedding, fetch_k, self.vector_weight, self.text_weight,
+                ef_search, probes, filter, vectors=vectors,
+            )
+        else:
+            rows = [
+                row[1:] for row in await self._anearest_rows(
+                    [embedding], fetch_k, ef_search, probes, predicate, filter_params, vectors=vectors
+                )
+            ]
+        return _candidates_from_rows(rows, vectors)
+    
+    def search_reranked(
+        self,
+        query: str,
+        candidates: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busca candidatos e devolve o top-k reordenado pelo re-ranker local.
+        
+        Ver `search_reranked_by_vector`.
+        
+        Args:
+            query: Pergunta do usuário
+            candidates: Candidatos do 1º estágio (padrão: self.rerank_candidates)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            embedding: Vetor da query já calculado (padrão: `embed_query`)
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem do re-ranker
+            
+        Raises:
+            ValueError: Se query vazia, re-ranker não configurado ou filtro inválido
+            Exception: Se erro na busca
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        if self.reranker is None:
+            raise ValueError("Re-ranker não configurado (SEARCH_RERANKER)")
+        candidates = max(candidates or self.rerank_candidates, self.k)
+        self._filter_predicate(filter)
+        
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        weights = (self.vector_weight, self.text_weight) if self.hybrid else None
+        return self._cached(
+            self._cache_key(query, settings, weights, filter, (self.reranker.method, candidates)),
+            lambda: self.search_reranked_by_vector(
+                self._query_vector(query, embedding), query, candidates, ef_search, probes, filter
+            ),
+        )
+    
+    def search_reranked_by_vector(
+        self,
+        embedding: List[float],
+        query: str,
+        candidates: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Re-ranking em dois estágios a partir de um vetor já calculado.
+        
+        O 1º estágio traz `candidates` chunks pelo mesmo SQL da busca
+        (vetorial, ou híbrida se `hybrid`, com filtros) ou do índice em
+        memória; o 2º os pontua com o re-ranker (BM25 ou cross-encoder ONNX,
+        ver `src.rerank`) e mantém os k melhores. A latência de cada estágio
+        é acumulada em `reranker.stats()`.
+        
+        Args:
+            embedding: Vetor da query
+            query: Texto da query (pontuado pelo re-ranker)
+            candidates: Candidatos do 1º estágio (padrão: self.rerank_candidates)
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            
+        Returns:
+            Lista de tuplas (documento, distância de cosseno) na ordem do re-ranker
+            
+        Raises:
+            ValueError: Se re-ranker não configurado ou filtro inválido
+            Exception: Se erro na busca
+        """
+        if self.reranker is None:
+            raise ValueError("Re-ranker não configurado (SEARCH_RERANKER)")
+        candidates = max(candidates or self.rerank_candidates, self.k)
+        
+        started = time.perf_counter()
+        results, _ = self.fetch_candidates(embedding, query, candidates, ef_search, probes, filter)
+        retrieved = time.perf_counter()
+        ranked = self.reranker.rerank(query, results, self.k)
+        self.reranker.record(len(results), retrieved - started, time.perf_counter() - retrieved)
+        return ranked
+    
+    def build_context(self, results: List[Tuple[Document, float]]) -> PackedContext:
+        """
+        Monta o contexto dos resultados dentro de `max_context_tokens`.
+        
+        Ver `src.context.pack_context`: chunks sobrepostos da mesma página são
+        unidos e os que não cabem no orçamento ficam de fora.
+        
+        Args:
+            results: Lista de tuplas (documento, score), mais relevantes primeiro
+            
+        Returns:
+            PackedContext com o texto e os tokens usados
+        """
+        return pack_context(results, self.max_context_tokens)
+    
+    def get_context(self, query: str, filter: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Busca e retorna contexto concatenado, limitado a `max_context_tokens`.
+        
+        Com `mmr`, os chunks são selecionados por diversidade (ver `search_mmr`),
+        evitando trechos quase repetidos pelo overlap do chunking; com
+        `reranker`, o top-k vem do re-ranking local (ver `search_reranked`).
+        Os dois são alternativos (ver `__init__`).
+        
+        Args:
+            query: Pergunta do usuário
+            filter: Filtro de metadata (ver `search`)
+            
+        Returns:
+            String com contexto dos chunks encontrados
+        """
+        if self.mmr:
+            return self.build_context(self.search_mmr(query, filter=filter)).text
+        if self.reranker is not None:
+            return self.build_context(self.search_reranked(query, filter=filter)).text
+        return self.build_context(self.search(query, filter=filter)).text
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Versão assíncrona de `embed_query`.
+        
+        Args:
+            query: Pergunta do usuário
+            
+        Returns:
+            Vetor da query
+            
+        Raises:
+            ValueError: Se query vazia
+            Exception: Se erro ao gerar o embedding
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        
+        try:
+            return await self.vectorstore.embeddings.aembed_query(query)
         except Exception as e:
             raise Exception(f"Erro na busca semântica: {e}")
     
-    def get_context(self, query: str) -> str:
+    async def asearch(
+        self,
+        query: str,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
         """
-        Busca e retorna contexto concatenado.
+        Versão assíncrona de `search`.
+        
+        Usa embeddings assíncronos e o pool psycopg assíncrono em todos os
+        caminhos (filtros, quantização, dois estágios e híbrida); pode ser
+        executada em centenas de coroutines concorrentes no mesmo event loop.
+        Só o backend "memory" (busca exata em NumPy, CPU) roda em thread.
+        Compartilha com `search` o cache de resultados.
         
         Args:
             query: Pergunta do usuário
+            ef_search: hnsw.ef_search desta consulta (padrão: self.ef_search)
+            probes: ivfflat.probes desta consulta (padrão: self.probes)
+            filter: Filtro de metadata (ver `search`)
+            
+        Returns:
+            Lista de tuplas (documento, score) ordenada por relevância
+            
+        Raises:
+            ValueError: Se query vazia ou filtro inválido
+            Exception: Se erro na busca
+        """
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        self._filter_predicate(filter)
+        
+        settings = tuple(sorted(self._settings(ef_search, probes).items()))
+        weights = (self.vector_weight, self.text_weight) if self.hybrid else None
+        return await self._acached(
+            self._cache_key(query, settings, weights, filter),
+            lambda: self._asearch(query, ef_search, probes, filter),
+        )
+    
+    async def _asearch(
+        self,
+        query: str,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[Document, float]]:
+        predicate, filter_params = self._filter_predicate(filter)
+        embedding = await self.aembed_query(query)
+        if self.backend == "memory":
+            return await asyncio.to_thread(self.search_by_vector, embedding, ef_search, probes, filter)
+        
+        if self.hybrid:
+            rows = await self._ahybrid_rows(
+                query, embedding, self.k, self.vector_weight, self.text_weight,
+                ef_search, probes, filter,
+            )
+            return _candidates_from_rows(rows, vectors=False)[0]
+        
+        if filter or self.quantization != "none" or self.reranks:
+            rows = await self._anearest_rows(
+                [embedding], self.k, ef_search, probes, predicate, filter_params
+            )
+            return _candidates_from_rows([row[1:] for row in rows], vectors=False)[0]
+        
+        token = _search_settings.set(self._settings(ef_search, probes))
+        try:
+            vectorstore = await get_async_vectorstore(
+                self.collection_name, self.embedding_model, self.database_url
+            )
+            _watch_engine((await get_async_engine(self.database_url)).sync_engine)
+            
+            results = await vectorstore.asimilarity_search_with_score_by_vector(
+                embedding=embedding, k=self.k
+            )
+            return sorted(results, key=lambda x: x[1])
+        
+        except Exception as e:
+            raise Exception(f"Erro na busca semântica: {e}")
+        finally:
+            _search_settings.reset(token)
+    
+    async def aget_context(self, query: str, filter: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Versão assíncrona de `get_context`.
+        
+        Args:
+            query: Pergunta do usuário
+            filter: Filtro de metadata (ver `search`)
             
         Returns:
             String com contexto dos chunks encontrados
         """
-        results = self.search(query)
+        return (await self.aget_packed_context(query, filter)).text
+    
+    async def aget_packed_context(
+        self, query: str, filter: Optional[Dict[str, Any]] = None
+    ) -> PackedContext:
+        """
+        Como `aget_context`, mas com os tokens e chunks usados no contexto.
         
-        if not results:
-            return ""
+        Seleciona os chunks como `get_context` (MMR ou re-ranker). Os
+        candidatos vêm do pool assíncrono; a pontuação do re-ranker (CPU)
+        roda em thread. Usa o mesmo cache de
+        resultados de `get_context`.
         
-        # Concatenar conteúdo dos chunks
-        context_parts = []
-        for i, (doc, score) in enumerate(results, 1):
-            context_parts.append(f"[Chunk {i}] {doc.page_content}")
+        Args:
+            query: Pergunta do usuário
+            filter: Filtro de metadata (ver `search`)
+            
+        Returns:
+            PackedContext com o texto e os tokens usados
+        """
+        if not self.mmr and self.reranker is None:
+            return self.build_context(await self.asearch(query, filter=filter))
+        if not query or not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        self._filter_predicate(filter)
+        
+        settings = tuple(sorted(self._settings(None, None).items()))
+        weights = (self.vector_weight, self.text_weight) if self.hybrid else None
+        if self.mmr:
+            # Mesma chave de `search_mmr`
+            mmr = self._mmr_params(self.fetch_k, self.mmr_lambda)
+            
+            async def select() -> List[Tuple[Document, float]]:
+                embedding = await self.aembed_query(query)
+                candidates, vectors = await self.afetch_candidates(
+                    embedding, query, mmr[0], filter=filter, vectors=True
+                )
+                selected = maximal_marginal_relevance(embedding, vectors, self.k, mmr[1])
+                return [candidates[i] for i in selected]
+            
+            key = self._cache_key(query, settings, weights, filter, mmr)
+            return self.build_context(await self._acached(key, select))
+        
+        # Mesma chave de `search_reranked`
+        candidates = max(self.rerank_candidates, self.k)
+        
+        async def rerank() -> List[Tuple[Document, float]]:
+            embedding = await self.aembed_query(query)
+            started = time.perf_counter()
+            results, _ = await self.afetch_candidates(embedding, query, candidates, filter=filter)
+            retrieved = time.perf_counter()
+            ranked = await asyncio.to_thread(self.reranker.rerank, query, results, self.k)
+            self.reranker.record(len(results), retrieved - started, time.perf_counter() - retrieved)
+            return ranked
+        
+        key = self._cache_key(query, settings, weights, filter, (self.reranker.method, candidates))
+        return self.build_context(await self._acached(key, rerank))
+
+
+def _candidates_from_rows(
+    rows: List[Any], vectors: bool
+) -> Tuple[List[Tuple[Document, float]], Optional[np.ndarray]]:
+    """Converte linhas (id, document, cmetadata, distância[, embedding]) em candidatos."""
+    candidates = [
+        (Document(id=str(row[0]), page_content=row[1], metadata=row[2]), row[3]) for row in rows
+    ]
+    if not vectors:
+        return candidates, None
+    return candidates, np.array([row[4] for row in rows], dtype=np.float32)
+
+
+def format_context(results: List[Tuple[Document, float]]) -> str:
+    """
+    Concatena todos os chunks encontrados, sem orçamento nem união de overlaps.
+    
+    O contexto enviado ao LLM vem de `SemanticSearch.build_context`; esta
+    versão serve de linha de base no benchmark de contexto.
+    
+    Args:
+        results: Lista de tuplas (documento, score)
         
-        return "\n\n".join(context_parts)
+    Returns:
+        String com contexto dos chunks ("" se não houver resultados)
+    """
+    if not results:
+        return ""
+    
+    # Concatenar conteúdo dos chunks
+    context_parts = []
+    for i, (doc, score) in enumerate(results, 1):
+        context_parts.append(f"[Chunk {i}] {doc.page_content}")
+    
+    return "\n\n".join(context_parts)
 
 
 @app.command()
 def search_cmd(
     query: str = typer.Argument(..., help="Query de busca"),
     collection: str = typer.Option("rag_documents", help="Coleção no banco"),
+    ef_search: Optional[int] = typer.Option(None, help="hnsw.ef_search da consulta"),
+    probes: Optional[int] = typer.Option(None, help="ivfflat.probes da consulta"),
+    backend: Optional[str] = typer.Option(None, help="Backend de recuperação: pgvector ou memory"),
+    quantization: Optional[str] = typer.Option(
+        None, help="Quantização: none, halfvec ou binary (padrão: a da coleção)"
+    ),
+    coarse_dimensions: Optional[int] = typer.Option(
+        None, help="Busca em dois estágios: candidatos pelas primeiras N dimensões"
+    ),
+    hybrid: Optional[bool] = typer.Option(
+        None, "--hybrid/--no-hybrid", help="Combina busca vetorial e full-text (padrão: SEARCH_HYBRID)"
+    ),
+    vector_weight: Optional[float] = typer.Option(None, help="Busca híbrida: peso do caminho vetorial"),
+    text_weight: Optional[float] = typer.Option(None, help="Busca híbrida: peso do caminho lexical"),
+    source: List[str] = typer.Option([], "--source", help="Filtra pelo PDF de origem (repita para vários)"),
+    page_from: Optional[int] = typer.Option(None, help="Filtra a partir desta página (base 0)"),
+    page_to: Optional[int] = typer.Option(None, help="Filtra até esta página, inclusive"),
+    ingested_after: Optional[str] = typer.Option(
+        None, help="Filtra chunks ingeridos a partir da data ISO (ex: 2026-01-31)"
+    ),
+    tag: List[str] = typer.Option([], "--tag", help="Filtra por tag de ingestão (repita para exigir várias)"),
+    mmr: Optional[bool] = typer.Option(
+        None, "--mmr/--no-mmr", help="Seleciona resultados diversos por MMR (padrão: SEARCH_MMR)"
+    ),
+    fetch_k: Optional[int] = typer.Option(None, help="MMR: candidatos recuperados (padrão: SEARCH_MMR_FETCH_K)"),
+    mmr_lambda: Optional[float] = typer.Option(
+        None, help="MMR: 1 = só relevância, 0 = só diversidade (padrão: SEARCH_MMR_LAMBDA)"
+    ),
+    reranker: Optional[str] = typer.Option(
+        None, help=f"Re-ranker local: none, {', '.join(RERANKERS)} (padrão: SEARCH_RERANKER)"
+    ),
+    candidates: Optional[int] = typer.Option(
+        None, help="Re-ranker: candidatos do 1º estágio (padrão: SEARCH_RERANK_CANDIDATES)"
+    ),
 ) -> None:
     """
     Busca semântica por query.
     
     Exemplo:
         python src/search.py "Qual o faturamento da empresa?"
+        python src/search.py "CNPJ 12.345.678/0001-90" --hybrid --text-weight 2
+        python src/search.py "Qual o faturamento?" --source relatorios/2024.pdf --page-to 10
+        python src/search.py "Qual o faturamento?" --mmr --fetch-k 40 --mmr-lambda 0.5
+        python src/search.py "Qual o faturamento?" --reranker bm25 --candidates 50
     """
     try:
         typer.echo(f"🔍 Buscando: {query}\n")
         
-        searcher = SemanticSearch(collection_name=collection)
-        results = searcher.search(query)
+        searcher = SemanticSearch(
+            collection_name=collection,
+            ef_search=ef_search,
+            probes=probes,
+            backend=backend,
+            quantization=quantization,
+            coarse_dimensions=coarse_dimensions,
+            hybrid=hybrid,
+            mmr=mmr,
+            reranker=reranker,
+        )
+        filter = build_filter(source, page_from, page_to, ingested_after, tag)
+        if searcher.mmr:
+            results = searcher.search_mmr(query, fetch_k, mmr_lambda, filter=filter)
+        elif searcher.reranker is not None:
+            results = searcher.search_reranked(query, candidates, filter=filter)
+        elif searcher.hybrid:
+            results = searcher.search_hybrid(query, vector_weight, text_weight, filter=filter)
+        else:
+            results = searcher.search(query, filter=filter)
         
         if not results:
             typer.echo("❌ Nenhum resultado encontrado")
             return
         
         typer.echo(f"✓ {len(results)} resultados encontrados\n")
+        if searcher.reranker is not None and searcher.reranker.queries:
+            stats = searcher.reranker.stats()
+            typer.echo(
+                f"⏱️  1º estágio {stats['retrieve_ms']:.1f} ms ({stats['candidates']:.0f} candidatos) | "
+                f"re-rank {searcher.reranker.method} {stats['rerank_ms']:.1f} ms\n"
+            )
         
         for i, (doc, score) in enumerate(results, 1):
             typer.echo(f"--- Resultado {i} (score: {score:.4f}) ---")
             typer.echo(doc.page_content[:200] + "...")
             typer.echo()
-            
+    
     except Exception as e:
         typer.echo(f"❌ Erro: {e}", err=True)
         raise typer.Exit(code=1)
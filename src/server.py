@@ -0,0 +1,551 @@
+"""
+Serviço HTTP de consultas ao sistema RAG.
+
+Processo de longa duração que mantém aquecidos, por coleção, a busca
+semântica (PGVector, pools de conexões síncrono e assíncrono) e o cliente
+do LLM, em vez de pagar importação e inicialização a cada execução das CLIs:
+
+- POST /search: chunks mais relevantes (`SemanticSearch.asearch`)
+- POST /context: contexto dentro do orçamento de tokens (`aget_packed_context`)
+- POST /ask: resposta do LLM; com "stream": true, tokens via Server-Sent Events
+- GET /health: conexão com o banco e estatísticas do pool
+- GET /metrics: contadores e histogramas no formato texto do Prometheus
+
+No máximo SERVER_MAX_CONCURRENCY requisições são atendidas ao mesmo tempo e
+até SERVER_MAX_QUEUE aguardam vaga por SERVER_QUEUE_TIMEOUT segundos; além
+disso a requisição é recusada com 503 e Retry-After (backpressure).
+
+Busca e LLM vêm de fábricas injetáveis em `create_app`, o que permite subir
+e testar o serviço com provedores locais no lugar de OpenAI e PostgreSQL.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import typer
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.language_models import BaseChatModel
+from pydantic import BaseModel, Field
+
+from src.chat import build_llm, build_messages
+from src.db import aclose_all, check_health, close_all, get_async_vectorstore, pool_stats
+from src.embedding_batcher import BatchingEmbeddings
+from src.embedding_cache import get_cache
+from src.search import SemanticSearch, result_cache
+
+load_dotenv()
+
+app = typer.Typer()
+
+# Resposta padrão (RN-002) quando a busca não traz contexto
+NO_CONTEXT_ANSWER = "Não tenho informações necessárias para responder sua pergunta."
+
+# Limites superiores (segundos) das faixas dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Overloaded(Exception):
+    """Sem vaga para a requisição: fila cheia ou espera esgotada."""
+
+
+class ConcurrencyLimiter:
+    """
+    Limita requisições simultâneas e a fila de espera por vaga.
+    
+    Attributes:
+        max_concurrency: Requisições atendidas ao mesmo tempo
+        max_queue: Requisições aguardando vaga (além delas, recusa imediata)
+        queue_timeout: Espera máxima por vaga, em segundos
+        active: Requisições em atendimento
+        waiting: Requisições na fila
+        rejected: Requisições recusadas
+    """
+    
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        """
+        Cria o limitador (dentro do event loop que vai usá-lo).
+        
+        Args:
+            max_concurrency: Requisições simultâneas
+            max_queue: Tamanho máximo da fila
+            queue_timeout: Espera máxima na fila, em segundos
+            
+        Raises:
+            ValueError: Se parâmetros inválidos
+        """
+        if max_concurrency <= 0 or max_queue < 0 or queue_timeout <= 0:
+            raise ValueError("SERVER_MAX_CONCURRENCY, SERVER_MAX_QUEUE e SERVER_QUEUE_TIMEOUT inválidos")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def acquire(self) -> None:
+        """
+        Aguarda uma vaga.
+        
+        Raises:
+            Overloaded: Se a fila está cheia ou a espera passou de queue_timeout
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("Fila de requisições cheia")
+        
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("Tempo de espera por vaga esgotado")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+    
+    def release(self) -> None:
+        """Libera a vaga obtida em `acquire`."""
+        self.active -= 1
+        self._semaphore.release()
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que chama `release` ao terminar o envio.
+    
+    Cobre os casos em que o gerador nunca é iterado (cliente desconectado
+    antes do corpo, falha ao enviar os cabeçalhos) e seu `finally` não roda.
+    """
+    
+    def __init__(self, content: AsyncIterator[str], release: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.release = release
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+class Histogram:
+    """Histograma cumulativo por rótulo, no formato do Prometheus."""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts: Dict[str, List[int]] = {}
+        self.sums: Counter = Counter()
+    
+    def observe(self, label: str, seconds: float) -> None:
+        counts = self.counts.setdefault(label, [0] * (len(self.buckets) + 1))
+        counts[bisect_left(self.buckets, seconds)] += 1
+        self.sums[label] += seconds
+    
+    def render(self, name: str, label_name: str) -> List[str]:
+        lines = [f"# TYPE {name} histogram"]
+        for label, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {self.sums[label]:.6f}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {cumulative}')
+        return lines
+
+
+@dataclass
+class Workspace:
+    """
+    Estado aquecido de uma coleção.
+    
+    Attributes:
+        searcher: Busca semântica (PGVector e pools compartilhados do processo)
+        llm: Cliente do LLM com conexões keep-alive ao provedor
+    """
+    
+    searcher: SemanticSearch
+    llm: BaseChatModel
+
+
+class ServiceState:
+    """
+    Estado do serviço: coleções aquecidas, limitador e métricas.
+    
+    Attributes:
+        collections: Coleções atendidas (a primeira é a padrão das requisições)
+        workspaces: Estado aquecido por coleção (criado no startup)
+        limiter: Limitador de concorrência (criado no startup)
+        requests: Requisições por (rota, status HTTP)
+        latency: Latência das requisições por rota (até o início da resposta)
+        generation: Duração da geração do LLM por modo ("invoke" ou "stream")
+    """
+    
+    def __init__(
+        self,
+        collections: List[str],
+        searcher_factory: Callable[[str], SemanticSearch],
+        llm_factory: Callable[[], BaseChatModel],
+    ):
+        if not collections:
+            raise ValueError("Nenhuma coleção configurada (SERVER_COLLECTIONS)")
+        self.collections = collections
+        self.searcher_factory = searcher_factory
+        self.llm_factory = llm_factory
+        self.workspaces: Dict[str, Workspace] = {}
+        self.limiter: Optional[ConcurrencyLimiter] = None
+        self.requests: Counter = Counter()
+        self.latency = Histogram()
+        self.generation = Histogram()
+    
+    async def warm(self) -> None:
+        """Cria busca e cliente LLM de cada coleção e abre os pools de conexões."""
+        for name in self.collections:
+            # Construtor consulta o banco (quantização da coleção): fora do event loop
+            searcher = await asyncio.to_thread(self.searcher_factory, name)
+            if isinstance(searcher, SemanticSearch) and searcher.backend == "pgvector":
+                await get_async_vectorstore(name, searcher.embedding_model, searcher.database_url)
+            self.workspaces[name] = Workspace(searcher=searcher, llm=self.llm_factory())
+    
+    def workspace(self, collection: Optional[str]) -> Workspace:
+        """
+        Retorna o estado aquecido da coleção pedida.
+        
+        Raises:
+            HTTPException: 404 se a coleção não é atendida pelo serviço
+        """
+        name = collection or self.collections[0]
+        if name not in self.workspaces:
+            raise HTTPException(status_code=404, detail=f"Coleção não atendida: {name}")
+        return self.workspaces[name]
+    
+    def render_metrics(self) -> str:
+        """Métricas no formato texto do Prometheus."""
+        lines = ["# TYPE rag_requests_total counter"]
+        for (route, status), count in sorted(self.requests.items()):
+            lines.append(f'rag_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines += self.latency.render("rag_request_duration_seconds", "route")
+        lines += self.generation.render("rag_llm_generation_seconds", "mode")
+        
+        limiter = self.limiter
+        if limiter is not None:
+            lines += [
+                "# TYPE rag_inflight_requests gauge",
+                f"rag_inflight_requests {limiter.active}",
+                "# TYPE rag_queued_requests gauge",
+                f"rag_queued_requests {limiter.waiting}",
+                "# TYPE rag_rejected_requests_total counter",
+                f"rag_rejected_requests_total {limiter.rejected}",
+            ]
+        lines += ["# TYPE rag_warm_collections gauge", f"rag_warm_collections {len(self.workspaces)}"]
+        
+        stats = result_cache.stats()
+        lines += [
+            "# TYPE rag_search_cache_hits_total counter",
+            f"rag_search_cache_hits_total {stats['hits']}",
+            "# TYPE rag_search_cache_misses_total counter",
+            f"rag_search_cache_misses_total {stats['misses']}",
+        ]
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            stats = get_cache().stats()
+            lines += [
+                "# TYPE rag_embedding_cache_hits_total counter",
+                f"rag_embedding_cache_hits_total {stats['hits']}",
+                "# TYPE rag_embedding_cache_misses_total counter",
+                f"rag_embedding_cache_misses_total {stats['misses']}",
+            ]
+        
+        batchers = {id(b): b for b in map(_batcher, self.workspaces.values()) if b is not None}
+        if batchers:
+            totals: Counter = Counter()
+            for batcher in batchers.values():
+                stats = batcher.stats()
+                totals.update({key: stats[key] for key in ("batches", "texts", "queue_depth")})
+            lines += [
+                "# TYPE rag_embedding_batches_total counter",
+                f"rag_embedding_batches_total {totals['batches']}",
+                "# TYPE rag_embedding_batched_texts_total counter",
+                f"rag_embedding_batched_texts_total {totals['texts']}",
+                "# TYPE rag_embedding_queue_depth gauge",
+                f"rag_embedding_queue_depth {totals['queue_depth']}",
+            ]
+        
+        rerankers = {
+            ws.searcher.reranker.method: ws.searcher.reranker
+            for ws in self.workspaces.values() if getattr(ws.searcher, "reranker", None) is not None
+        }
+        if rerankers:
+            lines.append("# TYPE rag_rerank_queries_total counter")
+            for method, reranker in sorted(rerankers.items()):
+                lines.append(f'rag_rerank_queries_total{{method="{method}"}} {reranker.queries}')
+            lines.append("# TYPE rag_rerank_seconds_total counter")
+            for method, reranker in sorted(rerankers.items()):
+                lines.append(f'rag_rerank_seconds_total{{method="{method}"}} {reranker.rerank_seconds:.6f}')
+        
+        pools = pool_stats()
+        if pools:
+            lines.append("# TYPE rag_db_pool gauge")
+            for name, stats in sorted(pools.items()):
+                lines += [f'rag_db_pool{{pool="{name}",stat="{k}"}} {v}' for k, v in sorted(stats.items())]
+        return "\n".join(lines) + "\n"
+
+
+def _batcher(workspace: Workspace) -> Optional[BatchingEmbeddings]:
+    # Cache de embeddings -> agrupador -> provedor
+    vectorstore = getattr(workspace.searcher, "vectorstore", None)
+    embeddings = getattr(vectorstore, "embeddings", None)
+    while embeddings is not None and not isinstance(embeddings, BatchingEmbeddings):
+        embeddings = getattr(embeddings, "underlying", None)
+    return embeddings
+
+
+class SearchRequest(BaseModel):
+    """Corpo de POST /search e POST /context."""
+    
+    query: str = Field(..., description="Pergunta ou texto de busca")
+    collection: Optional[str] = Field(None, description="Coleção (padrão: primeira de SERVER_COLLECTIONS)")
+    filter: Optional[Dict[str, Any]] = Field(None, description="Filtro de metadata (ver src.filters)")
+    ef_search: Optional[int] = Field(None, description="hnsw.ef_search da consulta (apenas /search)")
+    probes: Optional[int] = Field(None, description="ivfflat.probes da consulta (apenas /search)")
+
+
+class AskRequest(BaseModel):
+    """Corpo de POST /ask."""
+    
+    question: str = Field(..., description="Pergunta do usuário")
+    collection: Optional[str] = Field(None, description="Coleção (padrão: primeira de SERVER_COLLECTIONS)")
+    filter: Optional[Dict[str, Any]] = Field(None, description="Filtro de metadata (ver src.filters)")
+    stream: bool = Field(False, description="Envia os tokens como Server-Sent Events")
+
+
+def _http_error(error: Exception) -> HTTPException:
+    # Entrada inválida (query vazia, filtro) é 400; falha de banco ou provedor, 500
+    if isinstance(error, HTTPException):
+        return error
+    return HTTPException(status_code=400 if isinstance(error, ValueError) else 500, detail=str(error))
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def create_app(
+    collections: Optional[List[str]] = None,
+    searcher_factory: Optional[Callable[[str], SemanticSearch]] = None,
+    llm_factory: Optional[Callable[[], BaseChatModel]] = None,
+    max_concurrency: Optional[int] = None,
+    max_queue: Optional[int] = None,
+    queue_timeout: Optional[float] = None,
+) -> FastAPI:
+    """
+    Cria a aplicação FastAPI do serviço.
+    
+    Args:
+        collections: Coleções atendidas e aquecidas no startup
+            (padrão: SERVER_COLLECTIONS ou "rag_documents")
+        searcher_factory: Cria a busca de uma coleção (padrão: SemanticSearch)
+        llm_factory: Cria o cliente do LLM (padrão: build_llm)
+        max_concurrency: Requisições simultâneas (padrão: SERVER_MAX_CONCURRENCY ou 32)
+        max_queue: Requisições na fila (padrão: SERVER_MAX_QUEUE ou 64)
+        queue_timeout: Espera máxima por vaga em segundos (padrão: SERVER_QUEUE_TIMEOUT ou 10)
+        
+    Returns:
+        Aplicação FastAPI (servir com uvicorn)
+    """
+    if collections is None:
+        collections = [c.strip() for c in os.getenv("SERVER_COLLECTIONS", "rag_documents").split(",") if c.strip()]
+    state = ServiceState(
+        collections,
+        searcher_factory or (lambda name: SemanticSearch(collection_name=name)),
+        llm_factory or build_llm,
+    )
+    limits = (
+        max_concurrency or int(os.getenv("SERVER_MAX_CONCURRENCY", "32")),
+        int(os.getenv("SERVER_MAX_QUEUE", "64")) if max_queue is None else max_queue,
+        queue_timeout or float(os.getenv("SERVER_QUEUE_TIMEOUT", "10")),
+    )
+    
+    @asynccontextmanager
+    async def lifespan(api: FastAPI) -> AsyncIterator[None]:
+        # Primitivas asyncio pertencem ao event loop do servidor
+        state.limiter = ConcurrencyLimiter(*limits)
+        await state.warm()
+        try:
+            yield
+        finally:
+            await aclose_all()
+            close_all()
+    
+    api = FastAPI(title="RAG - Busca Semântica", lifespan=lifespan)
+    api.state.service = state
+    
+    @api.middleware("http")
+    async def measure(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        path = route.path if route is not None else "other"
+        state.requests[(path, response.status_code)] += 1
+        state.latency.observe(path, time.perf_counter() - started)
+        return response
+    
+    @api.exception_handler(Overloaded)
+    async def overloaded(request: Request, error: Overloaded) -> JSONResponse:
+        return JSONResponse({"detail": str(error)}, status_code=503, headers={"Retry-After": "1"})
+    
+    @asynccontextmanager
+    async def admitted() -> AsyncIterator[None]:
+        await state.limiter.acquire()
+        try:
+            yield
+        except Exception as e:
+            raise _http_error(e)
+        finally:
+            state.limiter.release()
+    
+    @api.post("/search")
+    async def search(body: SearchRequest) -> Dict[str, Any]:
+        workspace = state.workspace(body.collection)
+        async with admitted():
+            results = await workspace.searcher.asearch(
+                body.query, ef_search=body.ef_search, probes=body.probes, filter=body.filter
+            )
+        return {
+            "results": [
+                {"id": doc.id, "content": doc.page_content, "metadata": doc.metadata, "score": score}
+                for doc, score in results
+            ]
+        }
+    
+    @api.post("/context")
+    async def context(body: SearchRequest) -> Dict[str, Any]:
+        workspace = state.workspace(body.collection)
+        async with admitted():
+            packed = await workspace.searcher.aget_packed_context(body.query, filter=body.filter)
+        return {
+            "context": packed.text,
+            "tokens": packed.tokens,
+            "chunks": packed.chunks,
+            "merged": packed.merged,
+            "dropped": packed.dropped,
+        }
+    
+    @api.post("/ask")
+    async def ask(body: AskRequest):
+        workspace = state.workspace(body.collection)
+        if not body.stream:
+            async with admitted():
+                started = time.perf_counter()
+                packed = await workspace.searcher.aget_packed_context(body.question, filter=body.filter)
+                retrieved = time.perf_counter()
+                answer = NO_CONTEXT_ANSWER
+                if packed.text:
+                    response = await workspace.llm.ainvoke(build_messages(body.question, packed.text))
+                    answer = response.content
+                    state.generation.observe("invoke", time.perf_counter() - retrieved)
+            return {
+                "answer": answer,
+                "context_tokens": packed.tokens,
+                "retrieve_ms": (retrieved - started) * 1000,
+                "generate_ms": (time.perf_counter() - retrieved) * 1000,
+            }
+        
+        # Streaming: a vaga só é liberada quando o último token sai, ou quando
+        # a resposta termina sem o corpo ser lido (cliente desconectado)
+        await state.limiter.acquire()
+        released = False
+        
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                state.limiter.release()
+        
+        try:
+            packed = await workspace.searcher.aget_packed_context(body.question, filter=body.filter)
+        except BaseException as e:
+            release()
+            raise _http_error(e) if isinstance(e, Exception) else e
+        
+        async def events() -> AsyncIterator[str]:
+            started = time.perf_counter()
+            first_token_at = None
+            try:
+                if not packed.text:
+                    yield _sse("token", {"text": NO_CONTEXT_ANSWER})
+                else:
+                    messages = build_messages(body.question, packed.text)
+                    async for chunk in workspace.llm.astream(messages):
+                        if not chunk.content:
+                            continue
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        yield _sse("token", {"text": chunk.content})
+                    state.generation.observe("stream", time.perf_counter() - started)
+                ttft = first_token_at - started if first_token_at is not None else None
+                yield _sse("done", {
+                    "context_tokens": packed.tokens,
+                    "time_to_first_token_ms": ttft * 1000 if ttft is not None else None,
+                    "generate_ms": (time.perf_counter() - started) * 1000,
+                })
+            except Exception as e:
+                # Cabeçalhos já enviados: o erro vai como evento
+                yield _sse("error", {"detail": str(e)})
+            finally:
+                release()
+        
+        return ReleasingStreamingResponse(events(), release, media_type="text/event-stream")
+    
+    @api.get("/health")
+    async def health() -> JSONResponse:
+        status = await asyncio.to_thread(check_health)
+        return JSONResponse(
+            {**status, "collections": sorted(state.workspaces)},
+            status_code=200 if status["ok"] else 503,
+        )
+    
+    @api.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> str:
+        return state.render_metrics()
+    
+    return api
+
+
+@app.command()
+def main(
+    host: str = typer.Option("127.0.0.1", help="Endereço de escuta"),
+    port: int = typer.Option(8000, help="Porta HTTP"),
+    collection: List[str] = typer.Option(
+        [], "--collection", help="Coleção atendida (repita para várias; padrão: SERVER_COLLECTIONS)"
+    ),
+):
+    """
+    Inicia o serviço HTTP de consultas.
+    
+    Exemplo:
+        python src/server.py
+        python src/server.py --port 8080 --collection rag_documents --collection custom_docs
+    """
+    import uvicorn
+    
+    typer.echo(f"🚀 Servindo em http://{host}:{port} (métricas em /metrics)")
+    uvicorn.run(create_app(collections=collection or None), host=host, port=port)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,471 @@
+"""
+Exportação e importação de coleções.
+
+Move uma coleção entre ambientes sem reprocessar os PDFs nem pagar de novo
+pelos embeddings. O formato é um diretório:
+    
+    <dir>/manifest.json   coleção, modelo, quantização, quantidade, dimensão e dtype
+    <dir>/vectors.npy     matriz (N x D) em float32, float16 ou int8
+    <dir>/scales.npy      float32 (N) com a escala de cada linha (apenas int8)
+    <dir>/offsets.npy     int64 (N + 1) com o início de cada registro no blob
+    <dir>/blob.bin        registros JSON (id, documento, metadados) concatenados
+
+A exportação lê a coleção por cursor no servidor e grava os arquivos em
+lotes (memória constante); a importação lê os arquivos por memory-map e
+grava com COPY binário.
+
+Exemplo:
+    python src/transfer.py export --collection rag_documents --output dumps/rag --dtype float16
+    python src/transfer.py import dumps/rag --collection rag_documents
+"""
+
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Adicionar diretório pai ao path para imports funcionarem
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import psycopg
+import typer
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from numpy.lib.format import open_memmap
+from pgvector.psycopg import register_vector
+from sqlalchemy import text
+
+from src.db import (
+    COLLECTION_TABLE,
+    EMBEDDING_TABLE,
+    QUANTIZATIONS,
+    bump_collection_version,
+    collection_metadata,
+    get_engine,
+    psycopg_conninfo,
+    set_collection_metadata,
+)
+from src.embedding_cache import embedding_settings, get_embeddings
+from src.ingest import CopyWriter, build_vectorstore, chunk_id
+from src.memory_index import decode_record, encode_record
+
+load_dotenv()
+
+app = typer.Typer()
+
+DTYPES = ("float32", "float16", "int8")
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+OFFSETS_FILE = "offsets.npy"
+BLOB_FILE = "blob.bin"
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Converte vetores float32 para o dtype de armazenamento.
+    
+    int8 usa escala simétrica por linha: cada linha é dividida por
+    max(|x|) / 127 e arredondada.
+    
+    Args:
+        matrix: Matriz float32 (N x D)
+        dtype: "float32", "float16" ou "int8"
+        
+    Returns:
+        Tupla (valores, escalas); escalas apenas para int8
+        
+    Raises:
+        ValueError: Se dtype inválido
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype inválido: {dtype} (opções: {', '.join(DTYPES)})")
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype != "int8":
+        return matrix.astype(dtype), None
+    
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1
+    values = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def dequantize(values: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Reconstrói vetores float32 a partir do formato armazenado.
+    
+    Args:
+        values: Matriz em float32, float16 ou int8
+        scales: Escala de cada linha (int8)
+        
+    Returns:
+        Matriz float32
+    """
+    matrix = np.asarray(values, dtype=np.float32)
+    if scales is not None:
+        matrix = matrix * np.asarray(scales, dtype=np.float32)[:, None]
+    return matrix
+
+
+def _prepare_output(output: str) -> Path:
+    target = Path(output)
+    if target.exists() and any(target.iterdir()) and not (target / MANIFEST_FILE).exists():
+        raise ValueError(f"Diretório não vazio e sem exportação anterior: {output}")
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def export_collection(
+    collection_name: str,
+    output: str,
+    dtype: str = "float32",
+    batch_size: int = 5000,
+    database_url: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    Exporta chunks, metadados e vetores de uma coleção.
+    
+    Tudo é lido em uma única transação REPEATABLE READ (contagem e dados
+    consistentes mesmo com ingestões concorrentes) por cursor no servidor,
+    e gravado lote a lote nos arquivos já dimensionados. Modelo, dimensão
+    pedida ao provedor e quantização vêm dos metadados da coleção; coleções
+    ingeridas antes desse registro usam EMBEDDING_MODEL/EMBEDDING_DIMENSIONS.
+    
+    Args:
+        collection_name: Nome da coleção
+        output: Diretório de saída (substituído se já contiver uma exportação)
+        dtype: Tipo dos vetores: "float32", "float16" ou "int8"
+        batch_size: Linhas lidas por lote
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Manifesto gravado
+        
+    Raises:
+        ValueError: Se dtype inválido, coleção inexistente ou dimensões mistas
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype inválido: {dtype} (opções: {', '.join(DTYPES)})")
+    
+    with psycopg.connect(psycopg_conninfo(database_url)) as conn:
+        register_vector(conn)
+        conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+        
+        with conn.transaction():
+            row = conn.execute(
+                f"SELECT uuid, cmetadata FROM {COLLECTION_TABLE} WHERE name = %s", (collection_name,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Coleção não encontrada: {collection_name}")
+            collection_id = row[0]
+            settings = row[1] if isinstance(row[1], dict) else {}
+            
+            count, min_dims, max_dims = conn.execute(
+                f"SELECT COUNT(*), MIN(vector_dims(embedding)), MAX(vector_dims(embedding)) "
+                f"FROM {EMBEDDING_TABLE} WHERE collection_id = %s",
+                (collection_id,),
+            ).fetchone()
+            if min_dims != max_dims:
+                raise ValueError(f"Coleção com dimensões mistas: {min_dims} e {max_dims}")
+            dimensions = max_dims or 0
+            
+            staging = _prepare_output(output)
+            vectors = open_memmap(
+                staging / VECTORS_FILE, mode="w+", dtype=dtype, shape=(count, dimensions)
+            )
+            scales = (
+                open_memmap(staging / SCALES_FILE, mode="w+", dtype=np.float32, shape=(count,))
+                if dtype == "int8" else None
+            )
+            offsets = open_memmap(staging / OFFSETS_FILE, mode="w+", dtype=np.int64, shape=(count + 1,))
+            offsets[0] = 0
+            
+            written = 0
+            # Cursor no servidor em formato binário: vetores chegam sem parse de texto
+            blob = open(staging / BLOB_FILE, "wb")
+            with blob, conn.cursor(name="transfer_export", binary=True) as cur:
+                cur.itersize = batch_size
+                cur.execute(
+                    f"SELECT id, document, cmetadata, embedding FROM {EMBEDDING_TABLE} "
+                    "WHERE collection_id = %s ORDER BY id",
+                    (collection_id,),
+                )
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    end = written + len(rows)
+                    values, row_scales = quantize(np.stack([r[3] for r in rows]), dtype)
+                    vectors[written:end] = values
+                    if scales is not None:
+                        scales[written:end] = row_scales
+                    for i, (id_, document, metadata, _) in enumerate(rows, written):
+                        record = encode_record(
+                            Document(id=str(id_), page_content=document, metadata=metadata or {})
+                        )
+                        blob.write(record)
+                        offsets[i + 1] = offsets[i] + len(record)
+                    written = end
+    
+    for array in (vectors, scales, offsets):
+        if array is not None:
+            array.flush()
+    del vectors, scales, offsets
+    
+    model, requested_dimensions = embedding_settings()
+    if "embedding_model" in settings:
+        model, requested_dimensions = settings["embedding_model"], settings.get("embedding_dimensions")
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection_name,
+        "embedding_model": model,
+        "embedding_dimensions": requested_dimensions,
+        "quantization": settings.get("quantization", "none"),
+        "count": count,
+        "dimensions": dimensions,
+        "dtype": dtype,
+    }
+    (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    
+    target = Path(output)
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+    return manifest
+
+
+def read_manifest(path: str) -> Dict[str, object]:
+    """
+    Lê o manifesto de uma exportação.
+    
+    Args:
+        path: Diretório da exportação
+        
+    Returns:
+        Manifesto
+        
+    Raises:
+        FileNotFoundError: Se o diretório não contiver uma exportação
+        ValueError: Se a versão do formato não for suportada
+    """
+    manifest_path = Path(path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Exportação não encontrada: {path}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Versão de formato não suportada: {manifest.get('format_version')}")
+    return manifest
+
+
+def iter_export(path: str, batch_size: int = 5000) -> Iterator[Tuple[List[Document], np.ndarray]]:
+    """
+    Lê uma exportação em lotes, por memory-map.
+    
+    Args:
+        path: Diretório da exportação
+        batch_size: Linhas por lote
+        
+    Yields:
+        Tuplas (documentos, vetores float32) de cada lote
+    """
+    directory = Path(path)
+    manifest = read_manifest(path)
+    count = manifest["count"]
+    if not count:
+        return
+    
+    vectors = np.load(directory / VECTORS_FILE, mmap_mode="r")
+    scales = np.load(directory / SCALES_FILE, mmap_mode="r") if manifest["dtype"] == "int8" else None
+    offsets = np.load(directory / OFFSETS_FILE, mmap_mode="r")
+    blob = np.memmap(directory / BLOB_FILE, dtype=np.uint8, mode="r")
+    
+    for start in range(0, count, batch_size):
+        end = min(start + batch_size, count)
+        documents = [
+            decode_record(bytes(blob[offsets[i]:offsets[i + 1]])) for i in range(start, end)
+        ]
+        batch_scales = scales[start:end] if scales is not None else None
+        yield documents, dequantize(vectors[start:end], batch_scales)
+
+
+def import_collection(
+    path: str,
+    collection_name: Optional[str] = None,
+    batch_size: int = 5000,
+    replace: bool = False,
+    database_url: Optional[str] = None,
+) -> int:
+    """
+    Importa uma exportação com COPY binário.
+    
+    Chunks com o mesmo id são atualizados (upsert), como na ingestão. Ao
+    importar para outra coleção, os ids são regerados com `chunk_id` para a
+    coleção de destino (o id inclui o nome da coleção). Modelo, dimensão e
+    quantização do manifesto são gravados nos metadados do destino.
+    
+    Args:
+        path: Diretório da exportação
+        collection_name: Coleção de destino (padrão: a do manifesto)
+        batch_size: Linhas por COPY
+        replace: Remove os chunks existentes da coleção antes de importar
+        database_url: URL no formato SQLAlchemy (padrão: DATABASE_URL)
+        
+    Returns:
+        Quantidade de chunks importados
+        
+    Raises:
+        ValueError: Se a coleção de destino já guardar vetores de outro modelo ou dimensão
+    """
+    manifest = read_manifest(path)
+    collection_name = collection_name or manifest["collection"]
+    source = (manifest["embedding_model"], manifest.get("embedding_dimensions"))
+    quantization = manifest.get("quantization", "none")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantização inválida no manifesto: {quantization}")
+    
+    # Misturar espaços vetoriais na mesma coleção quebraria a busca
+    target = collection_metadata(collection_name, database_url)
+    if not replace and "embedding_model" in target:
+        existing = (target["embedding_model"], target.get("embedding_dimensions"))
+        if existing != source:
+            raise ValueError(
+                f"Coleção {collection_name} usa {_describe_model(*existing)}; "
+                f"exportação gerada com {_describe_model(*source)} (use --replace)"
+            )
+    
+    current = embedding_settings()
+    if current != source:
+        typer.echo(
+            f"⚠️  Exportação gerada com {_describe_model(*source)}; "
+            f"configuração atual é {_describe_model(*current)}",
+            err=True,
+        )
+    
+    # Cria tabelas e coleção se necessário
+    vectorstore = build_vectorstore(collection_name, get_embeddings(current[0]))
+    if replace:
+        with get_engine(database_url).begin() as conn:
+            conn.execute(
+                text(
+                    f"DELETE FROM {EMBEDDING_TABLE} WHERE collection_id = "
+                    f"(SELECT uuid FROM {COLLECTION_TABLE} WHERE name = :name)"
+                ),
+                {"name": collection_name},
+            )
+    
+    writer = CopyWriter(vectorstore, database_url)
+    imported = 0
+    try:
+        for documents, vectors in iter_export(path, batch_size):
+            if collection_name != manifest["collection"]:
+                for doc in documents:
+                    doc.id = chunk_id(collection_name, doc)
+            writer(documents, list(vectors))
+            imported += len(documents)
+    finally:
+        writer.close()
+        if imported:
+            set_collection_metadata(
+                collection_name,
+                {
+                    "embedding_model": source[0],
+                    "embedding_dimensions": source[1],
+                    "quantization": quantization,
+                },
+                database_url,
+            )
+        if imported or replace:
+            bump_collection_version(collection_name, database_url)
+    
+    return imported
+
+
+def _describe_model(model: str, dimensions: Optional[int]) -> str:
+    return f"{model} ({dimensions} dims)" if dimensions else model
+
+
+def directory_size(path: str) -> int:
+    """
+    Soma o tamanho dos arquivos de um diretório.
+    
+    Args:
+        path: Diretório
+        
+    Returns:
+        Tamanho em bytes
+    """
+    return sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file())
+
+
+@app.callback()
+def callback() -> None:
+    """Exporta e importa coleções sem regerar embeddings."""
+
+
+@app.command("export")
+def export_cmd(
+    collection: str = typer.Option("rag_documents", help="Coleção no banco"),
+    output: str = typer.Option(..., help="Diretório de saída"),
+    dtype: str = typer.Option("float32", help="Tipo dos vetores: float32, float16 ou int8"),
+    batch_size: int = typer.Option(5000, help="Linhas lidas por lote"),
+) -> None:
+    """
+    Exporta uma coleção para um diretório.
+    
+    Exemplo:
+        python src/transfer.py export --collection rag_documents --output dumps/rag
+        python src/transfer.py export --output dumps/rag --dtype int8
+    """
+    try:
+        started = time.perf_counter()
+        manifest = export_collection(collection, output, dtype, batch_size)
+        elapsed = time.perf_counter() - started
+        size_mb = directory_size(output) / 1024 / 1024
+        typer.echo(
+            f"✓ {manifest['count']} chunks de {collection} exportados para {output} "
+            f"({manifest['dimensions']} dims, {dtype}, {size_mb:.1f} MB, {elapsed:.2f}s)"
+        )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+@app.command("import")
+def import_cmd(
+    path: str = typer.Argument(..., help="Diretório da exportação"),
+    collection: Optional[str] = typer.Option(None, help="Coleção de destino (padrão: a exportada)"),
+    batch_size: int = typer.Option(5000, help="Linhas por COPY"),
+    replace: bool = typer.Option(False, help="Remove os chunks existentes da coleção antes"),
+) -> None:
+    """
+    Importa uma exportação para o banco.
+    
+    Exemplo:
+        python src/transfer.py import dumps/rag
+        python src/transfer.py import dumps/rag --collection rag_staging --replace
+    """
+    try:
+        started = time.perf_counter()
+        imported = import_collection(path, collection, batch_size, replace)
+        elapsed = time.perf_counter() - started
+        rate = f", {imported / elapsed:.0f} chunks/s" if imported and elapsed > 0 else ""
+        typer.echo(f"✓ {imported} chunks importados ({elapsed:.2f}s{rate})")
+        quantization = read_manifest(path).get("quantization", "none")
+        if imported and quantization != "none":
+            typer.echo(
+                f"🗜️  Quantização: {quantization} "
+                f"(índice: python src/index.py create --quantization {quantization})"
+            )
+    except Exception as e:
+        typer.echo(f"❌ Erro: {e}", err=True)
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
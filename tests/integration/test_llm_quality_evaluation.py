@@ -6,8 +6,7 @@ Valida aspectos qualitativos das respostas que vão além de validações estrut
 import pytest
 
 from src.ingest import load_pdf, split_documents, store_in_vectorstore
-from src.search import SemanticSearch
-from src.chat import ask_llm, SYSTEM_PROMPT
+from src.chat import ChatSession, SYSTEM_PROMPT
 
 
 @pytest.fixture(scope="module")
@@ -19,15 +18,21 @@ def quality_test_collection(sample_pdf_path, shared_test_collection):
     yield shared_test_collection
 
 
-def test_factual_accuracy_direct_question(quality_test_collection, llm_evaluator):
+@pytest.fixture(scope="module")
+def chat_session(quality_test_collection):
+    """
+    Sessão de chat compartilhada pelos testes do módulo (cliente LLM reutilizado).
+    """
+    return ChatSession(collection_name=quality_test_collection)
+
+
+def test_factual_accuracy_direct_question(chat_session, llm_evaluator):
     """
     Valida resposta factual para pergunta direta sobre empresa específica.
     """
-    searcher = SemanticSearch(collection_name=quality_test_collection)
-    
     question = "Qual é o faturamento da empresa Alfa Energia S.A.?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     # Avaliação LLM
     evaluation = llm_evaluator.evaluate(
@@ -48,15 +53,13 @@ def test_factual_accuracy_direct_question(quality_test_collection, llm_evaluator
         f"Score fora do range esperado: {evaluation.score}"
 
 
-def test_no_context_standard_message(quality_test_collection, llm_evaluator):
+def test_no_context_standard_message(chat_session, llm_evaluator):
     """
     Valida mensagem padrão quando sem contexto.
     """
-    searcher = SemanticSearch(collection_name=quality_test_collection)
-    
     question = "Qual é a capital da França?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     assert "Não tenho informações necessárias" in response
     
@@ -76,16 +79,15 @@ def test_no_context_standard_message(quality_test_collection, llm_evaluator):
         f"Score fora do range esperado: {evaluation.score}"
 
 
-def test_partial_info_no_hallucination(quality_test_collection, llm_evaluator):
+def test_partial_info_no_hallucination(chat_session, llm_evaluator):
     """
     Valida que LLM não inventa informações ausentes no documento.
     """
-    searcher = SemanticSearch(collection_name=quality_test_collection)
     
     # Pergunta sobre campo não presente na tabela
     question = "Quantos funcionários a empresa Alfa Energia S.A. possui?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     evaluation = llm_evaluator.evaluate(
         question=question,
@@ -104,15 +106,13 @@ def test_partial_info_no_hallucination(quality_test_collection, llm_evaluator):
         f"Score fora do range válido: {evaluation.score}"
 
 
-def test_no_external_knowledge(quality_test_collection, llm_evaluator):
+def test_no_external_knowledge(chat_session, llm_evaluator):
     """
     Valida que LLM não usa conhecimento geral externo.
     """
-    searcher = SemanticSearch(collection_name=quality_test_collection)
-    
     question = "O que é inteligência artificial?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     evaluation = llm_evaluator.evaluate(
         question=question,
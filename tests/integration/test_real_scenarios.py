@@ -6,8 +6,7 @@ Valida casos de uso práticos e edge cases com avaliação LLM qualitativa.
 import pytest
 
 from src.ingest import load_pdf, split_documents, store_in_vectorstore
-from src.search import SemanticSearch
-from src.chat import ask_llm, SYSTEM_PROMPT
+from src.chat import ChatSession, SYSTEM_PROMPT
 
 
 @pytest.fixture(scope="module")
@@ -37,15 +36,21 @@ def real_scenario_collection(sample_pdf_path, shared_test_collection):
         pass
 
 
-def test_scenario_ambiguous_question(real_scenario_collection, llm_evaluator):
+@pytest.fixture(scope="module")
+def chat_session(real_scenario_collection):
+    """
+    Sessão de chat compartilhada pelos testes do módulo (cliente LLM reutilizado).
+    """
+    return ChatSession(collection_name=real_scenario_collection)
+
+
+def test_scenario_ambiguous_question(chat_session, llm_evaluator):
     """
     Cenário: Pergunta ambígua.
     """
-    searcher = SemanticSearch(collection_name=real_scenario_collection)
-    
     question = "Quando isso aconteceu?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     evaluation = llm_evaluator.evaluate(
         question=question,
@@ -59,15 +64,13 @@ def test_scenario_ambiguous_question(real_scenario_collection, llm_evaluator):
         f"Hallucination detection abaixo do esperado: {evaluation.criteria_scores['hallucination_detection']}"
 
 
-def test_scenario_no_context_messages(real_scenario_collection, llm_evaluator):
+def test_scenario_no_context_messages(chat_session, llm_evaluator):
     """
     Cenário: Pergunta fora do contexto.
     """
-    searcher = SemanticSearch(collection_name=real_scenario_collection)
-    
     question = "Quem foi o primeiro presidente dos Estados Unidos?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     assert "Não tenho informações necessárias" in response
     
@@ -82,15 +85,13 @@ def test_scenario_no_context_messages(real_scenario_collection, llm_evaluator):
         f"Overall score abaixo do esperado: {evaluation.overall_score}"
 
 
-def test_scenario_numeric_data(real_scenario_collection, llm_evaluator):
+def test_scenario_numeric_data(chat_session, llm_evaluator):
     """
     Cenário: Extração de valor monetário de empresa específica.
     """
-    searcher = SemanticSearch(collection_name=real_scenario_collection)
-    
     question = "Qual é o faturamento da empresa Aliança Esportes ME?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     evaluation = llm_evaluator.evaluate(
         question=question,
@@ -106,15 +107,13 @@ def test_scenario_numeric_data(real_scenario_collection, llm_evaluator):
         f"Adherence to context abaixo do esperado: {evaluation.criteria_scores['adherence_to_context']}"
 
 
-def test_scenario_factual_extraction(real_scenario_collection, llm_evaluator):
+def test_scenario_factual_extraction(chat_session, llm_evaluator):
     """
     Cenário: Extração de fato específico de uma empresa.
     """
-    searcher = SemanticSearch(collection_name=real_scenario_collection)
-    
     question = "Em que ano foi fundada a empresa Alta Mídia S.A.?"
-    context = searcher.get_context(question)
-    response = ask_llm(question, context)
+    context = chat_session.get_context(question)
+    response = chat_session.ask(question, context)
     
     evaluation = llm_evaluator.evaluate(
         question=question,
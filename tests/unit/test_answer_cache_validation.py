@@ -0,0 +1,81 @@
+"""
+Testes unitários do cache semântico de respostas.
+
+Valida limiar de similaridade, invalidação por versão da coleção,
+despejo LRU e expiração por TTL.
+"""
+import time
+
+import pytest
+
+from src.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache em arquivo temporário com limiar 0.9."""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.9, max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_near_duplicate_hit_and_distant_miss(cache):
+    """
+    Valida acerto por similaridade de cosseno.
+    
+    Expected: Vetor quase igual retorna a resposta; vetor distante não
+    """
+    cache.store("docs", "v1", "Qual o faturamento?", [1.0, 0.0, 0.0], "R$ 10 mi", "ctx")
+    
+    hit = cache.lookup("docs", "v1", [0.98, 0.1, 0.0])
+    assert hit is not None
+    assert hit.answer == "R$ 10 mi"
+    assert hit.context == "ctx"
+    assert hit.similarity > 0.9
+    
+    assert cache.lookup("docs", "v1", [0.0, 1.0, 0.0]) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_scoped_by_collection_and_version(cache):
+    """
+    Valida invalidação quando a coleção é reingerida (nova versão).
+    
+    Expected: Outra coleção não vê a resposta; nova versão descarta a antiga
+    """
+    cache.store("docs", "v1", "Pergunta", [1.0, 0.0], "Resposta", "ctx")
+    
+    assert cache.lookup("outra", "v1", [1.0, 0.0]) is None
+    assert cache.lookup("docs", "v2", [1.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction(cache):
+    """
+    Valida despejo da resposta menos usada recentemente.
+    
+    Expected: Com max_entries=2, a entrada não consultada é removida
+    """
+    cache.store("docs", "v1", "a", [1.0, 0.0, 0.0], "A", "ctx")
+    cache.store("docs", "v1", "b", [0.0, 1.0, 0.0], "B", "ctx")
+    assert cache.lookup("docs", "v1", [1.0, 0.0, 0.0]).answer == "A"
+    
+    cache.store("docs", "v1", "c", [0.0, 0.0, 1.0], "C", "ctx")
+    
+    assert len(cache) == 2
+    assert cache.lookup("docs", "v1", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("docs", "v1", [1.0, 0.0, 0.0]).answer == "A"
+
+
+def test_ttl_expiration(tmp_path):
+    """
+    Valida expiração de respostas antigas.
+    
+    Expected: Resposta mais velha que o TTL não é retornada
+    """
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), ttl_seconds=0.05)
+    cache.store("docs", "v1", "Pergunta", [1.0, 0.0], "Resposta", "ctx")
+    time.sleep(0.1)
+    
+    assert cache.lookup("docs", "v1", [1.0, 0.0]) is None
+    cache.close()
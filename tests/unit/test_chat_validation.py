@@ -3,7 +3,14 @@ Testes unitários críticos para validação de chat.
 
 Valida estrutura de prompts e regras de sistema.
 """
-from src.chat import build_prompt, SYSTEM_PROMPT
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import src.chat
+from src.chat import ChatSession, aask_llm, build_messages, build_prompt, stream_llm, SYSTEM_PROMPT
+from src.context import pack_context
 
 
 def test_system_prompt_contains_rules():
@@ -78,3 +85,133 @@ def test_build_prompt_handles_empty_context():
     assert "CONTEXTO:" in prompt
     assert "PERGUNTA DO USUÁRIO:" in prompt
     assert question in prompt
+
+
+def test_build_messages_shared_by_sync_and_async():
+    """
+    Valida mensagens enviadas ao LLM (ask_llm e aask_llm).
+    
+    Expected: SYSTEM_PROMPT seguido do prompt com contexto e pergunta
+    """
+    messages = build_messages("Pergunta?", "Contexto.")
+    
+    assert [m.type for m in messages] == ["system", "human"]
+    assert messages[0].content == SYSTEM_PROMPT
+    assert messages[1].content == build_prompt("Contexto.", "Pergunta?")
+
+
+def test_stream_llm_forwards_tokens(monkeypatch):
+    """
+    Valida modo streaming: tokens repassados na ordem e tempos medidos.
+    
+    Expected: Concatenação dos tokens igual à resposta; TTFT <= tempo total
+    """
+    answer = "Não tenho informações necessárias para responder sua pergunta."
+    monkeypatch.setattr(src.chat, "build_llm", lambda: FakeListChatModel(responses=[answer]))
+    tokens = []
+    
+    text, stats = stream_llm("Pergunta?", "Contexto.", on_token=tokens.append)
+    
+    assert text == answer
+    assert "".join(tokens) == answer
+    assert len(tokens) > 1
+    assert 0 <= stats.time_to_first_token <= stats.total_seconds
+
+
+def test_aask_llm_reuses_client_per_event_loop(monkeypatch):
+    """
+    Valida reuso do cliente assíncrono entre perguntas do mesmo event loop.
+    
+    Expected: Um cliente criado para várias perguntas concorrentes; llm explícito respeitado
+    """
+    created = []
+    
+    def build():
+        created.append(FakeListChatModel(responses=["R$ 10 milhões."]))
+        return created[-1]
+    
+    monkeypatch.setattr(src.chat, "build_llm", build)
+    
+    async def run():
+        answers = await asyncio.gather(*(aask_llm("Pergunta?", "Contexto.") for _ in range(5)))
+        explicit = await aask_llm("Pergunta?", "Contexto.", llm=FakeListChatModel(responses=["outro"]))
+        return answers, explicit
+    
+    answers, explicit = asyncio.run(run())
+    
+    assert answers == ["R$ 10 milhões."] * 5
+    assert explicit == "outro"
+    assert len(created) == 1
+
+
+class FakeSearcher:
+    """Busca em memória que devolve sempre o mesmo chunk."""
+    
+    hybrid = False
+    mmr = False
+    reranker = None
+    
+    def embed_query(self, query):
+        return [0.1, 0.2]
+    
+    def search(self, query, filter=None, embedding=None):
+        # Entrada com cache de resultados: pergunta e vetor já calculado
+        assert query and embedding == self.embed_query(query)
+        return [(Document(page_content="Faturamento: R$ 10 milhões."), 0.1)]
+    
+    def build_context(self, results):
+        return pack_context(results, max_tokens=100)
+
+
+def test_chat_session_reuses_llm_and_records_timings():
+    """
+    Valida sessão de chat: mesmo cliente LLM entre perguntas e latência decomposta.
+    
+    Expected: Contexto formatado, respostas em ordem e tempos de embed/busca/geração
+    """
+    llm = FakeListChatModel(responses=["R$ 10 milhões.", "Não tenho informações necessárias."])
+    session = ChatSession(llm=llm, searcher=FakeSearcher())
+    
+    context = session.get_context("Qual o faturamento?")
+    assert context == "[Chunk 1] Faturamento: R$ 10 milhões."
+    assert session.ask("Qual o faturamento?", context) == "R$ 10 milhões."
+    
+    timings = session.last_timings
+    assert timings.setup == 0
+    assert min(timings.embed, timings.retrieve, timings.generate) >= 0
+    assert timings.total == timings.embed + timings.retrieve + timings.generate
+    assert timings.context_tokens > 0
+    assert "contexto" in timings.describe()
+    
+    tokens = []
+    assert session.stream("Outra?", context, on_token=tokens.append) == "Não tenho informações necessárias."
+    assert session.llm is llm
+    assert session.last_timings is not timings
+    assert session.last_timings.time_to_first_token is not None
+
+
+def test_cache_scope_includes_retrieval_settings():
+    """
+    Valida escopo do cache de respostas por filtro e parâmetros de recuperação.
+    
+    Expected: Escopos distintos para MMR, híbrida, orçamento, quantização, coarse e backend diferentes
+    """
+    def scope(**settings):
+        searcher = FakeSearcher()
+        searcher.k, searcher.max_context_tokens = 10, 3000
+        searcher.fetch_k, searcher.mmr_lambda = 40, 0.5
+        searcher.vector_weight, searcher.text_weight = 0.7, 0.3
+        for name, value in settings.items():
+            setattr(searcher, name, value)
+        return ChatSession(collection_name="docs", searcher=searcher)._cache_scope
+    
+    plain = scope()
+    assert plain.startswith("docs|")
+    assert plain == scope()
+    assert len({plain, scope(mmr=True), scope(hybrid=True), scope(max_context_tokens=1500)}) == 4
+    assert scope(mmr=True) != scope(mmr=True, mmr_lambda=0.9)
+    assert len({plain, scope(quantization="binary"), scope(backend="memory")}) == 3
+    coarse = scope(reranks=True, coarse_dimensions=256, rerank_factor=10)
+    assert coarse != plain
+    assert coarse != scope(reranks=True, coarse_dimensions=512, rerank_factor=10)
+    assert coarse != scope(reranks=True, coarse_dimensions=256, rerank_factor=4)
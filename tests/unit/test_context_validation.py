@@ -0,0 +1,65 @@
+"""
+Testes unitários da montagem de contexto com orçamento de tokens.
+
+Valida união de chunks sobrepostos, orçamento e contagem gravada na ingestão.
+"""
+from langchain_core.documents import Document
+
+from src.context import count_tokens, merge_overlap, pack_context
+from src.ingest import split_documents
+
+
+def chunk(text: str, page: int = 0, **metadata) -> tuple:
+    return (Document(page_content=text, metadata={"source": "a.pdf", "page": page, **metadata}), 0.1)
+
+
+def test_pack_context_merges_overlapping_chunks():
+    """
+    Valida que o overlap do chunking não é repetido no contexto.
+    
+    Expected: Vizinhos da mesma página unidos, duplicata descartada, outra página separada
+    """
+    first = "O faturamento da empresa em 2024 foi de R$ 10 milhões, segundo o relatório anual."
+    second = "segundo o relatório anual. A margem líquida ficou em 12%."
+    
+    packed = pack_context([chunk(first), chunk(first), chunk(second), chunk(second, page=1)])
+    
+    assert merge_overlap(first, second) == first + " A margem líquida ficou em 12%."
+    assert packed.text == (
+        f"[Chunk 1] {first} A margem líquida ficou em 12%.\n\n[Chunk 2] {second}"
+    )
+    assert (packed.chunks, packed.merged, packed.dropped) == (4, 2, 0)
+
+
+def test_pack_context_respects_budget():
+    """
+    Valida o empacotamento guloso dentro do orçamento.
+    
+    Expected: Tokens dentro do limite; chunk grande pulado e o menor seguinte incluído
+    """
+    small = "Receita bruta de R$ 12 milhões."
+    large = " ".join(["Parágrafo longo sobre despesas operacionais."] * 40)
+    budget = 2 * count_tokens(small) + 20
+    
+    packed = pack_context([chunk(small, page=0), chunk(large, page=1), chunk(small, page=2)], budget)
+    
+    assert packed.tokens <= budget
+    assert packed.dropped == 1
+    assert large not in packed.text
+    assert packed.text.count(small) == 2
+    assert pack_context([chunk(large)], max_tokens=0).text == f"[Chunk 1] {large}"
+
+
+def test_chunk_tokens_cached_at_ingestion():
+    """
+    Valida a contagem de tokens gravada na metadata dos chunks.
+    
+    Expected: `tokens` de cada chunk igual à contagem do texto e usada no empacotamento
+    """
+    document = Document(page_content="Faturamento anual. " * 200, metadata={"source": "a.pdf", "page": 0})
+    
+    chunks = split_documents([document], verbose=False)
+    
+    assert all(c.metadata["tokens"] == count_tokens(c.page_content) for c in chunks)
+    packed = pack_context([chunk("Texto curto.", tokens=500)], max_tokens=100)
+    assert packed.dropped == 1
@@ -0,0 +1,152 @@
+"""
+Testes unitários do micro-batching de embeddings.
+
+Valida agrupamento entre threads e corrotinas, propagação de erros e métricas.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.embedding_batcher import BatchingEmbeddings, bucket
+
+
+class SlowEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos com latência, que registram o tamanho de cada chamada."""
+    
+    calls: list = []
+    fail: bool = False
+    
+    def embed_documents(self, texts):
+        time.sleep(0.02)
+        self.calls.append(len(texts))
+        if self.fail:
+            raise RuntimeError("provedor indisponível")
+        return super().embed_documents(texts)
+
+
+def test_concurrent_threads_share_batches():
+    """
+    Valida que consultas simultâneas viram poucas chamadas ao provedor.
+    
+    Expected: Menos chamadas que consultas, vetores iguais aos individuais e histogramas
+    """
+    provider = SlowEmbeddings(size=8, calls=[])
+    batcher = BatchingEmbeddings(provider, window_ms=10, max_batch_size=16, workers=2)
+    queries = [f"pergunta {i % 40}" for i in range(80)]
+    
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        vectors = list(executor.map(batcher.embed_query, queries))
+    
+    assert vectors == [DeterministicFakeEmbedding(size=8).embed_query(q) for q in queries]
+    assert len(provider.calls) < len(queries)
+    assert max(provider.calls) <= 16
+    stats = batcher.stats()
+    assert stats["texts"] == 80
+    assert sum(stats["batch_sizes"].values()) == stats["batches"] == len(provider.calls)
+    assert stats["max_queue_depth"] >= 1 and stats["queue_depth"] == 0
+
+
+def test_asyncio_callers_share_batches():
+    """
+    Valida agrupamento de corrotinas sem bloquear o event loop.
+    
+    Expected: 50 consultas em poucas chamadas, cada corrotina com seu vetor
+    """
+    provider = SlowEmbeddings(size=8, calls=[])
+    batcher = BatchingEmbeddings(provider, window_ms=5, max_batch_size=64)
+    
+    async def run():
+        return await asyncio.gather(*(batcher.aembed_query(f"q{i}") for i in range(50)))
+    
+    vectors = asyncio.run(run())
+    
+    assert vectors[7] == DeterministicFakeEmbedding(size=8).embed_query("q7")
+    assert len(provider.calls) <= 2
+
+
+def test_lone_query_skips_window():
+    """
+    Valida que consulta isolada (sem chamada em voo nem fila) não espera a janela.
+    
+    Expected: Duas consultas seguidas respondem bem antes da janela de 1 s
+    """
+    provider = SlowEmbeddings(size=8, calls=[])
+    batcher = BatchingEmbeddings(provider, window_ms=1000)
+    
+    started = time.perf_counter()
+    batcher.embed_query("primeira")
+    batcher.embed_query("segunda")
+    
+    assert time.perf_counter() - started < 0.5
+    assert provider.calls == [1, 1]
+
+
+def test_provider_error_reaches_every_caller():
+    """
+    Valida propagação do erro do provedor e histograma em potências de 2.
+    
+    Expected: RuntimeError em todos os chamadores do lote; faixas 1, 2, 4, 8
+    """
+    batcher = BatchingEmbeddings(SlowEmbeddings(size=8, calls=[], fail=True), window_ms=20)
+    errors = []
+    
+    def call(text):
+        try:
+            batcher.embed_query(text)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    threads = [threading.Thread(target=call, args=(f"q{i}",)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert errors == ["provedor indisponível"] * 5
+    assert [bucket(n) for n in (1, 2, 3, 5, 8)] == [1, 2, 4, 8, 8]
+    with pytest.raises(ValueError):
+        BatchingEmbeddings(SlowEmbeddings(size=8), max_batch_size=0)
+
+
+class ShortEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos que devolvem um vetor a menos que os textos."""
+    
+    def embed_documents(self, texts):
+        return super().embed_documents(texts)[:-1]
+
+
+def test_missing_vectors_fail_callers():
+    """
+    Valida provedor que devolve menos vetores que textos.
+    
+    Expected: ValueError no chamador, sem KeyError nem espera infinita
+    """
+    batcher = BatchingEmbeddings(ShortEmbeddings(size=8))
+    
+    with pytest.raises(ValueError, match="vetores"):
+        batcher.submit("faturamento").result(timeout=5)
+
+
+def test_collector_error_fails_batch_and_restarts(monkeypatch):
+    """
+    Valida erro na thread coletora.
+    
+    Expected: Lote retirado da fila recebe o erro; a consulta seguinte reinicia o coletor
+    """
+    batcher = BatchingEmbeddings(SlowEmbeddings(size=8, calls=[]))
+    submit = batcher._executor.submit
+    
+    def broken(*args):
+        monkeypatch.setattr(batcher._executor, "submit", submit)
+        raise RuntimeError("executor encerrado")
+    
+    monkeypatch.setattr(batcher._executor, "submit", broken)
+    with pytest.raises(RuntimeError, match="executor encerrado"):
+        batcher.submit("faturamento").result(timeout=5)
+    
+    assert len(batcher.submit("faturamento").result(timeout=5)) == 8
+    assert batcher._inflight == 0
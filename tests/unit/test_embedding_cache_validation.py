@@ -0,0 +1,103 @@
+"""
+Testes unitários do cache persistente de embeddings.
+
+Valida armazenamento, despejo LRU e contadores de hits/misses.
+"""
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos que contam textos enviados ao provedor."""
+    
+    calls: int = 0
+    
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+    
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Cache em arquivo temporário."""
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_cache_roundtrip_float32(cache):
+    """
+    Valida gravação e leitura de vetores.
+    
+    Expected: Vetor recuperado igual ao gravado (precisão float32)
+    """
+    cache.put_many("m", ["texto"], [[0.5, -1.25, 2.0]])
+    
+    assert cache.get_many("m", ["texto", "ausente"]) == [[0.5, -1.25, 2.0], None]
+    assert cache.get_many("outro-modelo", ["texto"]) == [None]
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+
+def test_cache_lru_eviction(cache):
+    """
+    Valida despejo LRU ao exceder max_entries.
+    
+    Expected: Entrada menos recentemente acessada é removida
+    """
+    cache.put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache.get_many("m", ["a"])  # "a" passa a ser a mais recente
+    cache.put_many("m", ["d"], [[4.0]])
+    
+    assert len(cache) == 3
+    assert cache.get_many("m", ["a", "b"]) == [[1.0], None]
+
+
+def test_cache_reads_do_not_write(cache):
+    """
+    Valida que leituras não gravam no arquivo e a contagem é mantida em memória.
+    
+    Expected: Nenhuma escrita no get_many; reinserção não altera a contagem; acesso gravado no close
+    """
+    cache.put_many("m", ["a", "b"], [[1.0], [2.0]])
+    changes = cache._conn.total_changes
+    
+    cache.get_many("m", ["a", "z"])
+    cache.put_many("m", ["a"], [[1.0]])
+    
+    assert cache._conn.total_changes == changes
+    assert len(cache) == 2
+    
+    cache.close()
+    reopened = EmbeddingCache(cache.path, max_entries=3)
+    access = dict(reopened._conn.execute("SELECT text_hash, last_access FROM embeddings"))
+    reopened.close()
+    assert len(access) == 2
+    assert max(access.values()) > min(access.values())  # "a" acessado depois de "b"
+
+
+def test_cached_embeddings_skip_provider(cache):
+    """
+    Valida que vetores em cache não chamam o provedor.
+    
+    Expected: Segunda chamada servida inteiramente pelo cache
+    """
+    provider = CountingEmbeddings(size=4)
+    embeddings = CachedEmbeddings(provider, cache, "fake")
+    
+    first = embeddings.embed_documents(["x", "y", "x"])
+    calls_after_first = provider.calls
+    second = embeddings.embed_documents(["x", "y"])
+    
+    assert calls_after_first == 2  # "x" duplicado enviado uma única vez
+    assert provider.calls == calls_after_first
+    # Cache guarda float32: comparar com tolerância
+    assert second[1] == pytest.approx(first[1], rel=1e-6)
+    assert embeddings.embed_query("x") == pytest.approx(first[0], rel=1e-6)
+    assert provider.calls == calls_after_first
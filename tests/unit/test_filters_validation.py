@@ -0,0 +1,63 @@
+"""
+Testes unitários dos filtros de metadata.
+
+Valida a compilação dos filtros para predicados JSONB parametrizados.
+"""
+import json
+
+import pytest
+
+from src.filters import build_filter, compile_filter
+
+
+def test_compile_filter_predicates():
+    """
+    Valida igualdade, listas, intervalos e tags.
+    
+    Expected: Contenção (@>) para igualdade/listas/tags e comparação tipada para intervalos
+    """
+    predicate, params = compile_filter({
+        "source": ["a.pdf", "b.pdf"],
+        "page": {"$gte": 2, "$lte": 5},
+        "tags": {"$contains": "financeiro"},
+    })
+    
+    assert predicate.startswith("(cmetadata @> CAST(:f0 AS jsonb) OR cmetadata @> CAST(:f1 AS jsonb))")
+    assert "(cmetadata -> 'page') >= CAST(:f2 AS jsonb)" in predicate
+    assert "jsonb_typeof((cmetadata -> 'page')) = 'number'" in predicate
+    assert json.loads(params["f0"]) == {"source": "a.pdf"}
+    assert json.loads(params["f3"]) == 5
+    assert json.loads(params["f4"]) == {"tags": ["financeiro"]}
+    assert compile_filter(None) == ("", {})
+    assert compile_filter({"source": []})[0] == "FALSE"
+
+
+def test_compile_filter_rejects_invalid_input():
+    """
+    Valida rejeição de campos, operadores e valores inválidos.
+    
+    Expected: ValueError antes de montar o SQL (sem injeção pelo nome do campo)
+    """
+    with pytest.raises(ValueError, match="Campo"):
+        compile_filter({"page'; DROP TABLE x; --": 1})
+    with pytest.raises(ValueError, match="Operador"):
+        compile_filter({"page": {"$regex": "1"}})
+    with pytest.raises(ValueError, match="números ou texto"):
+        compile_filter({"page": {"$gt": True}})
+
+
+def test_build_filter_from_cli_options():
+    """
+    Valida o filtro montado a partir das opções da CLI.
+    
+    Expected: None sem opções; intervalo de páginas e tags exigidas juntas
+    """
+    assert build_filter() is None
+    assert build_filter(
+        sources=["a.pdf"], page_from=1, page_to=3, ingested_after="2026-01-01", tags=["x", "y"]
+    ) == {
+        "source": ["a.pdf"],
+        "page": {"$gte": 1, "$lte": 3},
+        "ingested_at": {"$gte": "2026-01-01"},
+        "tags": {"$eq": ["x", "y"]},
+    }
@@ -0,0 +1,116 @@
+"""
+Testes unitários do gerenciamento de índices ANN.
+
+Valida nomes de índice, métodos aceitos, expressões quantizadas e a dimensão da coluna.
+"""
+import pytest
+
+from src.db import coarse_expression, quantized_distance
+from src.index import (
+    SEARCH_SETTINGS,
+    create_index,
+    drop_index,
+    embedding_dimensions,
+    ensure_typed_column,
+    index_name,
+    index_target,
+)
+
+
+def test_index_name_per_method():
+    """
+    Valida que cada método tem índice próprio.
+    
+    Expected: Nomes distintos com sufixo da métrica de cosseno
+    """
+    assert index_name("hnsw") == "ix_embedding_hnsw_cosine"
+    assert index_name("ivfflat") == "ix_embedding_ivfflat_cosine"
+    assert set(SEARCH_SETTINGS) == {"hnsw", "ivfflat"}
+
+
+def test_invalid_method():
+    """
+    Valida erro com método de índice desconhecido.
+    
+    Expected: ValueError antes de conectar no banco
+    """
+    with pytest.raises(ValueError, match="Método inválido"):
+        create_index(method="diskann")
+    
+    with pytest.raises(ValueError, match="Método inválido"):
+        drop_index(method="btree")
+
+
+def test_quantized_index_matches_search_expression():
+    """
+    Valida que índices quantizados usam a mesma expressão da busca.
+    
+    Expected: Expressão indexada presente na ordenação; quantização inválida rejeitada
+    """
+    assert index_name("hnsw", "halfvec") == "ix_embedding_hnsw_halfvec_cosine"
+    assert index_name("hnsw", "binary") == "ix_embedding_hnsw_binary_hamming"
+    
+    assert index_target("halfvec", 1536) == "((embedding)::halfvec(1536)) halfvec_cosine_ops"
+    assert quantized_distance("halfvec", 1536, "embedding", "q").startswith("(embedding)::halfvec(1536) <=>")
+    assert index_target("binary", 1536).startswith("(binary_quantize(embedding)::bit(1536))")
+    assert quantized_distance("binary", 1536, "embedding", "q").startswith(
+        "binary_quantize(embedding)::bit(1536) <~>"
+    )
+    assert quantized_distance("none", 1536, "embedding", "q") == "embedding <=> q"
+    
+    with pytest.raises(ValueError, match="Quantização inválida"):
+        create_index(method="hnsw", quantization="pq")
+
+
+def test_coarse_index_uses_vector_prefix():
+    """
+    Valida o índice sobre o prefixo das dimensões (busca em dois estágios).
+    
+    Expected: Sufixo com a dimensão no nome; prefixo maior que o vetor rejeitado
+    """
+    assert index_name("hnsw", coarse_dimensions=256) == "ix_embedding_hnsw_cosine_d256"
+    assert coarse_expression("embedding", 256) == "((embedding)::real[])[1:256]::vector(256)"
+    assert index_target("none", 1536, 256) == (
+        "(((embedding)::real[])[1:256]::vector(256)) vector_cosine_ops"
+    )
+    
+    with pytest.raises(ValueError, match="coarse_dimensions"):
+        create_index(method="hnsw", coarse_dimensions=0)
+
+
+class FakeConnection:
+    """Conexão com coluna embedding sem dimensão e vetores por coleção."""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+    
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return self
+    
+    def fetchone(self):
+        return ("vector",)
+    
+    def fetchall(self):
+        return self.rows
+
+
+def test_typed_column_refuses_mixed_dimensions():
+    """
+    Valida que a coluna compartilhada não é fixada com coleções de outra dimensão.
+    
+    Expected: ValueError citando a coleção divergente, sem ALTER TABLE
+    """
+    conn = FakeConnection([("curtos", 512), ("docs", 1536)])
+    
+    with pytest.raises(ValueError, match="curtos: 512"):
+        ensure_typed_column(conn, 1536)
+    with pytest.raises(ValueError, match="compartilhada"):
+        embedding_dimensions(conn)
+    assert not any("ALTER" in statement for statement in conn.statements)
+    
+    conn = FakeConnection([("docs", 1536)])
+    assert embedding_dimensions(conn) == 1536
+    ensure_typed_column(conn, 1536)
+    assert "ALTER" in conn.statements[-1]
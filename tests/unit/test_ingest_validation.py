@@ -6,8 +6,22 @@ Valida entrada de dados e lógica de chunking.
 import pytest
 from pathlib import Path
 from langchain_core.documents import Document
+from typer.testing import CliRunner
 
-from src.ingest import load_pdf, split_documents
+import src.ingest
+from src.ingest import (
+    app,
+    chunk_id,
+    compute_content_hash,
+    embed_and_store,
+    ingest_files,
+    iter_batches,
+    iter_chunks,
+    load_pdf,
+    open_copy_writer,
+    resolve_pdf_paths,
+    split_documents,
+)
 
 
 def test_load_pdf_file_not_found():
@@ -104,3 +118,182 @@ def test_split_documents_preserves_metadata():
     for chunk in chunks:
         assert chunk.metadata.get("source") == "test.pdf"
         assert chunk.metadata.get("page") == 1
+
+
+def test_iter_batches_sizes():
+    """
+    Valida divisão em lotes de tamanho fixo.
+    
+    Expected: Lotes completos e último lote com o restante
+    """
+    docs = [Document(page_content=str(i)) for i in range(7)]
+    
+    batches = list(iter_batches(docs, 3))
+    
+    assert [len(b) for b in batches] == [3, 3, 1]
+    
+    with pytest.raises(ValueError):
+        list(iter_batches(docs, 0))
+
+
+def test_embed_and_store_preserves_order():
+    """
+    Valida pipeline concorrente de embeddings.
+    
+    Expected: Todos os chunks gravados, na ordem original, com vetores
+    correspondentes ao próprio texto
+    """
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    class FakeVectorStore:
+        def __init__(self):
+            self.texts = []
+            self.vectors = []
+        
+        def add_embeddings(self, texts, embeddings, metadatas, ids):
+            self.texts.extend(texts)
+            self.vectors.extend(embeddings)
+    
+    embeddings = DeterministicFakeEmbedding(size=8)
+    store = FakeVectorStore()
+    docs = [Document(page_content=f"chunk {i}") for i in range(25)]
+    
+    stored = embed_and_store(docs, embeddings, store, batch_size=4, max_workers=3)
+    
+    assert stored == 25
+    assert store.texts == [d.page_content for d in docs]
+    assert store.vectors[7] == embeddings.embed_query("chunk 7")
+
+
+def test_copy_writer_unavailable_falls_back(monkeypatch):
+    """
+    Valida fallback quando o CopyWriter não pode ser criado (ex: conexão recusada).
+    
+    Expected: Sem exceção; None sinaliza a gravação pelo caminho padrão
+    """
+    import src.ingest
+    
+    def refuse(*args, **kwargs):
+        raise OSError("connection refused")
+    
+    monkeypatch.setattr(src.ingest.psycopg, "connect", refuse)
+    monkeypatch.setenv("DATABASE_URL", "postgresql+psycopg://u:p@localhost:1/db")
+    
+    class FakeVectorStore:
+        collection_name = "docs"
+    
+    assert open_copy_writer(FakeVectorStore()) is None
+
+
+def test_split_documents_content_hash_stable():
+    """
+    Valida hash de conteúdo usado na ingestão incremental.
+    
+    Expected: Mesmo texto gera o mesmo hash; textos diferentes, hashes diferentes
+    """
+    docs = [Document(page_content="C" * 1500, metadata={"source": "a.pdf", "page": 0})]
+    
+    first = split_documents(docs)
+    second = split_documents(docs)
+    
+    assert [c.metadata["content_hash"] for c in first] == \
+        [c.metadata["content_hash"] for c in second]
+    assert compute_content_hash("x", 1000, 150, "m") != compute_content_hash("y", 1000, 150, "m")
+    assert compute_content_hash("x", 1000, 150, "m") != compute_content_hash("x", 500, 150, "m")
+
+
+def test_embedding_dimensions_change_chunk_ids(monkeypatch):
+    """
+    Valida que mudar EMBEDDING_DIMENSIONS invalida os chunks já ingeridos.
+    
+    Expected: Mesmo texto com outra dimensão gera hash e id diferentes; sem dimensão, hash inalterado
+    """
+    docs = [Document(page_content="Faturamento de R$ 10 milhões.", metadata={"source": "a.pdf", "page": 0})]
+    
+    monkeypatch.setenv("EMBEDDING_MODEL", "modelo")
+    monkeypatch.setenv("CHUNK_SIZE", "1000")
+    monkeypatch.setenv("CHUNK_OVERLAP", "150")
+    monkeypatch.delenv("EMBEDDING_DIMENSIONS", raising=False)
+    native = split_documents(docs)[0]
+    monkeypatch.setenv("EMBEDDING_DIMENSIONS", "256")
+    shortened = split_documents(docs)[0]
+    
+    assert native.metadata["content_hash"] == compute_content_hash(native.page_content, 1000, 150, "modelo")
+    assert native.metadata["content_hash"] != shortened.metadata["content_hash"]
+    assert chunk_id("docs", native) != chunk_id("docs", shortened)
+
+
+def test_chunk_id_deterministic_per_collection():
+    """
+    Valida ids determinísticos dos chunks.
+    
+    Expected: Mesmo chunk gera o mesmo id na mesma coleção e ids
+    diferentes em coleções diferentes
+    """
+    chunk = split_documents([Document(page_content="D" * 500, metadata={"source": "a.pdf", "page": 2})])[0]
+    
+    assert chunk_id("docs", chunk) == chunk_id("docs", chunk)
+    assert chunk_id("docs", chunk) != chunk_id("outra", chunk)
+
+
+def test_resolve_pdf_paths_dirs_and_globs(tmp_path):
+    """
+    Valida expansão de diretórios e padrões glob.
+    
+    Expected: Apenas PDFs, busca recursiva em diretórios e sem duplicatas
+    """
+    (tmp_path / "sub").mkdir()
+    for name in ["a.pdf", "b.PDF", "notas.txt", "sub/c.pdf"]:
+        (tmp_path / name).write_bytes(b"")
+    
+    from_dir = resolve_pdf_paths([str(tmp_path)])
+    from_glob = resolve_pdf_paths([str(tmp_path / "*.pdf"), str(tmp_path / "a.pdf")])
+    
+    assert sorted(Path(p).name for p in from_dir) == ["a.pdf", "b.PDF", "c.pdf"]
+    assert [Path(p).name for p in from_glob] == ["a.pdf"]
+    
+    with pytest.raises(FileNotFoundError):
+        resolve_pdf_paths([str(tmp_path / "vazio" / "*.pdf")])
+
+
+def test_iter_chunks_overlap_across_pages():
+    """
+    Valida chunking incremental com overlap entre páginas (modo streaming).
+    
+    Expected: Chunks respeitam 1000 caracteres, o primeiro chunk de uma
+    página repete o final da anterior e a metadata é a da página atual
+    """
+    page_one = " ".join(f"um{i}" for i in range(300))
+    page_two = " ".join(f"dois{i}" for i in range(300))
+    pages = [
+        Document(page_content=page_one, metadata={"source": "a.pdf", "page": 0}),
+        Document(page_content=page_two, metadata={"source": "a.pdf", "page": 1}),
+    ]
+    
+    chunks = list(iter_chunks(iter(pages)))
+    first_of_page_two = next(c for c in chunks if c.metadata["page"] == 1)
+    
+    assert all(len(c.page_content) <= 1000 for c in chunks)
+    assert first_of_page_two.page_content.startswith("um")
+    assert page_one.endswith(first_of_page_two.page_content.split(" dois0")[0])
+    assert all("content_hash" in c.metadata for c in chunks)
+
+
+def test_invalid_writer_fails_before_any_work(monkeypatch, tmp_path):
+    """
+    Valida writer inválido antes de ler PDFs ou abrir o banco.
+    
+    Expected: ValueError em ingest_files e código de saída 1 na CLI, sem criar o vectorstore
+    """
+    def unexpected(*args, **kwargs):
+        raise AssertionError("vectorstore criado com writer inválido")
+    
+    monkeypatch.setattr(src.ingest, "build_vectorstore", unexpected)
+    monkeypatch.setattr(src.ingest, "resolve_pdf_paths", unexpected)
+    
+    with pytest.raises(ValueError, match="Writer inválido"):
+        ingest_files([str(tmp_path / "a.pdf")], "docs", writer="parquet")
+    
+    result = CliRunner().invoke(app, [str(tmp_path), "--writer", "parquet"])
+    assert result.exit_code == 1
+    assert "Writer inválido" in result.output
@@ -0,0 +1,62 @@
+"""
+Testes unitários da busca exata em memória.
+
+Valida top-k contra força bruta e o snapshot em disco, sem acessar o banco.
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.memory_index import MemoryIndex
+
+
+def build_index(count: int = 50, dimensions: int = 8) -> MemoryIndex:
+    rng = np.random.default_rng(7)
+    embeddings = rng.standard_normal((count, dimensions)).tolist()
+    documents = [
+        Document(id=f"doc-{i}", page_content=f"Chunk {i} ção", metadata={"source": f"{i}.pdf"})
+        for i in range(count)
+    ]
+    return MemoryIndex.from_documents("testes", "uuid:1", "modelo", documents, embeddings)
+
+
+def test_memory_index_matches_brute_force():
+    """
+    Valida top-k por argpartition contra ordenação completa.
+    
+    Expected: Mesmos documentos, em ordem de distância de cosseno crescente
+    """
+    index = build_index()
+    query = np.random.default_rng(1).standard_normal(8)
+    
+    vectors = np.asarray(index.vectors, dtype=np.float64)
+    distances = 1 - vectors @ (query / np.linalg.norm(query))
+    expected = np.argsort(distances)[:10]
+    
+    results = index.search(query.tolist(), k=10)
+    
+    assert [doc.id for doc, _ in results] == [f"doc-{i}" for i in expected]
+    assert [score for _, score in results] == pytest.approx(distances[expected].tolist(), abs=1e-5)
+    assert results[0][0].metadata == {"source": f"{expected[0]}.pdf"}
+    assert [doc.id for doc, _ in index.search_many([query.tolist()], k=10)[0]] == [
+        doc.id for doc, _ in results
+    ]
+
+
+def test_memory_index_snapshot_roundtrip(tmp_path):
+    """
+    Valida gravação e reabertura do snapshot por memory-map.
+    
+    Expected: Mesmos metadados e mesmos resultados após recarregar
+    """
+    index = build_index()
+    index.save(str(tmp_path / "testes"))
+    
+    loaded = MemoryIndex.load(str(tmp_path / "testes"))
+    query = [0.5] * 8
+    
+    assert isinstance(loaded.vectors, np.memmap)
+    assert (loaded.version, loaded.embedding_model, len(loaded)) == ("uuid:1", "modelo", 50)
+    assert loaded.search(query, k=5) == index.search(query, k=5)
+    assert loaded.search_many([], k=5) == []
+
@@ -0,0 +1,73 @@
+"""
+Testes unitários da seleção MMR.
+
+Valida diversidade, equivalência com top-k e validação do lambda, sem acessar o banco.
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.memory_index import MemoryIndex
+from src.mmr import maximal_marginal_relevance
+
+
+def test_mmr_skips_near_duplicates():
+    """
+    Valida que chunks quase idênticos não são escolhidos juntos.
+    
+    Expected: Segundo escolhido é o candidato distinto, não a cópia do primeiro
+    """
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = np.array([
+        [1.0, 0.1, 0.0],
+        [1.0, 0.1, 0.001],
+        [0.7, 0.0, 0.7],
+    ])
+    
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_mmr_lambda_one_matches_top_k():
+    """
+    Valida que lambda = 1 ignora a diversidade.
+    
+    Expected: Mesma ordem da similaridade de cosseno decrescente
+    """
+    rng = np.random.default_rng(3)
+    query = rng.standard_normal(16)
+    candidates = rng.standard_normal((40, 16))
+    
+    normalized = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+    
+    assert maximal_marginal_relevance(query, candidates, k=5, lambda_mult=1.0) == expected.tolist()
+    assert len(maximal_marginal_relevance(query, candidates[:3], k=5)) == 3
+
+
+def test_mmr_rejects_invalid_lambda():
+    """
+    Valida a faixa de lambda_mult.
+    
+    Expected: ValueError para valores fora de [0, 1]
+    """
+    with pytest.raises(ValueError, match="lambda_mult"):
+        maximal_marginal_relevance([1.0, 0.0], np.eye(2), k=1, lambda_mult=1.5)
+
+
+def test_memory_index_search_with_vectors_matches_search():
+    """
+    Valida que os vetores devolvidos correspondem aos resultados.
+    
+    Expected: Mesmos resultados de `search` e vetores das mesmas linhas
+    """
+    rng = np.random.default_rng(5)
+    embeddings = rng.standard_normal((20, 8)).tolist()
+    documents = [Document(id=f"doc-{i}", page_content=f"Chunk {i}") for i in range(20)]
+    index = MemoryIndex.from_documents("testes", "uuid:1", "modelo", documents, embeddings)
+    query = rng.standard_normal(8).tolist()
+    
+    results, vectors = index.search_with_vectors(query, k=4)
+    
+    assert [doc.id for doc, _ in results] == [doc.id for doc, _ in index.search(query, k=4)]
+    rows = [int(doc.id.split("-")[1]) for doc, _ in results]
+    assert np.allclose(vectors, np.asarray(index.vectors)[rows])
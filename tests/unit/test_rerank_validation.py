@@ -0,0 +1,69 @@
+"""
+Testes unitários do re-ranker local.
+
+Valida ordenação BM25, lotes do pool e configuração, sem acessar o banco.
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.rerank import Reranker, get_reranker, tokenize
+
+
+def candidates(*texts: str) -> list:
+    return [(Document(id=str(i), page_content=text), 0.1 * i) for i, text in enumerate(texts)]
+
+
+def test_bm25_moves_lexical_match_to_top():
+    """
+    Valida que o chunk com os termos da consulta sobe no ranking.
+    
+    Expected: Chunk com "auditoria" primeiro, empates na ordem da busca, distância preservada
+    """
+    results = candidates(
+        "Receita bruta do exercício.",
+        "Lucro líquido por ação.",
+        "Relatório de auditoria independente sobre as demonstrações.",
+        "Notas explicativas.",
+    )
+    
+    ranked = Reranker("bm25").rerank("Quem fez a auditoria?", results, k=3)
+    
+    assert [doc.id for doc, _ in ranked] == ["2", "0", "1"]
+    assert ranked[0][1] == pytest.approx(0.2)
+    assert tokenize("Qual a Tributação?") == ["tributacao"]
+
+
+def test_bm25_inline_and_batches_in_thread_pool():
+    """
+    Valida que o BM25 não usa o pool e que os lotes do pool preservam a ordem.
+    
+    Expected: BM25 pontua sem o pool, mesmos scores; lotes do pool na ordem original
+    """
+    rng = np.random.default_rng(3)
+    words = ["faturamento", "receita", "lucro", "auditoria", "ativo", "passivo", "caixa"]
+    texts = [" ".join(rng.choice(words, size=30)) for _ in range(25)]
+    
+    reranker = Reranker("bm25", batch_size=2, workers=4)
+    executor = reranker._executor
+    reranker._executor = None
+    inline = reranker.score("receita de caixa", texts)
+    reranker._executor = executor
+    
+    assert np.allclose(inline, Reranker("bm25", batch_size=100).score("receita de caixa", texts))
+    assert reranker._map(lambda batch: batch, list(range(5))) == [[0, 1], [2, 3], [4]]
+
+
+def test_reranker_configuration_errors(monkeypatch):
+    """
+    Valida a escolha do re-ranker.
+    
+    Expected: None para "none"; ValueError para método inválido ou onnx sem modelo
+    """
+    monkeypatch.delenv("RERANK_MODEL_PATH", raising=False)
+    assert get_reranker("none") is None
+    
+    with pytest.raises(ValueError, match="inválido"):
+        Reranker("cohere")
+    with pytest.raises(ValueError, match="RERANK_MODEL_PATH"):
+        Reranker("onnx")
@@ -3,10 +3,13 @@ Testes unitários críticos para validação de busca.
 
 Valida entrada e configurações críticas do módulo de search.
 """
+import asyncio
+
 import pytest
 import os
+from langchain_core.documents import Document
 
-from src.search import SemanticSearch
+from src.search import ResultCache, SemanticSearch, format_context, normalize_query, search_settings
 
 
 def test_search_empty_query():
@@ -21,6 +24,103 @@ def test_search_empty_query():
         searcher.search("")
 
 
+def test_asearch_empty_query():
+    """
+    Valida erro com query vazia na busca assíncrona.
+    
+    Expected: ValueError antes de abrir conexões
+    """
+    searcher = SemanticSearch()
+    
+    with pytest.raises(ValueError, match="vazia"):
+        asyncio.run(searcher.asearch("   "))
+
+
+def test_search_many_validation():
+    """
+    Valida busca em lote sem queries e com query vazia.
+    
+    Expected: Lista vazia sem acessar o banco; ValueError se alguma vazia
+    """
+    searcher = SemanticSearch()
+    
+    assert searcher.search_many([]) == []
+    assert searcher.search_many_by_vectors([]) == []
+    with pytest.raises(ValueError, match="vazia"):
+        searcher.search_many(["faturamento", "  "])
+
+
+def test_search_invalid_backend():
+    """
+    Valida rejeição de backend de recuperação desconhecido.
+    
+    Expected: ValueError com o nome do backend
+    """
+    with pytest.raises(ValueError, match="faiss"):
+        SemanticSearch(backend="faiss")
+
+
+def test_hybrid_search_validation():
+    """
+    Valida pesos da busca híbrida e exigência do backend pgvector.
+    
+    Expected: ValueError para pesos negativos/ambos zero, query vazia e backend memory
+    """
+    searcher = SemanticSearch(hybrid=True)
+    
+    with pytest.raises(ValueError, match="Pesos inválidos"):
+        searcher.search_hybrid("faturamento", vector_weight=0, text_weight=0)
+    with pytest.raises(ValueError, match="Pesos inválidos"):
+        searcher.search_hybrid("faturamento", vector_weight=-1)
+    with pytest.raises(ValueError, match="vazia"):
+        searcher.search("  ")
+    with pytest.raises(ValueError, match="pgvector"):
+        SemanticSearch(backend="memory", hybrid=True)
+
+
+def test_search_many_hybrid_single_statement():
+    """
+    Valida que a busca híbrida de várias queries monta um único SQL.
+    
+    Expected: Um LATERAL sobre VALUES com texto e vetor de cada query
+    """
+    searcher = SemanticSearch(hybrid=True)
+    
+    statement, params, _ = searcher._hybrid_many_statement(
+        ["faturamento", "CNPJ"], [[0.1, 0.2], [0.3, 0.4]], None, None, None
+    )
+    sql = str(statement)
+    assert sql.count("CROSS JOIN LATERAL") == 1
+    assert "vector_hits" in sql and "text_hits" in sql
+    assert (params["t0"], params["t1"]) == ("faturamento", "CNPJ")
+    assert params["q1"] == "[0.3,0.4]"
+
+
+def test_mmr_and_reranker_are_exclusive():
+    """
+    Valida que MMR e re-ranker não são ativados juntos no contexto.
+    
+    Expected: ValueError ao criar a busca com os dois; cada um sozinho é aceito
+    """
+    with pytest.raises(ValueError, match="MMR e re-ranker"):
+        SemanticSearch(mmr=True, reranker="bm25")
+    
+    assert SemanticSearch(mmr=True, reranker="none").reranker is None
+    assert not SemanticSearch(mmr=False, reranker="bm25").mmr
+
+
+def test_format_context():
+    """
+    Valida concatenação sem orçamento (linha de base do benchmark de contexto).
+    
+    Expected: Chunks numerados separados por linha em branco
+    """
+    results = [(Document(page_content="A"), 0.1), (Document(page_content="B"), 0.2)]
+    
+    assert format_context(results) == "[Chunk 1] A\n\n[Chunk 2] B"
+    assert format_context([]) == ""
+
+
 def test_search_k_fixed_10():
     """
     Valida que k=10 é fixo (RN-006).
@@ -74,3 +174,82 @@ def test_search_k_env_variable():
             os.environ["SEARCH_K"] = original_k
         else:
             os.environ.pop("SEARCH_K", None)
+
+
+def test_search_reuses_vectorstore():
+    """
+    Valida reuso do PGVector entre instâncias de SemanticSearch.
+    
+    Expected: Mesma coleção compartilha vectorstore; outra coleção não
+    """
+    first = SemanticSearch()
+    second = SemanticSearch()
+    other = SemanticSearch(collection_name="custom_collection")
+    
+    assert first.vectorstore is second.vectorstore
+    assert other.vectorstore is not first.vectorstore
+
+
+def test_search_settings_per_query():
+    """
+    Valida parâmetros de busca ANN enviados ao pgvector.
+    
+    Expected: Apenas parâmetros informados viram GUCs
+    """
+    assert search_settings() == {}
+    assert search_settings(ef_search=80) == {"hnsw.ef_search": "80"}
+    assert search_settings(ef_search=40, probes=10) == {
+        "hnsw.ef_search": "40",
+        "ivfflat.probes": "10",
+    }
+
+
+def test_result_cache_lru_and_version_invalidation():
+    """
+    Valida cache de resultados: limite de entradas e invalidação por versão.
+    
+    Expected: Entrada mais antiga despejada; nova versão descarta a coleção
+    """
+    cache = ResultCache(max_entries=2)
+    results = [(Document(page_content="A"), 0.1)]
+    
+    assert cache.get("docs", "v1", "a") is None
+    cache.put("docs", "v1", "a", results)
+    cache.put("docs", "v1", "b", results)
+    assert cache.get("docs", "v1", "a") == results
+    cache.put("docs", "v1", "c", results)
+    assert cache.get("docs", "v1", "b") is None
+    assert len(cache) == 2
+    
+    # Reingestão: versão nova invalida tudo da coleção
+    assert cache.get("docs", "v2", "a") is None
+    assert len(cache) == 0
+
+
+def test_result_cache_version_ttl():
+    """
+    Valida validade da versão lida do banco pelo cache de resultados.
+    
+    Expected: Versão reaproveitada dentro do TTL; expirada, esquecida ou TTL 0 exige nova leitura
+    """
+    cache = ResultCache(version_ttl=60)
+    assert cache.known_version("docs") is None
+    cache.remember_version("docs", "v1")
+    assert cache.known_version("docs") == "v1"
+    assert cache.known_version("outra") is None
+    
+    cache.forget_version("docs")
+    assert cache.known_version("docs") is None
+    
+    cache.version_ttl = 0
+    cache.remember_version("docs", "v1")
+    assert cache.known_version("docs") is None
+
+
+def test_normalize_query():
+    """
+    Valida normalização da chave do cache de resultados.
+    
+    Expected: Caixa e espaços extras ignorados
+    """
+    assert normalize_query("  Qual o   FATURAMENTO? ") == "qual o faturamento?"
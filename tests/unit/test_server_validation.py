@@ -0,0 +1,154 @@
+"""
+Testes unitários do serviço HTTP.
+
+Valida rotas, streaming, backpressure e métricas com busca e LLM locais,
+sem banco nem provedores externos.
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.context import pack_context
+from src.server import NO_CONTEXT_ANSWER, ConcurrencyLimiter, Overloaded, create_app
+
+
+class FakeSearcher:
+    """Busca em memória: chunks que contêm alguma palavra da query."""
+    
+    reranker = None
+    
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+        self.documents = [
+            Document(id="1", page_content="O faturamento foi de R$ 10 milhões.", metadata={"page": 1}),
+            Document(id="2", page_content="A auditoria foi feita pela empresa X.", metadata={"page": 2}),
+        ]
+    
+    async def asearch(self, query, ef_search=None, probes=None, filter=None):
+        if not query.strip():
+            raise ValueError("Query não pode ser vazia")
+        words = [w.strip("?") for w in query.lower().split() if len(w) > 3]
+        return [(doc, 0.1) for doc in self.documents if any(w in doc.page_content.lower() for w in words)]
+    
+    async def aget_packed_context(self, query, filter=None):
+        return pack_context(await self.asearch(query, filter=filter), max_tokens=100)
+
+
+@pytest.fixture
+def client():
+    api = create_app(
+        collections=["docs"],
+        searcher_factory=FakeSearcher,
+        llm_factory=lambda: FakeListChatModel(responses=["R$ 10 milhões."]),
+        max_concurrency=2,
+        max_queue=0,
+    )
+    with TestClient(api) as client:
+        yield client
+
+
+def test_search_context_and_ask_with_local_providers(client):
+    """
+    Valida as rotas de consulta com busca e LLM locais.
+    
+    Expected: Chunks, contexto com tokens, resposta completa e em SSE; métricas por rota
+    """
+    found = client.post("/search", json={"query": "faturamento"}).json()
+    assert [r["id"] for r in found["results"]] == ["1"]
+    
+    context = client.post("/context", json={"query": "faturamento", "collection": "docs"}).json()
+    assert "R$ 10 milhões" in context["context"] and context["tokens"] > 0
+    
+    answer = client.post("/ask", json={"question": "Qual o faturamento?"}).json()
+    assert answer["answer"] == "R$ 10 milhões." and answer["context_tokens"] == context["tokens"]
+    
+    with client.stream("POST", "/ask", json={"question": "Qual o faturamento?", "stream": True}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [line for line in response.iter_lines() if line.startswith("data: ")]
+    tokens = [json.loads(line[6:]).get("text", "") for line in events[:-1]]
+    assert "".join(tokens) == "R$ 10 milhões."
+    assert json.loads(events[-1][6:])["context_tokens"] == context["tokens"]
+    
+    metrics = client.get("/metrics").text
+    assert 'rag_requests_total{route="/ask",status="200"} 2' in metrics
+    assert 'rag_request_duration_seconds_count{route="/search"} 1' in metrics
+    assert "rag_inflight_requests 0" in metrics
+
+
+def test_invalid_requests_and_empty_context(client):
+    """
+    Valida erros de entrada e pergunta sem contexto.
+    
+    Expected: 400 para query vazia, 404 para coleção não atendida, resposta padrão sem contexto
+    """
+    assert client.post("/search", json={"query": "  "}).status_code == 400
+    assert client.post("/context", json={"query": "x", "collection": "outra"}).status_code == 404
+    
+    answer = client.post("/ask", json={"question": "Qual a capital da França?"}).json()
+    assert answer["answer"] == NO_CONTEXT_ANSWER and answer["context_tokens"] == 0
+
+
+def test_dropped_stream_releases_slot(client):
+    """
+    Valida que resposta em streaming abandonada antes do corpo libera a vaga.
+    
+    Expected: Envio dos cabeçalhos falha (cliente desconectado) e limiter.active volta a 0
+    """
+    body = json.dumps({"question": "Qual o faturamento?", "stream": True}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/ask", "raw_path": b"/ask", "query_string": b"",
+        "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    
+    async def drop():
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+        
+        async def send(message):
+            raise OSError("cliente desconectado")
+        
+        try:
+            await client.app(scope, receive, send)
+        except Exception:
+            pass
+    
+    client.portal.call(drop)
+    
+    limiter = client.app.state.service.limiter
+    assert limiter.active == 0
+    assert client.post("/ask", json={"question": "Qual o faturamento?"}).status_code == 200
+
+
+def test_limiter_rejects_when_queue_is_full():
+    """
+    Valida backpressure do limitador de concorrência.
+    
+    Expected: 1 em atendimento, 1 na fila, a terceira recusada; espera esgotada também recusa
+    """
+    async def run():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        
+        with pytest.raises(Overloaded, match="cheia"):
+            await limiter.acquire()
+        with pytest.raises(Overloaded, match="esgotado"):
+            await queued
+        
+        limiter.release()
+        await limiter.acquire()
+        return limiter
+    
+    limiter = asyncio.run(run())
+    
+    assert limiter.rejected == 2 and limiter.active == 1 and limiter.waiting == 0
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(max_concurrency=0, max_queue=0, queue_timeout=1)
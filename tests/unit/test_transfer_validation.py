@@ -0,0 +1,73 @@
+"""
+Testes unitários da exportação/importação de coleções.
+
+Valida quantização dos vetores e leitura do formato, sem acessar o banco.
+"""
+import json
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from src.memory_index import encode_record
+from src.transfer import dequantize, iter_export, quantize, read_manifest
+
+
+def test_quantize_roundtrip():
+    """
+    Valida conversão float32 -> float16/int8 -> float32.
+    
+    Expected: Erro pequeno por elemento; ValueError para dtype inválido
+    """
+    matrix = np.random.default_rng(3).standard_normal((20, 64)).astype(np.float32)
+    
+    values, scales = quantize(matrix, "float16")
+    assert values.dtype == np.float16 and scales is None
+    assert np.allclose(dequantize(values), matrix, atol=1e-2)
+    
+    values, scales = quantize(matrix, "int8")
+    assert values.dtype == np.int8 and scales.shape == (20,)
+    assert np.abs(dequantize(values, scales) - matrix).max() <= scales.max() / 2 + 1e-6
+    
+    with pytest.raises(ValueError, match="dtype"):
+        quantize(matrix, "int4")
+
+
+def test_iter_export_reads_batches(tmp_path):
+    """
+    Valida leitura em lotes de um diretório exportado.
+    
+    Expected: Documentos e vetores na ordem gravada, lotes do tamanho pedido
+    """
+    matrix = np.random.default_rng(4).standard_normal((5, 8)).astype(np.float32)
+    values, scales = quantize(matrix, "int8")
+    records = [
+        encode_record(Document(id=f"c{i}", page_content=f"Chunk {i}", metadata={"page": i}))
+        for i in range(5)
+    ]
+    offsets = np.concatenate([[0], np.cumsum([len(r) for r in records])]).astype(np.int64)
+    np.save(tmp_path / "vectors.npy", values)
+    np.save(tmp_path / "scales.npy", scales)
+    np.save(tmp_path / "offsets.npy", offsets)
+    (tmp_path / "blob.bin").write_bytes(b"".join(records))
+    (tmp_path / "manifest.json").write_text(json.dumps({
+        "format_version": 1, "collection": "testes", "embedding_model": "modelo",
+        "count": 5, "dimensions": 8, "dtype": "int8",
+    }))
+    
+    batches = list(iter_export(str(tmp_path), batch_size=2))
+    
+    assert [len(docs) for docs, _ in batches] == [2, 2, 1]
+    assert [doc.id for docs, _ in batches for doc in docs] == ["c0", "c1", "c2", "c3", "c4"]
+    assert batches[2][0][0].metadata == {"page": 4}
+    assert np.allclose(np.concatenate([v for _, v in batches]), matrix, atol=scales.max())
+
+
+def test_read_manifest_missing(tmp_path):
+    """
+    Valida erro ao importar diretório sem exportação.
+    
+    Expected: FileNotFoundError
+    """
+    with pytest.raises(FileNotFoundError, match="Exportação"):
+        read_manifest(str(tmp_path))